@@ -0,0 +1,81 @@
+"""
+Per-request overhead of the /search agent: building ChatOpenAI, the prompt,
+tools and AgentExecutor (with a fresh HTTP connection pool) on every request,
+the old get_chat_agent, against the agent built once per worker. Both answer
+through a local fake chat completions endpoint.
+
+    python -m benchmarks.bench_agent_setup --requests 200 --latency 0.005
+"""
+import os
+import time
+import argparse
+import statistics
+
+from .fake_openai import FakeOpenAIServer
+
+
+def legacy_chat_agent():
+    """The pre build-once get_chat_agent, kept here as the baseline."""
+    from langchain_openai import ChatOpenAI
+    from langchain.agents import AgentExecutor, create_openai_tools_agent, OpenAIFunctionsAgent
+    from langchain.memory import ConversationBufferWindowMemory
+    from langchain.schema import SystemMessage
+    from langchain.prompts import MessagesPlaceholder
+    from src.core.config import settings
+    from src.tools.retriever import get_code_context
+
+    memory = ConversationBufferWindowMemory(k=settings.DOC_RETRIEVAL_TOP_K, return_messages=True, memory_key='memory')
+    prompt = OpenAIFunctionsAgent.create_prompt(
+        system_message=SystemMessage(content="You are a professional AI assistant."),
+        extra_prompt_messages=[MessagesPlaceholder(variable_name="memory")],
+    )
+    llm = ChatOpenAI(temperature=0, model=settings.OPENAI_MODEL_NAME, streaming=True)
+    tools = [get_code_context]
+    agent = create_openai_tools_agent(llm, tools, prompt)
+    return AgentExecutor(agent=agent, tools=tools, memory=memory, max_iterations=5, max_execution_time=50)
+
+
+def run(label, server, requests, answer):
+    server.requests, server.connections = 0, 0
+    setup, total = [], []
+    for i in range(requests):
+        start = time.perf_counter()
+        ask = answer()
+        ready = time.perf_counter()
+        ask(f"question {i}")
+        done = time.perf_counter()
+        setup.append(ready - start)
+        total.append(done - start)
+    ms = lambda values, q: statistics.quantiles(values, n=100)[q - 1] * 1000
+    print(f"{label:>10}: setup p50 {ms(setup, 50):.2f}ms, request p50 {ms(total, 50):.2f}ms "
+          f"p99 {ms(total, 99):.2f}ms, {server.connections} connections for {server.requests} LLM calls")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.005, help="seconds per LLM call")
+    args = parser.parse_args()
+
+    with FakeOpenAIServer(latency=args.latency) as server:
+        os.environ["OPENAI_BASE_URL"] = server.url
+        os.environ["OPENAI_API_BASE"] = server.url
+        from src.agents import chat
+
+        def per_request():
+            executor = legacy_chat_agent()
+            return lambda question: executor.invoke({"input": question})
+
+        def shared():
+            return lambda question: chat.run_chat_agent(question)
+
+        # warm imports so neither run pays for them
+        legacy_chat_agent()
+        chat.build_chat_agent().verbose = False
+
+        run("per-request", server, args.requests, per_request)
+        run("shared", server, args.requests, shared)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Recall@k against exact flat search and single-query p50/p99 latency for each
+ANN backend in services/ann_index.py, on clustered synthetic embeddings.
+
+    python -m benchmarks.bench_ann_index --vectors 200000 --dim 256 --nprobe 16 --ef-search 64
+"""
+import time
+import argparse
+
+import faiss
+import numpy as np
+
+from src.core.config import settings
+from src.services.ann_index import INDEX_TYPES, create_index, train_index, configure_search
+
+
+def clustered_vectors(n, dim, clusters, rng):
+    # real code embeddings are far from uniform, a gaussian mixture is a closer stand-in
+    centers = rng.standard_normal((clusters, dim)).astype("float32")
+    assignment = rng.integers(0, clusters, n)
+    return (centers[assignment] + 0.3 * rng.standard_normal((n, dim))).astype("float32")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vectors", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, default=settings.ANN_NPROBE)
+    parser.add_argument("--ef-search", type=int, default=settings.ANN_EF_SEARCH)
+    args = parser.parse_args()
+    settings.ANN_NPROBE = args.nprobe
+    settings.ANN_EF_SEARCH = args.ef_search
+    faiss.omp_set_num_threads(1)  # measure per-query cost, not how many cores the box has
+
+    rng = np.random.default_rng(0)
+    data = clustered_vectors(args.vectors + args.queries, args.dim, 1_000, rng)
+    vectors, queries = data[:args.vectors], data[args.vectors:]
+    ids = np.arange(args.vectors, dtype="int64")
+
+    truth = None
+    print(f"{args.vectors} vectors, dim={args.dim}, k={args.k}, nprobe={args.nprobe}, efSearch={args.ef_search}")
+    print(f"{'backend':>9} | {'build s':>8} | {'recall@k':>8} | {'p50 ms':>7} | {'p99 ms':>7}")
+    for index_type in INDEX_TYPES:
+        start = time.perf_counter()
+        index = create_index(index_type, args.dim, args.vectors)
+        train_index(index, vectors)
+        index.add_with_ids(vectors, ids)
+        configure_search(index, index_type)
+        build_time = time.perf_counter() - start
+
+        latencies = []
+        found = np.empty((args.queries, args.k), dtype="int64")
+        for q in range(args.queries):
+            start = time.perf_counter()
+            _, found[q] = index.search(queries[q:q + 1], args.k)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        if truth is None:  # flat runs first and is the ground truth
+            truth = found
+        recall = np.mean([len(set(found[q]) & set(truth[q])) / args.k for q in range(args.queries)])
+        p50, p99 = np.percentile(latencies, [50, 99])
+        print(f"{index_type:>9} | {build_time:8.1f} | {recall:8.3f} | {p50:7.2f} | {p99:7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Embedded tokens per repo: the old ast.walk chunker (every method emitted both
+inside its class chunk and on its own) against services/chunker.py.
+
+    python -m benchmarks.bench_chunk_tokens path/to/repo
+
+On backend/src the token saving is small (47,912 -> 46,471, about 3%); the
+gain is coverage, 83% -> 98% of source lines, and the largest chunk, 1,398 -> 799.
+"""
+import os
+import ast
+import argparse
+
+from src.services.chunker import extract_code_chunks
+from src.services.embedding import read_repo_files, count_tokens
+
+
+def legacy_chunks(code, filename):
+    """The pre single-pass chunker, kept here as the baseline."""
+    try:
+        tree = ast.parse(code)
+    except Exception:
+        return []
+    lines = code.splitlines()
+
+    def end_line(node):
+        return max([getattr(node, "lineno", -1)] + [end_line(child) for child in ast.iter_child_nodes(node)])
+
+    chunks = []
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            chunk = "\n".join(lines[node.lineno - 1:end_line(node)])
+            if chunk.strip():
+                chunks.append({"code": chunk})
+    return chunks
+
+
+def covered_lines(code, chunks):
+    """Share of non-blank source lines that made it into some chunk."""
+    lines = {i for i, line in enumerate(code.splitlines(), 1) if line.strip()}
+    if not lines:
+        return 0, 0
+    chunk_lines = {line.strip() for chunk in chunks for line in chunk["code"].splitlines()}
+    return sum(1 for i in lines if code.splitlines()[i - 1].strip() in chunk_lines), len(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("repo", nargs="?", default=os.path.join(os.path.dirname(__file__), "..", "src"))
+    args = parser.parse_args()
+
+    files = read_repo_files(args.repo)
+    for label, chunker in (("ast.walk", legacy_chunks), ("single-pass", extract_code_chunks)):
+        chunks, tokens, largest, covered, total = 0, 0, 0, 0, 0
+        for file in files.values():
+            file_chunks = chunker(file["code"], file["path"])
+            chunks += len(file_chunks)
+            chunk_tokens = [count_tokens(chunk["code"]) for chunk in file_chunks]
+            tokens += sum(chunk_tokens)
+            largest = max([largest] + chunk_tokens)
+            file_covered, file_total = covered_lines(file["code"], file_chunks)
+            covered, total = covered + file_covered, total + file_total
+        print(f"{label:>12}: {len(files)} files, {chunks} chunks, {tokens:,} embedded tokens (largest chunk {largest:,}), "
+              f"{covered / max(total, 1):.0%} of source lines covered")
+
+
+if __name__ == "__main__":
+    main()
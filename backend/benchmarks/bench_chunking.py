@@ -0,0 +1,91 @@
+"""
+Files/sec of chunk_repo on a synthetic repo, serial vs. the process pool at
+increasing worker counts (capped at the core count). The pool is kept for the
+life of the process, so its start-up (each spawned worker re-imports this
+script and the embedding stack) is timed on a warm-up call and reported apart.
+Output chunks are checked to match the serial run.
+
+    python -m benchmarks.bench_chunking --files 10000 --workers 1 2 4 8 16
+"""
+import os
+import time
+import argparse
+import tempfile
+
+from src.core.config import settings
+from src.services.embedding import chunk_repo
+
+
+MODULE = '''"""Synthetic module {i}."""
+import os
+
+
+class Service{i}:
+    """Handles things for module {i}."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def run(self, items):
+        total = 0
+        for item in items:
+            if item % 3 == 0:
+                total += item * {i}
+            else:
+                total -= item
+        return total
+
+
+def helper_{i}(a, b):
+    """Add two numbers."""
+    return a + b + {i}
+
+
+async def fetch_{i}(client, url):
+    response = await client.get(url)
+    return response.json()
+'''
+
+
+def build(tmp, files):
+    for i in range(files):
+        package = os.path.join(tmp, f"pkg_{i // 100}")
+        os.makedirs(package, exist_ok=True)
+        with open(os.path.join(package, f"module_{i}.py"), "w") as f:
+            f.write(MODULE.format(i=i))
+
+
+def signature(chunks):
+    return [(chunk["relpath"], chunk["name"], chunk["code"]) for chunk in chunks]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=10_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, os.cpu_count()])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        build(tmp, args.files)
+        print(f"{args.files} files, {os.cpu_count()} cores")
+        # measure the pool whatever the repo size
+        settings.CHUNK_PARALLEL_MIN_FILES = 0
+
+        baseline = None
+        for workers in sorted({min(workers, os.cpu_count()) for workers in args.workers}):
+            if workers > 1:
+                start = time.perf_counter()
+                chunk_repo(tmp, workers=workers)
+                print(f"{workers:>3} workers: first call, pool start-up included, {time.perf_counter() - start:.2f}s")
+            start = time.perf_counter()
+            chunks = chunk_repo(tmp, workers=workers)
+            elapsed = time.perf_counter() - start
+            if baseline is None:
+                baseline = (elapsed, signature(chunks))
+            assert signature(chunks) == baseline[1], "chunk output differs from the serial run"
+            print(f"{workers:>3} workers: {len(chunks)} chunks in {elapsed:.2f}s "
+                  f"-> {args.files / elapsed:,.0f} files/sec (x{baseline[0] / elapsed:.2f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Files/sec of DB module detection on a synthetic repo of --files source files
+(mostly plain code, some ORM models, some files only the AST can decide, plus
+ORM models in JavaScript, TypeScript, Java, Go, SQL and Prisma): the old
+is_db_file + uses_database_ast (every keyword per file, every undecided file
+read and parsed again) vs. find_db_modules (one pattern per buffer, AST checks
+of the remaining candidates only, across --workers processes).
+
+    python -m benchmarks.bench_db_detection --files 5000 --workers 4
+"""
+import os
+import ast
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+PLAIN = '''import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Handler_{i}:
+    """Validates a payload and renders the response."""
+
+    def __init__(self, options):
+        self.options = options
+
+    def validate(self, payload):
+        if not isinstance(payload, dict):
+            raise ValueError("payload must be an object")
+        return {{key: value for key, value in payload.items() if value is not None}}
+
+    def render(self, payload):
+        logger.info("rendering %s", self.options)
+        return json.dumps(self.validate(payload), indent=2)
+''' * 4
+HINT_ONLY = PLAIN + '''
+
+def evaluate_{i}(model, batches):
+    return [train_step(model, batch) for batch in batches]
+'''
+SQLALCHEMY = '''from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy.orm import declarative_base, relationship
+
+Base = declarative_base()
+
+
+class Order_{i}(Base):
+    __tablename__ = "orders_{i}"
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    status = Column(String(20), nullable=False)
+'''
+DJANGO = '''from django.db import models as m
+
+
+class Invoice_{i}(m.Model):
+    number = m.CharField(max_length=20)
+'''
+OTHER_LANGUAGES = {
+    "js": "const mongoose = require('mongoose');\nconst Order{i} = new mongoose.Schema({{ total: Number }});\n",
+    "ts": "import {{ Entity, Column }} from 'typeorm';\n@Entity()\nexport class Order{i} {{ @Column() total: number; }}\n",
+    "java": "import jakarta.persistence.*;\n@Entity\n@Table(name = \"orders_{i}\")\npublic class Order{i} {{ @Id Long id; }}\n",
+    "go": "package models\nimport \"gorm.io/gorm\"\ntype Order{i} struct {{ gorm.Model\n Total float64 }}\n",
+    "sql": "CREATE TABLE orders_{i} (id INTEGER PRIMARY KEY, total REAL);\n",
+    "prisma": "model Order{i} {{\n  id Int @id\n  total Float\n}}\n",
+}
+
+
+def write_repo(root, files):
+    for i in range(files):
+        kind = i % 20
+        if kind < 6:
+            extension = list(OTHER_LANGUAGES)[kind]
+            if i % 100 < 20:
+                path, content = f"web/file_{i}.{extension}", OTHER_LANGUAGES[extension]
+            else:
+                # most non-Python files have nothing to do with the database
+                path, content = f"web/file_{i}.js", "export const view{i} = () => {i};\n" * 40
+        else:
+            path = f"app/module_{i % 50}/file_{i}.py"
+            content = SQLALCHEMY if kind == 6 else DJANGO if kind == 7 else HINT_ONLY if kind < 10 else PLAIN
+        os.makedirs(os.path.join(root, os.path.dirname(path)), exist_ok=True)
+        with open(os.path.join(root, path), "w") as f:
+            f.write(content.format(i=i))
+
+
+def legacy_find_db_modules(folder_path):
+    """The per-keyword, re-reading detector, kept here as the baseline."""
+    from src.services.db_detector import DB_KEYWORDS
+
+    def is_db_file(file_path):
+        content = file_path.read_text(encoding="utf-8", errors="ignore").lower()
+        return any(keyword in content for keyword in DB_KEYWORDS)
+
+    def uses_database_ast(file_path):
+        try:
+            tree = ast.parse(file_path.read_text(encoding="utf-8", errors="ignore"))
+        except Exception:
+            return False
+        for node in ast.walk(tree):
+            if isinstance(node, ast.ImportFrom) and node.module and ("sqlalchemy" in node.module or "django.db" in node.module):
+                return True
+            if isinstance(node, ast.ClassDef) and any(isinstance(base, ast.Name) and base.id in {"Base", "Model"} for base in node.bases):
+                return True
+            if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in {"create_engine", "connect", "Column", "execute"}:
+                return True
+        return False
+
+    return [path for path in Path(folder_path).resolve().rglob("*.py") if is_db_file(path) or uses_database_ast(path)]
+
+
+def report(label, files, megabytes, elapsed, found):
+    print(f"{label:>28}: {files / elapsed:>9,.0f} files/s, {megabytes / elapsed:6.1f} MB/s, {len(found)} DB files")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processes for the AST checks")
+    args = parser.parse_args()
+
+    repo = os.path.join(tempfile.mkdtemp(), "repo")
+    write_repo(repo, args.files)
+    from src.core.config import settings
+    from src.services.repo_scanner import scan_repo
+    from src.services.db_detector import find_db_modules, match_db_patterns
+
+    manifest = scan_repo(repo)
+    python = manifest.select(extensions=[".py"])
+    megabytes = sum(file.size for file in python) / 1e6
+
+    start = time.perf_counter()
+    legacy = legacy_find_db_modules(repo)
+    report("legacy (Python only)", len(python), megabytes, time.perf_counter() - start, legacy)
+
+    for workers in sorted({1, args.workers}):
+        manifest = scan_repo(repo)
+        start = time.perf_counter()
+        found = find_db_modules(repo, [".py"], manifest, workers=workers)
+        report(f"find_db_modules, {workers} worker(s)", len(python), megabytes, time.perf_counter() - start, found)
+    assert sorted(file.path for file in found) == sorted(str(path) for path in legacy), "detectors disagree"
+
+    files = manifest.select(extensions=settings.DB_DETECT_EXTENSIONS)
+    undecided = sum(match_db_patterns(file.content, file.language) is None for file in python)
+    start = time.perf_counter()
+    found = find_db_modules(repo, manifest=manifest, workers=args.workers)
+    report("find_db_modules, all langs", len(files), sum(file.size for file in files) / 1e6, time.perf_counter() - start, found)
+    by_language = {}
+    for file in found:
+        by_language[file.language] = by_language.get(file.language, 0) + 1
+    print(f"{undecided} of {len(python)} Python files needed the AST check, DB files by language: {by_language}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Compares chunks/sec for one-request-per-chunk embedding against the batched
+embedder in services/embedding.py, using a local fake embeddings server.
+
+    python -m benchmarks.bench_embedding_batching --chunks 2000 --latency 0.02
+"""
+import os
+import time
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from openai import OpenAI
+
+from .fake_openai import FakeOpenAIServer
+from src.services import embedding
+from src.services.embedding_cache import EmbeddingCache
+
+
+def synthetic_chunks(n):
+    return [
+        {
+            "filename": f"pkg/module_{i // 10}.py",
+            "name": f"func_{i}",
+            "code": f"def func_{i}(a, b):\n    \"\"\"Add two numbers.\"\"\"\n    return a + b + {i}\n" * 5,
+        }
+        for i in range(n)
+    ]
+
+
+def embed_chunk(chunk):
+    """The old one-request-per-chunk embedder, kept here as the baseline."""
+    model = embedding.settings.OPENAI_EMBEDDINGS_MODEL
+    try:
+        vector = embedding.embedding_cache.get_many(model, [chunk["code"]])[0]
+        if vector is None:
+            vector = embedding.get_embedding(chunk["code"])
+            embedding.embedding_cache.put_many(model, [chunk["code"]], [vector])
+        return True
+    except Exception:
+        return False
+
+
+def run_single(chunks):
+    with ThreadPoolExecutor(max_workers=embedding.settings.EMBEDDING_MAX_WORKERS) as executor:
+        return sum(executor.map(embed_chunk, chunks))
+
+
+def run_batched(chunks):
+    return sum(1 for e in embedding.embed_chunks(chunks) if e is not None)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds per request")
+    args = parser.parse_args()
+
+    chunks = synthetic_chunks(args.chunks)
+    with FakeOpenAIServer(latency=args.latency) as server, tempfile.TemporaryDirectory() as tmp:
+        embedding.client = OpenAI(base_url=server.url, api_key="fake")
+
+        runs = (("single", run_single, "single"), ("batched", run_batched, "batched"), ("cached", run_batched, "batched"))
+        for label, fn, cache_name in runs:
+            embedding.embedding_cache = EmbeddingCache(os.path.join(tmp, f"{cache_name}.sqlite3"), 2 * 1024 ** 3)
+            server.requests = 0
+            start = time.perf_counter()
+            embedded = fn(chunks)
+            elapsed = time.perf_counter() - start
+            print(f"{label:>8}: {embedded} chunks in {elapsed:.2f}s "
+                  f"-> {embedded / elapsed:,.0f} chunks/sec ({server.requests} requests)")
+
+
+if __name__ == "__main__":
+    main()
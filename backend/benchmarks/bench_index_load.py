@@ -0,0 +1,90 @@
+"""
+Cold-start cost of opening an index version: a private in-memory load
+(faiss.read_index + pickled metadata, the old layout) against the
+memory-mapped index and chunk store the retriever now uses.
+
+    python -m benchmarks.bench_index_load --vectors 200000 --dim 1536
+"""
+import os
+import time
+import pickle
+import argparse
+import tempfile
+import subprocess
+import sys
+
+import faiss
+import numpy as np
+
+from src.services.chunk_store import write_chunk_store
+from src.services.lexical_index import write_lexical_index
+
+
+def build(tmp, vectors, dim):
+    index = faiss.IndexIDMap2(faiss.IndexFlatL2(dim))
+    step = 10_000
+    for start in range(0, vectors, step):
+        n = min(step, vectors - start)
+        index.add_with_ids(np.random.rand(n, dim).astype("float32"), np.arange(start, start + n, dtype="int64"))
+    faiss.write_index(index, os.path.join(tmp, "index.faiss"))
+    with open(os.path.join(tmp, "index.json"), "w") as f:
+        f.write('{"index_type": "flat"}')
+    chunks = {i: {"filename": f"pkg/module_{i // 20}.py", "name": f"func_{i}", "code": "x = 1\n" * 40}
+              for i in range(vectors)}
+    write_chunk_store(tmp, chunks)
+    write_lexical_index(tmp, chunks)
+    with open(os.path.join(tmp, "index.pkl"), "wb") as f:
+        pickle.dump(chunks, f)
+
+
+def anonymous_mb():
+    """Anonymous (non file-backed) memory of this process: what each worker holds privately."""
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            if line.startswith("Anonymous:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def load(tmp, mode, dim):
+    """Runs in a fresh interpreter so memory numbers aren't polluted by the build step."""
+    from src.tools.retriever import load_index_version
+
+    query = np.random.rand(1, dim).astype("float32")
+    before = anonymous_mb()
+    start = time.perf_counter()
+    if mode == "mmap":
+        index, docs, _ = load_index_version(tmp)
+    else:
+        index = faiss.read_index(os.path.join(tmp, "index.faiss"))
+        with open(os.path.join(tmp, "index.pkl"), "rb") as f:
+            docs = pickle.load(f)
+    opened = time.perf_counter() - start
+    _, ids = index.search(query, 5)
+    [docs[int(i)] for i in ids[0]]
+    first_query = time.perf_counter() - start
+    print(f"{mode:>7}: open {opened * 1000:8.1f} ms | open + first query {first_query * 1000:8.1f} ms | "
+          f"private memory +{anonymous_mb() - before:,.0f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vectors", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--load", choices=["mmap", "private"])
+    parser.add_argument("--dir")
+    args = parser.parse_args()
+
+    if args.load:
+        load(args.dir, args.load, args.dim)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        build(tmp, args.vectors, args.dim)
+        for mode in ("private", "mmap"):
+            subprocess.run([sys.executable, "-m", "benchmarks.bench_index_load", "--load", mode, "--dir", tmp,
+                            "--dim", str(args.dim)], check=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Wall-clock time, LLM calls and largest prompt of PRD generation on a synthetic
+repo (--services top-level services of --dirs directories of --files files):
+the old sequential loop with every file summary in one final prompt vs. the
+concurrent map-reduce generate_prd, against a local fake OpenAI server. The
+map-reduce then regenerates with an unchanged repo and after editing --changed
+files of one directory, showing the summary cache hit ratio and LLM calls saved.
+
+    python -m benchmarks.bench_prd --services 4 --dirs 5 --files 10 --latency 0.2 --workers 16 --changed 3
+"""
+import os
+import time
+import argparse
+import tempfile
+import threading
+
+from .fake_openai import FakeOpenAIServer
+
+
+def write_repo(root, services, dirs, files):
+    for s in range(services):
+        for d in range(dirs):
+            folder = os.path.join(root, f"service_{s}", f"module_{d}")
+            os.makedirs(folder, exist_ok=True)
+            for f in range(files):
+                with open(os.path.join(folder, f"file_{f}.py"), "w") as out:
+                    out.write(f"def handler_{s}_{d}_{f}(request):\n    return {{'ok': True}}\n" * 20)
+
+
+def legacy_generate_prd(folder_path, complete):
+    """The sequential generate_prd, kept here as the baseline."""
+    from src.services.prd import get_developer_files, file_summary_prompt, prd_prompt
+
+    summaries = []
+    for one_file in get_developer_files(folder_path):
+        content = one_file.content
+        summaries.append(f"{one_file.path} : {complete(file_summary_prompt.format(content=content, file_name=one_file.path))}")
+    return complete(prd_prompt.format(summaries=summaries))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--services", type=int, default=4)
+    parser.add_argument("--dirs", type=int, default=5)
+    parser.add_argument("--files", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per LLM call")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--changed", type=int, default=3, help="files edited before the last regeneration")
+    parser.add_argument("--skip-legacy", action="store_true")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    repo = os.path.join(tmp, "repo")
+    write_repo(repo, args.services, args.dirs, args.files)
+    summary = "This module implements request handlers that validate input and return JSON responses. " * 6
+    with FakeOpenAIServer(latency=args.latency, chat_reply=summary) as server:
+        os.environ["OPENAI_BASE_URL"] = server.url
+        os.environ["PRD_MAX_WORKERS"] = str(args.workers)
+        os.environ["SUMMARY_CACHE_PATH"] = os.path.join(tmp, "summaries.sqlite3")
+        from src.services import prd
+        from src.services.summary_cache import SummaryStats
+        from src.services.chunker import count_tokens
+
+        original = prd._complete
+        largest = []
+        lock = threading.Lock()
+
+        def complete(prompt, kind, stats=None):
+            with lock:
+                largest.append(count_tokens(prompt))
+            return original(prompt, kind, stats)
+        prd._complete = complete
+
+        def uncached_complete(prompt):
+            largest.append(count_tokens(prompt))
+            return prd.client.responses.create(model="gpt-4.1", input=prompt).output_text
+
+        def edit_files():
+            folder = os.path.join(repo, "service_0", "module_0")
+            for f in range(args.changed):
+                with open(os.path.join(folder, f"file_{f}.py"), "a") as out:
+                    out.write("\ndef added_later():\n    return None\n")
+
+        stats = SummaryStats()
+        runs = [("sequential", lambda: legacy_generate_prd(repo, uncached_complete), None)] if not args.skip_legacy else []
+        runs += [("map-reduce", lambda: prd.generate_prd(repo, stats=stats), None),
+                 ("unchanged", lambda: prd.generate_prd(repo, stats=stats), None),
+                 (f"{args.changed} edited", lambda: prd.generate_prd(repo, stats=stats), edit_files)]
+        for label, run, before in runs:
+            if before:
+                before()
+            server.requests = 0
+            largest.clear()
+            stats.__init__()
+            start = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - start
+            cache = ""
+            if label != "sequential":
+                report = stats.report()
+                cache = f", cache hit ratio {report['hit_ratio']:.2f} ({report['llm_calls_saved']} calls saved)"
+            print(f"{label:>10}: {elapsed:.1f}s, {server.requests} LLM calls, largest prompt {max(largest):,} tokens "
+                  f"({args.services * args.dirs * args.files} files){cache}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Embedding throughput and dropped chunks against a throttling API: the old
+path (5 threads, SDK retries plus a short retry loop, bisecting failed batches)
+vs. embed_chunks through the shared request scheduler (token buckets, AIMD
+concurrency, jittered retries honouring retry-after-ms). The local fake server
+answers 429 past --rate requests per --window seconds or --concurrency requests in flight.
+
+    python -m benchmarks.bench_rate_limits --chunks 4000 --batch 16 --rate 20 --concurrency 4
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .fake_openai import FakeOpenAIServer
+
+
+def legacy_embed_chunks(chunks, batch_size):
+    """The pre-scheduler embedding path, kept here as the baseline."""
+    from openai import OpenAI, BadRequestError
+
+    client = OpenAI()
+
+    def embed_with_retry(texts, retries=3):
+        for attempt in range(retries + 1):
+            try:
+                response = client.embeddings.create(input=texts, model="text-embedding-3-small")
+                return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+            except BadRequestError:
+                raise
+            except Exception:
+                if attempt == retries:
+                    raise
+                time.sleep(min(2 ** attempt, 30) * random.uniform(0.5, 1.5))
+
+    def embed_batch(batch):
+        try:
+            return [(position, embedding) for (position, _), embedding in
+                    zip(batch, embed_with_retry([chunk["code"] for _, chunk in batch]))]
+        except Exception:
+            if len(batch) == 1:
+                return [(batch[0][0], None)]
+            mid = len(batch) // 2
+            return embed_batch(batch[:mid]) + embed_batch(batch[mid:])
+
+    embeddings = [None] * len(chunks)
+    batches = [list(enumerate(chunks))[i:i + batch_size] for i in range(0, len(chunks), batch_size)]
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        for future in as_completed([executor.submit(embed_batch, batch) for batch in batches]):
+            for position, embedding in future.result():
+                embeddings[position] = embedding
+    return embeddings
+
+
+def run(label, server, chunks, embed):
+    server.requests, server.throttled, server.max_in_flight = 0, 0, 0
+    start = time.perf_counter()
+    embeddings = embed(chunks)
+    elapsed = time.perf_counter() - start
+    embedded = sum(embedding is not None for embedding in embeddings)
+    print(f"{label:>10}: {embedded / elapsed:,.0f} chunks/s, {len(chunks) - embedded} of {len(chunks)} chunks dropped, "
+          f"{server.requests} requests ({server.throttled} throttled), max {server.max_in_flight} in flight, {elapsed:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=4000)
+    parser.add_argument("--batch", type=int, default=16)
+    parser.add_argument("--rate", type=int, default=20, help="requests per window the fake API accepts")
+    parser.add_argument("--window", type=float, default=1.0, help="rate limit window in seconds")
+    parser.add_argument("--concurrency", type=int, default=4, help="requests in flight the fake API accepts")
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    chunks = [{"code": f"def f_{i}():\n    return {i}", "filename": f"f{i}.py", "name": f"f_{i}"} for i in range(args.chunks)]
+    with FakeOpenAIServer(latency=args.latency, rate_limit=args.rate, rate_window=args.window, max_concurrency=args.concurrency) as server:
+        os.environ["OPENAI_BASE_URL"] = server.url
+        os.environ["OPENAI_API_BASE"] = server.url
+        os.environ["EMBEDDING_BATCH_SIZE"] = str(args.batch)
+        # a fresh cache, so every chunk goes to the API
+        os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(tmp, "embeddings.sqlite3")
+        from src.services import embedding
+
+        run("legacy", server, chunks, lambda chunks: legacy_embed_chunks(chunks, args.batch))
+        run("scheduler", server, chunks, embedding.embed_chunks)
+        scheduler = embedding.client._client._transport.scheduler
+        print(f"scheduler: {scheduler.retries} retries, concurrency limit settled at {scheduler.concurrency.limit:.1f}")
+
+
+if __name__ == "__main__":
+    main()
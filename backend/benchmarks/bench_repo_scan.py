@@ -0,0 +1,150 @@
+"""
+Directory entries visited, files opened, bytes read and wall-clock time of the
+file access of one ingestion (chunking, PRD files, DB detection, code summaries)
+on a synthetic repo with a large node_modules and .git: the old per-stage walks
+vs. one pruned, .gitignore-aware scan_repo shared by every stage. Only the
+file system work is measured, no chunking, embedding or LLM calls.
+
+    python -m benchmarks.bench_repo_scan --files 500 --packages 2000
+"""
+import os
+import ast
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+SOURCE = "def handler_{i}(request):\n    return {{'ok': True, 'id': {i}}}\n" * 20
+MODEL = "from sqlalchemy import Column, Integer\n\nclass Order_{i}(Base):\n    id = Column(Integer, primary_key=True)\n"
+
+
+def write_repo(root, files, packages):
+    def write(path, text):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+
+    for i in range(files):
+        write(os.path.join(root, "app", f"module_{i % 20}", f"file_{i}.py"), (MODEL if i % 25 == 0 else SOURCE).format(i=i))
+        if i % 10 == 0:
+            write(os.path.join(root, "docs", f"page_{i}.md"), f"# Page {i}\n" + "Some documentation.\n" * 30)
+            write(os.path.join(root, "web", f"view_{i}.js"), f"export const view{i} = () => {i};\n" * 20)
+    for p in range(packages):
+        package = os.path.join(root, "node_modules", f"package_{p}")
+        write(os.path.join(package, "package.json"), '{"name": "package_%d", "version": "1.0.0"}\n' % p)
+        write(os.path.join(package, "README.md"), "# package\n" + "Usage notes.\n" * 100)
+        for f in range(6):
+            write(os.path.join(package, "lib", f"index_{f}.js"), "module.exports = function () { return 1; };\n" * 60)
+        if p % 10 == 0:
+            # native addons ship python build scripts, the old walks read those too
+            write(os.path.join(package, "gyp", "build.py"), SOURCE.format(i=p))
+    for o in range(packages // 2):
+        write(os.path.join(root, ".git", "objects", f"{o % 256:02x}", f"object_{o}"), "x" * 512)
+    for b in range(20):
+        write(os.path.join(root, "dist", f"bundle_{b}.js"), "var a=1;" * 20_000)
+    write(os.path.join(root, ".gitignore"), "node_modules/\ndist/\n*.log\n")
+
+
+class Counter:
+    def __init__(self):
+        self.entries, self.files_read, self.bytes_read = 0, 0, 0
+
+    def read(self, path):
+        with open(path, encoding="utf-8", errors="ignore") as f:
+            content = f.read()
+        self.files_read += 1
+        self.bytes_read += os.path.getsize(path)
+        return content
+
+    def walk(self, root):
+        for directory, dirnames, filenames in os.walk(root):
+            self.entries += len(dirnames) + len(filenames)
+            yield directory, dirnames, filenames
+
+    def rglob(self, root):
+        for path in Path(root).resolve().rglob("*"):
+            self.entries += 1
+            yield path
+
+
+def legacy_ingestion(repo):
+    """The file access of the old stages, each walking and reading on its own."""
+    counter = Counter()
+    # chunk_repo / read_repo_files
+    for directory, _, names in counter.walk(repo):
+        for name in names:
+            if name.endswith(".py"):
+                counter.read(os.path.join(directory, name))
+    # get_developer_files, then summarize_file reads each one
+    for path in counter.rglob(repo):
+        if path.is_file() and not any(part.startswith(".") for part in path.parts) \
+                and path.suffix.lower() in [".py", ".ipynb", ".txt", ".md", ".html", ".js"] \
+                and "__pycache__" not in path.parts and path.name != "__init__.py":
+            counter.read(path)
+    # find_db_modules: is_db_file, then uses_database_ast reads the file again
+    from src.services.db_detector import DB_KEYWORDS
+    for path in counter.rglob(repo):
+        if not path.is_file() or path.suffix != ".py" or any(part.startswith(".") for part in path.parts):
+            continue
+        if not any(keyword in counter.read(path).lower() for keyword in DB_KEYWORDS):
+            try:
+                ast.parse(counter.read(path))
+            except SyntaxError:
+                pass
+    # summarize_codebase
+    for directory, _, names in counter.walk(repo):
+        for name in names:
+            if name.endswith(".py"):
+                counter.read(os.path.join(directory, name))
+    return counter
+
+
+def scanned_ingestion(repo):
+    """The same stages reading from one shared scan."""
+    from src.services.repo_scanner import scan_repo
+    from src.services.embedding import read_repo_files
+    from src.services.prd import get_developer_files, find_db_modules
+
+    start = time.perf_counter()
+    manifest = scan_repo(repo)
+    scan_time = time.perf_counter() - start
+    read_repo_files(repo, manifest)
+    for file in get_developer_files(repo, manifest=manifest):
+        file.content
+    find_db_modules(repo, manifest=manifest)
+    for file in manifest.select(language="python"):
+        file.content
+    return manifest, scan_time
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=500, help="source files of the app itself")
+    parser.add_argument("--packages", type=int, default=2000, help="packages in node_modules")
+    args = parser.parse_args()
+
+    repo = os.path.join(tempfile.mkdtemp(), "repo")
+    write_repo(repo, args.files, args.packages)
+    # imported up front, so neither run pays for the imports
+    import src.services.prd, src.services.embedding  # noqa: F401
+
+    start = time.perf_counter()
+    legacy = legacy_ingestion(repo)
+    legacy_time = time.perf_counter() - start
+    print(f"    legacy: {legacy.entries:,} directory entries, {legacy.files_read:,} files opened, "
+          f"{legacy.bytes_read / 1024 ** 2:,.1f} MiB read, {legacy_time * 1000:,.0f}ms")
+
+    start = time.perf_counter()
+    manifest, walk_time = scanned_ingestion(repo)
+    scan_time = time.perf_counter() - start
+    stats = manifest.stats
+    print(f"scan_repo: {stats['files_seen'] + stats['dirs_visited'] - 1 + stats['dirs_pruned']:,} directory entries "
+          f"({stats['dirs_pruned']} directories pruned), {stats['files_read']:,} files opened, "
+          f"{stats['bytes_read'] / 1024 ** 2:,.1f} MiB read, {scan_time * 1000:,.0f}ms "
+          f"(the walk itself {walk_time * 1000:,.0f}ms)")
+    print(f"{legacy.files_read / max(1, stats['files_read']):.1f}x fewer opens, "
+          f"{legacy.bytes_read / max(1, stats['bytes_read']):.1f}x fewer bytes, {legacy_time / scan_time:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
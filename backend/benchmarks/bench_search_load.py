@@ -0,0 +1,91 @@
+"""
+Concurrent /search throughput of one uvicorn worker: the old blocking path
+(agent.invoke and a synchronous retriever inside the async route) against the
+async path (ainvoke, async retriever tool, FAISS search in a thread pool).
+Both answer through a fake OpenAI endpoint with fixed latency.
+
+    python -m benchmarks.bench_search_load --concurrency 1 8 32 --requests 64
+"""
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+import threading
+import statistics
+
+import httpx
+
+from .fake_openai import FakeOpenAIServer
+from .bench_search_stream import ANSWER, free_port, write_repo
+
+
+async def load(base_url, path, concurrency, requests):
+    latencies = []
+    questions = iter(range(requests))
+
+    async def user(client):
+        for i in questions:
+            start = time.perf_counter()
+            response = await client.post(path, json={"question": f"{path} {concurrency} question {i}"})
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=300,
+                                 limits=httpx.Limits(max_connections=concurrency)) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(user(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return requests / elapsed, statistics.median(latencies), statistics.quantiles(latencies, n=100)[98]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.1, help="seconds per OpenAI call")
+    args = parser.parse_args()
+
+    import json
+    with tempfile.TemporaryDirectory() as tmp, \
+            FakeOpenAIServer(latency=args.latency, chat_reply=json.dumps(ANSWER),
+                             tool_arguments={"concised_question": "how are users created", "top_k": 3}) as server:
+        os.chdir(tmp)
+        os.environ["OPENAI_BASE_URL"] = server.url
+        os.environ["OPENAI_API_BASE"] = server.url
+        os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(tmp, "embeddings.sqlite3")
+        os.environ["ANSWER_CACHE_SIZE"] = "0"
+
+        import uvicorn
+        from fastapi import Request
+        from src.main import app
+        from src.app import SearchRequst
+        from src.agents import chat
+        from src.services.embedding import embed_documents
+
+        @app.post("/legacy_search")
+        async def legacy_search(request: Request, search_request: SearchRequst):
+            # the pre-async route: blocking agent.invoke inside an async handler
+            return chat.parse_agent_output(chat.run_chat_agent(search_request.question)["output"])
+
+        write_repo(os.path.join(tmp, "repo"))
+        embed_documents(os.path.join(tmp, "repo"))
+
+        port = free_port()
+        uvicorn_server = uvicorn.Server(uvicorn.Config(app, port=port, log_level="warning"))
+        threading.Thread(target=uvicorn_server.run, daemon=True).start()
+        while not uvicorn_server.started:
+            time.sleep(0.05)
+        chat.get_chat_agent().verbose = False
+
+        base_url = f"http://127.0.0.1:{port}"
+        for concurrency in args.concurrency:
+            for label, path in (("blocking", "/legacy_search"), ("async", "/api/search")):
+                throughput, p50, p99 = asyncio.run(load(base_url, path, concurrency, args.requests))
+                print(f"concurrency {concurrency:>3} {label:>9}: {throughput:6.1f} req/s, "
+                      f"p50 {p50 * 1000:,.0f}ms, p99 {p99 * 1000:,.0f}ms")
+        uvicorn_server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
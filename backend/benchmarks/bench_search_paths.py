@@ -0,0 +1,79 @@
+"""
+p50 / p99 latency and LLM calls of /search on the fast path (one retrieval,
+one LLM call with the context in the prompt) vs. the tool-calling agent, over
+a small indexed repo and a local fake OpenAI server. Also shows which path the
+"auto" heuristic picks for a few typical questions.
+
+    python -m benchmarks.bench_search_paths --requests 50 --latency 0.3
+"""
+import os
+import json
+import time
+import argparse
+import tempfile
+import statistics
+
+from .fake_openai import FakeOpenAIServer
+from .bench_search_stream import write_repo
+
+QUESTIONS = [
+    "where is create_user defined?",
+    "create_user",
+    "which file validates the payload?",
+    "how do I add a new payment gateway and wire it into checkout?",
+    "why does saving a user sometimes fail after validation passes?",
+]
+
+
+def run(client, server, mode, requests):
+    from src.app import answer_cache
+
+    server.requests = 0
+    latencies, paths = [], {}
+    for i in range(requests):
+        # same question (its embedding is memoized on both paths), no answer cache, a new session each time
+        answer_cache.clear()
+        start = time.perf_counter()
+        response = client.post("/api/search", json={"question": "where are users created?", "mode": mode},
+                               headers={"X-Session-ID": f"{mode}-{i}"})
+        latencies.append(time.perf_counter() - start)
+        path = response.headers["X-Search-Path"]
+        paths[path] = paths.get(path, 0) + 1
+    ms = lambda q: statistics.quantiles(latencies, n=100)[q - 1] * 1000
+    print(f"{mode:>6}: p50 {ms(50):.0f}ms p99 {ms(99):.0f}ms, "
+          f"{server.requests / requests:.1f} OpenAI calls per request, paths {paths}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds per OpenAI call")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    reply = json.dumps({"answer": "`create_user` in users/service.py", "related_files": ["users/service.py"]})
+    with FakeOpenAIServer(latency=args.latency, chat_reply=reply,
+                          tool_arguments={"concised_question": "where are users created", "top_k": 3}) as server:
+        os.chdir(tmp)
+        os.environ["OPENAI_BASE_URL"] = server.url
+        os.environ["OPENAI_API_BASE"] = server.url
+        os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(tmp, "embedding_cache.sqlite3")
+        from fastapi.testclient import TestClient
+        from src.main import app
+        from src.services.embedding import embed_documents
+        from src.agents.chat import choose_search_path
+
+        for question in QUESTIONS:
+            print(f"auto -> {choose_search_path(question, 'auto'):>5}: {question}")
+
+        write_repo(os.path.join(tmp, "repo"))
+        embed_documents(os.path.join(tmp, "repo"))
+        with TestClient(app) as client:
+            from src.agents import chat
+            chat.get_chat_agent().verbose = False
+            for mode in ("agent", "fast"):
+                run(client, server, mode, args.requests)
+
+
+if __name__ == "__main__":
+    main()
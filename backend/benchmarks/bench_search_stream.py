@@ -0,0 +1,97 @@
+"""
+Time to first answer token of /search (the whole answer, as JSON) against
+/search/stream (server-sent events), served by uvicorn against a small index
+and a fake OpenAI endpoint that streams the answer a word at a time.
+
+    python -m benchmarks.bench_search_stream --questions 10 --token-latency 0.01
+"""
+import os
+import json
+import time
+import socket
+import argparse
+import tempfile
+import threading
+import statistics
+
+import httpx
+
+from .fake_openai import FakeOpenAIServer
+
+ANSWER = {"answer": " ".join(["Users are created in create_user, which validates the payload first."] * 12),
+          "related_files": ["users/service.py"]}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def write_repo(path):
+    os.makedirs(os.path.join(path, "users"), exist_ok=True)
+    with open(os.path.join(path, "users", "service.py"), "w") as f:
+        f.write("def create_user(payload):\n    validate(payload)\n    return save(payload)\n\n\n"
+                "def validate(payload):\n    assert payload\n")
+
+
+def search(client, question):
+    start = time.perf_counter()
+    response = client.post("/api/search", json={"question": question})
+    response.raise_for_status()
+    elapsed = time.perf_counter() - start
+    return elapsed, elapsed
+
+
+def search_stream(client, question):
+    start = time.perf_counter()
+    first_token = None
+    with client.stream("POST", "/api/search/stream", json={"question": question}) as response:
+        for line in response.iter_lines():
+            if line == "event: token" and first_token is None:
+                first_token = time.perf_counter() - start
+            if line == "event: error":
+                raise RuntimeError(next(response.iter_lines()))
+    return first_token, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds before each LLM response starts")
+    parser.add_argument("--token-latency", type=float, default=0.01, help="seconds between streamed words")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, \
+            FakeOpenAIServer(latency=args.latency, token_latency=args.token_latency, chat_reply=json.dumps(ANSWER),
+                             tool_arguments={"concised_question": "how are users created", "top_k": 3}) as server:
+        os.chdir(tmp)
+        os.environ["OPENAI_BASE_URL"] = server.url
+        os.environ["OPENAI_API_BASE"] = server.url
+        os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(tmp, "embeddings.sqlite3")
+
+        import uvicorn
+        from src.main import app
+        from src.agents import chat
+        from src.services.embedding import embed_documents
+
+        write_repo(os.path.join(tmp, "repo"))
+        embed_documents(os.path.join(tmp, "repo"))
+
+        port = free_port()
+        uvicorn_server = uvicorn.Server(uvicorn.Config(app, port=port, log_level="warning"))
+        threading.Thread(target=uvicorn_server.run, daemon=True).start()
+        while not uvicorn_server.started:
+            time.sleep(0.05)
+        chat.get_chat_agent().verbose = False
+
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=60) as client:
+            for label, fn in (("/search", search), ("/search/stream", search_stream)):
+                first, total = zip(*(fn(client, f"{label} question {i}") for i in range(args.questions)))
+                print(f"{label:>15}: first answer token p50 {statistics.median(first) * 1000:,.0f}ms, "
+                      f"full answer p50 {statistics.median(total) * 1000:,.0f}ms")
+        uvicorn_server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
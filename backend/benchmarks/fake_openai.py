@@ -0,0 +1,235 @@
+"""A tiny local stand-in for the OpenAI HTTP API, used by the benchmarks."""
+import json
+import time
+import random
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def fake_vector(text, dim):
+    """Deterministic pseudo-embedding so identical text always maps to the same vector."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    rng = random.Random(seed)
+    return [rng.uniform(-1, 1) for _ in range(dim)]
+
+
+class FakeOpenAIServer:
+    """
+    Serves /v1/embeddings and /v1/chat/completions (plain and streamed) on a
+    background thread, over keep-alive HTTP/1.1 connections.
+
+    latency: fixed seconds added to every request (network round-trip + queueing)
+    per_item_latency: extra seconds per input text (model compute)
+    chat_reply: content of every chat completion (/v1/responses output text adds a hash of the input)
+    token_latency: seconds between streamed chat completion chunks
+    tool_arguments: if set, a chat request offering tools and carrying no tool
+        result yet is answered with a call of the first tool with these arguments
+    rate_limit: if set, requests beyond rate_limit per rate_window seconds, or
+        beyond max_concurrency in flight, get a 429 with retry-after-ms like the real API
+    """
+
+    def __init__(self, dim=64, latency=0.02, per_item_latency=0.0001,
+                 chat_reply='{"answer": "fake answer", "related_files": []}', token_latency=0.0, tool_arguments=None,
+                 rate_limit=None, rate_window=1.0, max_concurrency=None):
+        self.dim = dim
+        self.latency = latency
+        self.per_item_latency = per_item_latency
+        self.chat_reply = chat_reply
+        self.token_latency = token_latency
+        self.tool_arguments = tool_arguments
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.max_concurrency = max_concurrency
+        self.requests = 0
+        self.connections = 0
+        self.throttled = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._window = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/v1"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def _admit(self):
+        """None to serve the request, else the seconds a 429 asks the client to wait."""
+        with self._lock:
+            now = time.monotonic()
+            self._window = [t for t in self._window if t > now - self.rate_window]
+            retry = None
+            if self.rate_limit is not None and len(self._window) >= self.rate_limit:
+                retry = self._window[0] + self.rate_window - now
+            elif self.max_concurrency is not None and self.in_flight >= self.max_concurrency:
+                retry = 0.05
+            if retry is not None:
+                self.throttled += 1
+                return retry
+            self._window.append(now)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            return None
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def _count_connection(self):
+        with self._lock:
+            self.connections += 1
+
+    def _chat_message(self, payload):
+        """The assistant message to answer a chat completion request with."""
+        messages = payload.get("messages", [])
+        answered = any(message.get("role") == "tool" for message in messages)
+        if self.tool_arguments is not None and payload.get("tools") and not answered:
+            name = payload["tools"][0]["function"]["name"]
+            return {"role": "assistant", "content": None, "tool_calls": [{
+                "id": f"call_{self.requests}", "type": "function",
+                "function": {"name": name, "arguments": json.dumps(self.tool_arguments)},
+            }]}
+        return {"role": "assistant", "content": self.chat_reply}
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                server._count_connection()
+
+            def handle(self):
+                try:
+                    super().handle()
+                except (ConnectionResetError, BrokenPipeError):
+                    # clients (the OpenAI SDK after [DONE]) may hang up mid-response
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, payload, status=200):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                server._count_request()
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+
+                retry = server._admit()
+                if retry is not None:
+                    body = json.dumps({"error": {"message": "Rate limit reached", "type": "requests",
+                                                 "code": "rate_limit_exceeded"}}).encode("utf-8")
+                    self.send_response(429)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.send_header("retry-after-ms", str(int(retry * 1000)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+                try:
+                    self._serve(payload)
+                finally:
+                    server._release()
+
+            def _serve(self, payload):
+                if self.path.endswith("/embeddings"):
+                    inputs = payload["input"]
+                    if isinstance(inputs, str):
+                        inputs = [inputs]
+                    time.sleep(server.latency + server.per_item_latency * len(inputs))
+                    tokens = sum(len(text) // 4 + 1 for text in inputs)
+                    self._send_json({
+                        "object": "list",
+                        "data": [
+                            {"object": "embedding", "index": i, "embedding": fake_vector(text, server.dim)}
+                            for i, text in enumerate(inputs)
+                        ],
+                        "model": payload.get("model"),
+                        "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+                    })
+                    return
+
+                if self.path.endswith("/chat/completions"):
+                    time.sleep(server.latency)
+                    message = server._chat_message(payload)
+                    finish_reason = "tool_calls" if message.get("tool_calls") else "stop"
+                    base = {"id": f"chatcmpl-{server.requests}", "created": int(time.time()), "model": payload.get("model")}
+                    if payload.get("stream"):
+                        self._send_stream(base, message, finish_reason)
+                    else:
+                        self._send_json({**base, "object": "chat.completion", "choices": [
+                            {"index": 0, "message": message, "finish_reason": finish_reason}
+                        ], "usage": {"prompt_tokens": 10, "completion_tokens": 10, "total_tokens": 20}})
+                    return
+
+                if self.path.endswith("/responses"):
+                    time.sleep(server.latency)
+                    # the same prompt always gets the same answer, a different prompt a different one
+                    digest = hashlib.sha256(json.dumps(payload.get("input")).encode("utf-8")).hexdigest()[:8]
+                    self._send_json({
+                        "id": f"resp_{server.requests}", "object": "response", "created_at": int(time.time()),
+                        "model": payload.get("model"), "status": "completed", "parallel_tool_calls": True,
+                        "tool_choice": "auto", "tools": [],
+                        "output": [{"type": "message", "id": f"msg_{server.requests}", "role": "assistant",
+                                    "status": "completed",
+                                    "content": [{"type": "output_text", "annotations": [],
+                                                 "text": f"{server.chat_reply} [{digest}]"}]}],
+                        "usage": {"input_tokens": 10, "output_tokens": 10, "total_tokens": 20,
+                                  "input_tokens_details": {"cached_tokens": 0},
+                                  "output_tokens_details": {"reasoning_tokens": 0}},
+                    })
+                    return
+
+                self._send_json({"error": {"message": f"Unknown path {self.path}"}}, status=404)
+
+            def _send_stream(self, base, message, finish_reason):
+                """Server-sent events, one delta per word (tool calls in a single delta)."""
+                base = {**base, "object": "chat.completion.chunk"}
+                deltas = [{"role": "assistant", "content": ""}]
+                if message.get("tool_calls"):
+                    deltas.append({"tool_calls": [dict(call, index=i) for i, call in enumerate(message["tool_calls"])]})
+                else:
+                    words = message["content"].split(" ")
+                    deltas.extend({"content": word + (" " if i < len(words) - 1 else "")} for i, word in enumerate(words))
+                events = [{**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]} for delta in deltas]
+                events.append({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}]})
+                payloads = [f"data: {json.dumps(event)}\n\n" for event in events] + ["data: [DONE]\n\n"]
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                # like the real API: chunked, one event per chunk, so the connection stays reusable
+                for i, payload in enumerate(payloads):
+                    if i and server.token_latency:
+                        time.sleep(server.token_latency)
+                    body = payload.encode("utf-8")
+                    self.wfile.write(f"{len(body):x}\r\n".encode("ascii") + body + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+
+        return Handler
@@ -1,13 +1,17 @@
 """Module providing a langchain agent to answer user queries."""
+import re
+import json
+import asyncio
 from langchain_openai import ChatOpenAI
 from langchain.agents import AgentExecutor, create_openai_tools_agent
 from langchain.agents import OpenAIFunctionsAgent
-from langchain.memory import  ConversationBufferWindowMemory, RedisChatMessageHistory
-from langchain.schema import SystemMessage
+from langchain.schema import SystemMessage, HumanMessage
 from langchain.prompts import MessagesPlaceholder
 
 from ..core.config import settings
-from ..tools.retriever import get_code_context
+from ..core.http_clients import get_http_client, get_async_http_client
+from ..tools.retriever import get_code_context, aretrieve_chunks, format_code_context, lexical_query_term
+from ..services.sessions import session_memory, current_session
 
 output_instructions = """Respond in structure:
 {
@@ -16,11 +20,7 @@ output_instructions = """Respond in structure:
 }
 """
 
-def get_chat_agent(session_id = None):
-
-    memory=ConversationBufferWindowMemory(k=settings.DOC_RETRIEVAL_TOP_K, return_messages=True, memory_key='memory')
-
-    prompt_message = """You are a professional AI assistant designed to onboard new developers to a codebase.
+prompt_message = """You are a professional AI assistant designed to onboard new developers to a codebase.
 
                         Your job is to:
                         1. Carefully listen to the user's question, which may relate to a bug, a new feature, or understanding existing functionality.
@@ -47,6 +47,24 @@ def get_chat_agent(session_id = None):
                         Be precise, contextual, and helpful.
 
     """
+
+fast_path_instructions = """The relevant code has already been retrieved for this question and is included
+with it, answer from that context directly. If it is not enough to answer confidently,
+respond with exactly {"insufficient_context": true} and nothing else.
+"""
+
+# built once per worker by build_chat_agent (called from the FastAPI lifespan hook)
+_agent_executor = None
+_llm = None
+
+def build_chat_agent():
+    """
+    Build the LLM client, prompt, tool bindings and AgentExecutor. They hold no
+    per-request state, so one instance serves every request of the worker and
+    its keep-alive HTTP connections are reused across requests.
+    """
+    global _agent_executor, _llm
+
     system_prompt=SystemMessage(content=prompt_message + "\n\n" + output_instructions)
 
     prompt = OpenAIFunctionsAgent.create_prompt(
@@ -54,9 +72,254 @@ def get_chat_agent(session_id = None):
         extra_prompt_messages=[MessagesPlaceholder(variable_name="memory")],
     )
 
-    llm = ChatOpenAI(temperature=0, model=settings.OPENAI_MODEL_NAME, streaming=True, verbose=True)
+    _llm = ChatOpenAI(temperature=0, model=settings.OPENAI_MODEL_NAME, streaming=True, verbose=True, max_retries=0,
+                      http_client=get_http_client(interactive=True),
+                      http_async_client=get_async_http_client(interactive=True))
     tools = [get_code_context]
 
-    agent = create_openai_tools_agent(llm, tools, prompt)
-    return AgentExecutor(agent=agent, tools=tools, memory=memory, verbose=True, max_iterations=5, max_execution_time=50)
+    agent = create_openai_tools_agent(_llm, tools, prompt)
+    _agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=True, max_iterations=5, max_execution_time=50)
+    return _agent_executor
+
+def get_chat_agent():
+    if _agent_executor is None:
+        build_chat_agent()
+    return _agent_executor
+
+def get_chat_llm():
+    if _llm is None:
+        build_chat_agent()
+    return _llm
+
+def run_chat_agent(question, session_id=None):
+    """Answer a question with the shared agent, reading and extending the session's memory."""
+    memory = session_memory(session_id)
+    token = current_session.set(session_id)
+    try:
+        response = get_chat_agent().invoke({'input': question, **memory.load_memory_variables({})})
+    finally:
+        current_session.reset(token)
+    memory.save_context({'input': question}, {'output': response['output']})
+    return response
+
+async def aload_memory(memory):
+    """The memory variables of a session, read in the default executor: with SESSION_BACKEND=redis it's a round trip."""
+    return await asyncio.get_running_loop().run_in_executor(None, memory.load_memory_variables, {})
+
+async def asave_turn(memory, question, output):
+    """Append a question and its answer to the session's memory, in the default executor."""
+    await asyncio.get_running_loop().run_in_executor(None, memory.save_context, {'input': question}, {'output': output})
+
+async def arun_chat_agent(question, session_id=None):
+    """run_chat_agent on the event loop: the LLM, retrieval and session calls are awaited, not blocking the worker."""
+    memory = session_memory(session_id)
+    token = current_session.set(session_id)
+    try:
+        response = await get_chat_agent().ainvoke({'input': question, **await aload_memory(memory)})
+    finally:
+        current_session.reset(token)
+    await asave_turn(memory, question, response['output'])
+    return response
+
+def parse_agent_output(output):
+    """The agent is asked for {"answer", "related_files"} JSON, fall back to the raw text as the answer."""
+    try:
+        response = json.loads(output)
+        if not isinstance(response, dict):
+            raise ValueError("agent output is not a JSON object")
+    except Exception as e:
+        print(e)
+        response = {'answer': output}
+    response.setdefault('related_files', [])
+    return response
+
+_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f'}
+
+class AnswerStream:
+    """
+    Pulls the text of the "answer" field out of the agent's JSON output while
+    it streams in, so clients get readable tokens instead of JSON fragments.
+    Output that isn't a JSON object is passed through as is.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.position = None
+        self.raw = None
+        self.done = False
+
+    def feed(self, token: str) -> str:
+        self.buffer += token
+        if self.raw is None:
+            if not self.buffer.strip():
+                return ""
+            self.raw = not self.buffer.lstrip().startswith(("{", "`"))
+            if self.raw:
+                return self.buffer
+        if self.raw:
+            return token
+        if self.done:
+            return ""
+        if self.position is None:
+            match = re.search(r'"answer"\s*:\s*"', self.buffer)
+            if match is None:
+                return ""
+            self.position = match.end()
+
+        # decode up to the end of the buffer, stopping before incomplete escapes
+        text, i, buffer = [], self.position, self.buffer
+        while i < len(buffer):
+            char = buffer[i]
+            if char == '"':
+                self.done = True
+                i += 1
+                break
+            if char == '\\':
+                if i + 1 >= len(buffer) or (buffer[i + 1] == 'u' and i + 6 > len(buffer)):
+                    break
+                if buffer[i + 1] == 'u':
+                    text.append(chr(int(buffer[i + 2:i + 6], 16)))
+                    i += 6
+                else:
+                    text.append(_ESCAPES.get(buffer[i + 1], buffer[i + 1]))
+                    i += 2
+                continue
+            text.append(char)
+            i += 1
+        self.position = i
+        return "".join(text)
+
+async def stream_chat_agent(question, session_id=None):
+    """
+    Run the shared agent, yielding (event, data) pairs as it works:
+    tool_start / tool_end around each tool call, retrieved_files after a
+    retrieval, token for each piece of answer text, and a last final event
+    with the parsed answer and related_files.
+    """
+    memory = session_memory(session_id)
+    # the generator runs in the response's own task, no need to reset
+    current_session.set(session_id)
+    answer = AnswerStream()
+    output = ""
+    inputs = {'input': question, **await aload_memory(memory)}
+    async for event in get_chat_agent().astream_events(inputs, version="v2"):
+        kind = event["event"]
+        if kind == "on_tool_start":
+            yield "tool_start", {"tool": event["name"], "input": event["data"].get("input")}
+        elif kind == "on_tool_end":
+            yield "tool_end", {"tool": event["name"]}
+            tool_output = event["data"].get("output")
+            # the packed files travel on the tool's CodeContext output, no need to parse the text
+            files = list(getattr(tool_output, "files", ()))
+            if files:
+                yield "retrieved_files", {"files": files}
+        elif kind == "on_chat_model_stream":
+            content = event["data"]["chunk"].content
+            text = answer.feed(content) if isinstance(content, str) and content else ""
+            if text:
+                yield "token", {"text": text}
+        elif kind == "on_chain_end" and not event.get("parent_ids"):
+            output = event["data"]["output"]["output"]
+    await asave_turn(memory, question, output)
+    yield "final", parse_agent_output(output)
+
+SEARCH_PATHS = ("fast", "agent")
+
+# lookups a single retrieval usually answers: where / which / what is / what does
+_LOOKUP_QUESTION = re.compile(r"^\s*(where\b|which\b|what\s+(is|are|does|do)\b|show\b|find\b)", re.IGNORECASE)
+
+def choose_search_path(question, mode=None, has_history=False):
+    """
+    "fast" or "agent" for a question. An explicit mode wins (SEARCH_MODE by
+    default), "auto" sends exact identifiers, quoted strings and short lookup
+    questions to the fast path, and follow-ups in a session to the agent,
+    which can re-query with the conversation in mind.
+    """
+    mode = (mode or settings.SEARCH_MODE).lower()
+    if mode in SEARCH_PATHS:
+        return mode
+    if has_history:
+        return "agent"
+    if lexical_query_term(question):
+        return "fast"
+    if question.count("?") <= 1 and len(question.split()) <= settings.FAST_PATH_MAX_WORDS \
+            and _LOOKUP_QUESTION.match(question):
+        return "fast"
+    return "agent"
+
+async def _fast_path_messages(question, memory):
+    """Retrieve once and build the single-call prompt. Returns (messages, packed files), Nones when nothing relevant was found."""
+    chunks = await aretrieve_chunks(question)
+    if not chunks:
+        return None, None
+    context = format_code_context(chunks)
+    system_prompt = SystemMessage(content=prompt_message + "\n\n" + fast_path_instructions + "\n" + output_instructions)
+    history = (await aload_memory(memory))["memory"]
+    return [system_prompt, *history, HumanMessage(content=f"{context}\n\nQuestion: {question}")], context.files
+
+def _confident(response):
+    return not response.get("insufficient_context") and bool(response.get("answer"))
+
+async def arun_fast_path(question, session_id=None):
+    """
+    Answer with one retrieval and one LLM call, the context already in the
+    prompt. Returns None when retrieval found nothing or the model reports the
+    context as insufficient, the caller then falls back to the agent.
+    """
+    memory = session_memory(session_id)
+    token = current_session.set(session_id)
+    try:
+        messages, _ = await _fast_path_messages(question, memory)
+    finally:
+        current_session.reset(token)
+    if messages is None:
+        return None
+    output = (await get_chat_llm().ainvoke(messages)).content
+    if not _confident(parse_agent_output(output)):
+        return None
+    await asave_turn(memory, question, output)
+    return {'input': question, 'output': output}
+
+async def answer_question(question, session_id=None, path="agent"):
+    """Answer on the chosen path, returns (agent style response, path taken: fast, agent or fallback)."""
+    if path == "fast":
+        response = await arun_fast_path(question, session_id)
+        if response is not None:
+            return response, "fast"
+        path = "fallback"
+    return await arun_chat_agent(question, session_id), path
+
+async def stream_answer(question, session_id=None, path="agent"):
+    """
+    stream_chat_agent on the chosen path. The fast path yields retrieved_files
+    and token events from its single call, a fallback continues with the agent's
+    events, and a path event (fast, agent or fallback) precedes the final one.
+    """
+    if path == "fast":
+        memory = session_memory(session_id)
+        current_session.set(session_id)
+        messages, files = await _fast_path_messages(question, memory)
+        if messages is not None:
+            yield "retrieved_files", {"files": files}
+            # an insufficient_context reply has no "answer" field, so nothing is streamed before falling back
+            answer = AnswerStream()
+            output = ""
+            async for chunk in get_chat_llm().astream(messages):
+                content = chunk.content
+                if isinstance(content, str) and content:
+                    output += content
+                    text = answer.feed(content)
+                    if text:
+                        yield "token", {"text": text}
+            response = parse_agent_output(output)
+            if _confident(response):
+                await asave_turn(memory, question, output)
+                yield "path", {"path": "fast"}
+                yield "final", response
+                return
+        path = "fallback"
 
+    async for event, data in stream_chat_agent(question, session_id):
+        if event == "final":
+            yield "path", {"path": path}
+        yield event, data
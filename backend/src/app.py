@@ -1,16 +1,27 @@
 from fastapi import APIRouter, status, Request, UploadFile, File
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+import os
 import json
+import time
+import shutil
+import zipfile
+from typing import Optional, Literal
 
-from .core.utils import error_object
+from .core.utils import error_object, get_taken_time_in_milliseconds
 from .core.loggers import LoggerSingleton
+from .core.cache import TTLCache
+from .core.config import settings
 from pydantic import BaseModel
 
 # Route to handle file upload and trigger analysis pipeline
-from .services.zip_extractor import save_and_extract_zip
-from .services.embedding import embed_documents
-from .agents.chat import get_chat_agent
-from .services.prd import prd_main
+from .services.zip_extractor import save_upload, check_zip, ZipLimitError
+from .services.embedding import get_index_version
+from .services.embedding_cache import embedding_cache
+from .services.summary_cache import summary_cache
+from .services.jobs import submit_ingestion_job, job_store, cancel_job
+from .services.sessions import get_session_store, session_memory
+from .agents.chat import answer_question, stream_answer, choose_search_path, parse_agent_output, asave_turn
 
 # get the logger
 logger = LoggerSingleton.get_instance()
@@ -18,55 +29,207 @@ logger = LoggerSingleton.get_instance()
 # init api router
 api_router = APIRouter()
 
+# answers keyed by (index version, search path, normalized question)
+answer_cache = TTLCache(settings.ANSWER_CACHE_SIZE, settings.ANSWER_CACHE_TTL_SECONDS)
+
 class SearchRequst(BaseModel):
     question: str
+    # SEARCH_MODE when not given, anything else is rejected with a 422
+    mode: Optional[Literal["fast", "agent", "auto"]] = None
+
+def normalize_question(question: str) -> str:
+    return " ".join(question.lower().split()).rstrip("?!. ")
 
 @api_router.get("/")
 def healthcheck():
     return JSONResponse(content={"status": "Success"}, status_code=status.HTTP_200_OK)
 
+@api_router.get("/embedding_cache/stats")
+def get_embedding_cache_stats():
+    return JSONResponse(content=embedding_cache.stats(), status_code=status.HTTP_200_OK)
+
+@api_router.get("/summary_cache/stats")
+def get_summary_cache_stats():
+    return JSONResponse(content=summary_cache.stats(), status_code=status.HTTP_200_OK)
+
+
+def discard_upload(zip_path):
+    """Removes the temp directory of an upload that wasn't handed to a job."""
+    if zip_path:
+        shutil.rmtree(os.path.dirname(zip_path), ignore_errors=True)
+
 
 @api_router.post("/upload_codebase")
 async def upload_file(request: Request, file: UploadFile = File(...)):
     request_id = request.state.request_id
+    zip_path = None
     try:
-        # Extract uploaded zip file to a temp directory
-        code_dir = save_and_extract_zip(file)
-
-        # prd_gen = prd_main(code_dir)
-        # print(prd_gen,'prd is done')
+        # Save the zip (off the event loop), extraction and embedding run as a background job
+        zip_path = await run_in_threadpool(save_upload, file)
+        await run_in_threadpool(check_zip, zip_path)
+        job = submit_ingestion_job(zip_path, request_id=request_id)
 
-        # Generate and store vector embeddings in FAISS
-        embed_documents(code_dir)
-        
         response = {
-            "prdDoc": None
+            "jobId": job["id"],
+            "status": job["status"]
         }
-        return JSONResponse(content=response, status_code=status.HTTP_200_OK)
+        return JSONResponse(content=response, status_code=status.HTTP_202_ACCEPTED)
+
+    except zipfile.BadZipFile as e:
+        discard_upload(zip_path)
+        err_obj = error_object(request_id=request_id,
+                                message=f"Not a valid zip archive: {str(e)}",
+                                code=status.HTTP_400_BAD_REQUEST)
+        return JSONResponse(content=err_obj, status_code=err_obj["error"]["code"])
+
+    except ZipLimitError as e:
+        discard_upload(zip_path)
+        err_obj = error_object(request_id=request_id,
+                                message=f"{str(e)}",
+                                code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        return JSONResponse(content=err_obj, status_code=err_obj["error"]["code"])
     
     except Exception as e:
+        discard_upload(zip_path)
         err_obj = error_object(request_id=request_id,
                                 message=f"{str(e)}", 
                                 code=status.HTTP_500_INTERNAL_SERVER_ERROR)
         return JSONResponse(content=err_obj, status_code=err_obj["error"]["code"])
 
+@api_router.get("/jobs/{job_id}")
+def get_job(request: Request, job_id: str):
+    job = job_store.get(job_id)
+    if job is None:
+        err_obj = error_object(request_id=request.state.request_id,
+                                message=f"Job {job_id} not found",
+                                code=status.HTTP_404_NOT_FOUND)
+        return JSONResponse(content=err_obj, status_code=err_obj["error"]["code"])
+    if job.get("result") and job["result"].get("prd"):
+        job["result"]["prdDoc"] = str(request.url_for("get_job_prd", job_id=job_id))
+    return JSONResponse(content=job, status_code=status.HTTP_200_OK)
+
+@api_router.get("/jobs/{job_id}/prd")
+def get_job_prd(request: Request, job_id: str):
+    """The PRD markdown generated for the upload, when PRD_ON_UPLOAD is enabled."""
+    try:
+        with open(job_store.prd_path(job_id), encoding="utf-8") as f:
+            content = f.read()
+    except FileNotFoundError:
+        err_obj = error_object(request_id=request.state.request_id,
+                                message=f"No PRD for job {job_id}",
+                                code=status.HTTP_404_NOT_FOUND)
+        return JSONResponse(content=err_obj, status_code=err_obj["error"]["code"])
+    return PlainTextResponse(content, media_type="text/markdown")
+
+@api_router.delete("/jobs/{job_id}")
+def delete_job(request: Request, job_id: str):
+    job = cancel_job(job_id)
+    if job is None:
+        err_obj = error_object(request_id=request.state.request_id,
+                                message=f"Job {job_id} not found",
+                                code=status.HTTP_404_NOT_FOUND)
+        return JSONResponse(content=err_obj, status_code=err_obj["error"]["code"])
+    return JSONResponse(content=job, status_code=status.HTTP_202_ACCEPTED)
+
+def get_session_id(request: Request):
+    # follow-up questions send the same X-Session-ID, else the conversation is this request alone
+    return request.headers.get("X-Session-ID") or request.state.request_id
+
+def get_answer_cache_key(question, path, has_history):
+    """
+    None when the answer depends on earlier turns of the session, those bypass
+    the answer cache. The path is part of the key: an answer of the fast path
+    is not served to a request for the agent, and the other way round.
+    """
+    version = get_index_version()
+    if version is None or has_history:
+        return None
+    return (version, path, normalize_question(question))
+
+def plan_search(session_id, search_request: SearchRequst):
+    """
+    (path, answer cache key) of a request. Reads the session store (a Redis
+    round trip with SESSION_BACKEND=redis) and the live index version from
+    disk, so the endpoints run it in the threadpool.
+    """
+    has_history = get_session_store().has_history(session_id)
+    path = choose_search_path(search_request.question, search_request.mode, has_history)
+    return path, get_answer_cache_key(search_request.question, path, has_history)
+
+def log_search_path(request_id, path, start_time):
+    # per-path latency, for comparing p50 of the fast path, the agent and fallbacks
+    logger.info(f"search answered on the {path} path", \
+                extra={"correlation_id": request_id, "taken_time_ms": get_taken_time_in_milliseconds(start_time)})
+
+async def remember_cached_answer(session_id, question, api_response):
+    """Record a turn answered from the cache in the session, so follow-ups can refer to it."""
+    await asave_turn(session_memory(session_id), question, json.dumps(api_response))
+
 @api_router.post("/search")
 async def process_search(request: Request, search_request: SearchRequst):
     request_id = request.state.request_id
+    session_id = get_session_id(request)
     try:
-        agent_executor = get_chat_agent(request_id)
-        agent_response = agent_executor.invoke({'input':search_request.question})
-        api_response = {}
-        try:
-            api_response = json.loads(agent_response['output'])
-        except Exception as e:
-            api_response['answer'] = agent_response['output']
-            print(e)
-            # return api_response
-        return JSONResponse(content=api_response, status_code=status.HTTP_200_OK)
+        path, cache_key = await run_in_threadpool(plan_search, session_id, search_request)
+        api_response = answer_cache.get(cache_key) if cache_key else None
+        if api_response is not None:
+            await remember_cached_answer(session_id, search_request.question, api_response)
+            return JSONResponse(content=api_response, status_code=status.HTTP_200_OK,
+                                headers={"X-Cache": "HIT", "X-Session-ID": session_id, "X-Search-Path": "cache"})
+
+        start_time = time.time()
+        agent_response, path = await answer_question(search_request.question, session_id, path)
+        log_search_path(request_id, path, start_time)
+        api_response = parse_agent_output(agent_response['output'])
+        if cache_key:
+            answer_cache.set(cache_key, api_response)
+        return JSONResponse(content=api_response, status_code=status.HTTP_200_OK,
+                            headers={"X-Cache": "MISS", "X-Session-ID": session_id, "X-Search-Path": path})
     except Exception as e:
         import traceback
         err_obj = error_object(request_id=request_id,
                                 message=f"{traceback.print_exc()}", 
                                 code=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        return JSONResponse(content=err_obj, status_code=err_obj["error"]["code"])
\ No newline at end of file
+        return JSONResponse(content=err_obj, status_code=err_obj["error"]["code"])
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@api_router.post("/search/stream")
+async def process_search_stream(request: Request, search_request: SearchRequst):
+    """
+    Streaming variant of /search as server-sent events: tool_start, tool_end,
+    retrieved_files and token events while the agent works, then a path event
+    and a final event with {"answer", "related_files"} (or an error event).
+    """
+    request_id = request.state.request_id
+    session_id = get_session_id(request)
+    path, cache_key = await run_in_threadpool(plan_search, session_id, search_request)
+    cached = answer_cache.get(cache_key) if cache_key else None
+    if cached is not None:
+        path = "cache"
+
+    async def events():
+        if cached is not None:
+            await remember_cached_answer(session_id, search_request.question, cached)
+            yield sse_event("token", {"text": cached.get("answer", "")})
+            yield sse_event("final", cached)
+            return
+        try:
+            start_time = time.time()
+            async for event, data in stream_answer(search_request.question, session_id, path):
+                if event == "path":
+                    log_search_path(request_id, data["path"], start_time)
+                if event == "final" and cache_key:
+                    answer_cache.set(cache_key, data)
+                yield sse_event(event, data)
+        except Exception as e:
+            err_obj = error_object(request_id=request_id,
+                                    message=f"{str(e)}",
+                                    code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            yield sse_event("error", err_obj["error"])
+
+    # the requested path, a fast path that falls back reports "fallback" in its path event
+    headers = {"X-Cache": "HIT" if cached is not None else "MISS", "X-Session-ID": session_id, "X-Search-Path": path,
+               "Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
@@ -0,0 +1,110 @@
+import os
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    Thread-safe in-process LRU cache whose entries also expire ttl_seconds
+    after being stored.
+    """
+
+    def __init__(self, max_items: int, ttl_seconds: float):
+        self.max_items = max_items
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    del self._items[key]
+                self.misses += 1
+                return default
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+class SQLiteLRUCache:
+    """
+    Base of the persistent caches: one SQLite table whose rows carry their byte
+    size and last-used time, the least recently used ones evicted once the
+    table grows past max_bytes. Subclasses set table and key_columns and
+    create the table in _create_table.
+    """
+
+    table = None
+    key_columns = ()
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        # the uvicorn workers and the ingestion job processes share the file
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._create_table()
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table}_last_used ON {self.table}(last_used)")
+        self._conn.commit()
+
+    def _create_table(self):
+        raise NotImplementedError
+
+    def _evict(self):
+        """Called with the lock held after an insert."""
+        total = self._conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # trim to 90% so we don't evict again on the very next insert
+        to_free = total - int(self.max_bytes * 0.9)
+        freed = 0
+        victims = []
+        columns = ", ".join(self.key_columns)
+        for row in self._conn.execute(f"SELECT {columns}, size FROM {self.table} ORDER BY last_used ASC"):
+            victims.append(row[:-1])
+            freed += row[-1]
+            if freed >= to_free:
+                break
+        where = " AND ".join(f"{column} = ?" for column in self.key_columns)
+        self._conn.executemany(f"DELETE FROM {self.table} WHERE {where}", victims)
+        self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, total = self._conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}"
+            ).fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "entries": entries,
+                "bytes": total,
+                "max_bytes": self.max_bytes,
+            }
@@ -10,6 +10,120 @@ class Settings(BaseSettings):
     OPENAI_API_KEY: str
     DOC_RETRIEVAL_TOP_K: int
 
+    # embedding batching (OpenAI allows up to 2048 inputs / 300k tokens per request)
+    EMBEDDING_BATCH_SIZE: int = 256
+    EMBEDDING_BATCH_MAX_TOKENS: int = 100_000
+    # batches submitted at once, the request scheduler decides how many are in flight
+    EMBEDDING_MAX_WORKERS: int = 32
+
+    # on-disk embedding cache keyed by (model, chunk text hash)
+    EMBEDDING_CACHE_PATH: str = "embedding_cache/embeddings.sqlite3"
+    EMBEDDING_CACHE_MAX_BYTES: int = 2 * 1024 ** 3
+
+    # on-disk cache of file summaries and rollups keyed by (model, prompt hash)
+    SUMMARY_CACHE_PATH: str = "summary_cache/summaries.sqlite3"
+    SUMMARY_CACHE_MAX_BYTES: int = 512 * 1024 ** 2
+
+    # only re-embed files whose content changed since the live index version
+    INCREMENTAL_INDEXING: bool = True
+
+    # shared keep-alive HTTP pools for the OpenAI / LangChain clients
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    HTTP_TIMEOUT_SECONDS: float = 120.0
+    HTTP_CONNECT_TIMEOUT_SECONDS: float = 5.0
+
+    # shared OpenAI request scheduler, 0 = no requests/tokens per minute cap (429s still adapt concurrency)
+    OPENAI_RPM_LIMIT: int = 0
+    OPENAI_TPM_LIMIT: int = 0
+    OPENAI_INITIAL_CONCURRENCY: int = 8
+    OPENAI_MAX_CONCURRENCY: int = 32
+    OPENAI_MAX_RETRIES: int = 5  # timeouts and 5xx, 429s are retried for up to OPENAI_THROTTLE_MAX_WAIT_SECONDS
+    OPENAI_THROTTLE_MAX_WAIT_SECONDS: float = 600.0
+    OPENAI_INTERACTIVE_THROTTLE_MAX_WAIT_SECONDS: float = 10.0  # chat and search requests, a user is waiting
+    OPENAI_RETRY_MAX_BACKOFF_SECONDS: float = 30.0
+    OPENAI_LATENCY_FACTOR: float = 3.0  # halve concurrency when latency exceeds its average by this factor, 0 = off
+
+    # number of loaded indexes each worker keeps in memory
+    INDEX_CACHE_SIZE: int = 8
+
+    # vector index backend: auto (flat, then ivf_flat) | flat | ivf_flat | ivf_pq | hnsw
+    # ivf_pq trades recall for memory and is only used when set explicitly
+    ANN_INDEX_TYPE: str = "auto"
+    ANN_AUTO_IVF_MIN_VECTORS: int = 20_000
+    ANN_NLIST: int = 0  # 0 = derive from the corpus size
+    ANN_NPROBE: int = 16
+    ANN_PQ_M: int = 0  # 0 = dim / 16
+    ANN_TRAIN_SAMPLE: int = 100_000
+    ANN_HNSW_M: int = 32
+    ANN_EF_CONSTRUCTION: int = 80
+    ANN_EF_SEARCH: int = 64
+
+    # hybrid retrieval: reciprocal-rank fusion of BM25 and vector search
+    HYBRID_LEXICAL_WEIGHT: float = 0.5  # 0 = vector only, 1 = lexical only
+    HYBRID_CANDIDATES: int = 4  # candidates fetched from each ranker, as a multiple of top_k
+    HYBRID_RRF_K: int = 60
+
+    # /search answer cache and question embedding memo, both keyed by index version
+    ANSWER_CACHE_SIZE: int = 1024
+    ANSWER_CACHE_TTL_SECONDS: int = 3600
+    QUESTION_EMBEDDING_CACHE_SIZE: int = 4096
+    QUESTION_EMBEDDING_CACHE_TTL_SECONDS: int = 3600
+
+    # prompt token budget for the code context of one retrieval tool call
+    CONTEXT_MAX_TOKENS: int = 6000
+
+    # /search path: "fast" (one retrieval, one LLM call), "agent" or "auto" (local heuristic)
+    SEARCH_MODE: str = "auto"
+    FAST_PATH_MAX_WORDS: int = 20
+
+    # chat sessions: "memory" (LRU per worker) or "redis" (shared through REDIS_URL)
+    SESSION_BACKEND: str = "memory"
+    REDIS_URL: str = "redis://localhost:6379/0"
+    SESSION_MAX: int = 10_000
+    SESSION_TTL_SECONDS: int = 3600
+    SESSION_MAX_MESSAGES: int = 50
+    SESSION_MAX_RETRIEVALS: int = 32
+
+    # background ingestion jobs
+    JOBS_DIR: str = "jobs"
+    INGESTION_WORKERS: int = 1
+
+    # PRD generation: concurrent file summaries, reduced per directory and service within the token budget
+    PRD_ON_UPLOAD: bool = False
+    PRD_MODEL: str = "gpt-4.1"
+    PRD_MAX_WORKERS: int = 16
+    PRD_FILE_MAX_TOKENS: int = 4000
+    PRD_REDUCE_MAX_TOKENS: int = 12_000
+    PRD_DB_MAX_TOKENS: int = 60_000
+    # DB module detection: files matched by keyword per language, AST checks of Python candidates
+    # in a process pool (DB_DETECT_WORKERS=0 uses every core)
+    DB_DETECT_EXTENSIONS: list[str] = [".py", ".js", ".ts", ".java", ".kt", ".go", ".rb", ".cs", ".php", ".sql", ".prisma"]
+    DB_DETECT_WORKERS: int = 0
+    DB_DETECT_BATCH_FILES: int = 128
+
+    # AST chunking, CHUNK_WORKERS=0 uses every core
+    CHUNK_WORKERS: int = 0
+    CHUNK_BATCH_FILES: int = 64
+    CHUNK_PARALLEL_MIN_FILES: int = 2_000  # fewer files are chunked serially, a worker takes seconds to start
+    # chunk sizing: split above the target (with overlap), pack siblings below the minimum
+    CHUNK_TARGET_TOKENS: int = 800
+    CHUNK_MIN_TOKENS: int = 64
+    CHUNK_OVERLAP_TOKENS: int = 48
+
+    # upload spooling and zip extraction limits
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024
+    ZIP_MAX_UNCOMPRESSED_BYTES: int = 1024 * 1024 * 1024
+    ZIP_MAX_FILES: int = 50_000
+    ZIP_MAX_FILE_BYTES: int = 10 * 1024 * 1024
+    # only what the chunkers, PRD generation, DB and dependency detection read
+    EXTRACT_EXTENSIONS: list[str] = [".py", ".ipynb", ".txt", ".md", ".html", ".js", ".json",
+                                     ".ts", ".java", ".kt", ".go", ".rb", ".cs", ".php", ".sql", ".prisma"]
+
+    # repo scan: directories never descended into, besides hidden ones and what .gitignore excludes
+    SCAN_IGNORED_DIRS: list[str] = ["node_modules", "bower_components", "__pycache__", "site-packages", "venv"]
+
     class Config:
         env_file = ".env"
         extra = "ignore"
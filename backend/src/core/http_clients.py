@@ -0,0 +1,60 @@
+"""
+Process-wide keep-alive HTTP connection pools shared by the OpenAI SDK and
+LangChain clients, so requests reuse TCP/TLS connections instead of opening
+a new pool per client. Both send through the process-wide RequestScheduler
+(rate limits, adaptive concurrency and retries), so the clients built on them
+must use max_retries=0.
+
+Interactive clients (chat, search) get their own pools whose throttled requests
+give up after OPENAI_INTERACTIVE_THROTTLE_MAX_WAIT_SECONDS, a user is waiting on
+them; ingestion waits out throttling for up to OPENAI_THROTTLE_MAX_WAIT_SECONDS.
+"""
+import httpx
+
+from .config import settings
+from .rate_limiter import RateLimitedTransport, AsyncRateLimitedTransport, get_request_scheduler
+
+_clients = {}  # {interactive: client}
+_async_clients = {}
+
+
+def _limits():
+    return httpx.Limits(max_connections=settings.HTTP_MAX_CONNECTIONS,
+                        max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS)
+
+
+def _timeout():
+    return httpx.Timeout(settings.HTTP_TIMEOUT_SECONDS, connect=settings.HTTP_CONNECT_TIMEOUT_SECONDS)
+
+
+def _max_throttle_wait(interactive: bool):
+    # None: the scheduler's OPENAI_THROTTLE_MAX_WAIT_SECONDS
+    return settings.OPENAI_INTERACTIVE_THROTTLE_MAX_WAIT_SECONDS if interactive else None
+
+
+def get_http_client(interactive: bool = False) -> httpx.Client:
+    client = _clients.get(interactive)
+    if client is None or client.is_closed:
+        transport = RateLimitedTransport(httpx.HTTPTransport(limits=_limits()), get_request_scheduler(),
+                                         _max_throttle_wait(interactive))
+        client = _clients[interactive] = httpx.Client(transport=transport, timeout=_timeout())
+    return client
+
+
+def get_async_http_client(interactive: bool = False) -> httpx.AsyncClient:
+    client = _async_clients.get(interactive)
+    if client is None or client.is_closed:
+        transport = AsyncRateLimitedTransport(httpx.AsyncHTTPTransport(limits=_limits()), get_request_scheduler(),
+                                              _max_throttle_wait(interactive))
+        client = _async_clients[interactive] = httpx.AsyncClient(transport=transport, timeout=_timeout())
+    return client
+
+
+async def close_http_clients():
+    for client in _clients.values():
+        client.close()
+    _clients.clear()
+    for client in _async_clients.values():
+        await client.aclose()
+    _async_clients.clear()
@@ -0,0 +1,376 @@
+"""
+Process-wide scheduler for OpenAI API calls, plugged into the shared httpx
+clients as a transport so every SDK and LangChain client goes through it.
+
+- token buckets cap requests/min and (estimated) tokens/min,
+- an AIMD limit adapts the number of requests in flight: +1 per round of
+  successful requests, halved on a 429 or when latency spikes,
+- throttled, failed and timed-out requests are retried with jittered
+  exponential backoff, honouring the Retry-After headers of the API.
+
+The SDK clients run with max_retries=0, the retries happen here.
+"""
+import json
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+
+import httpx
+
+from .config import settings
+
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Refills at rate_per_minute / 60 per second up to capacity. Takes go into
+    debt instead of failing, the returned delay is how long the caller has to
+    wait for its share, so concurrent callers queue up in arrival order.
+    The burst defaults to one second's worth: providers enforce per-minute
+    limits over shorter windows too.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: float = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or max(1.0, self.rate)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self, amount: float) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+            self.updated = now
+            self.level -= amount
+            return max(0.0, -self.level / self.rate)
+
+
+class AdaptiveConcurrency:
+    """AIMD limit on requests in flight, awaitable from threads and event loops alike."""
+
+    def __init__(self, initial: int, maximum: int, latency_factor: float):
+        self.limit = float(initial)
+        self.maximum = maximum
+        self.latency_factor = latency_factor
+        self.in_flight = 0
+        self.latency = None  # EWMA of time to response headers
+        self.last_decrease = 0.0
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        self._async_waiters = deque()
+
+    def _try_acquire(self):
+        if self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return True
+        return False
+
+    def acquire(self):
+        with self._condition:
+            while not self._try_acquire():
+                self._condition.wait()
+
+    async def aacquire(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                if self._try_acquire():
+                    return
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            await waiter
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+            self._wake()
+
+    def _wake(self):
+        self._condition.notify_all()
+        while self._async_waiters:
+            loop, waiter = self._async_waiters.popleft()
+            loop.call_soon_threadsafe(_resolve, waiter)
+
+    def on_success(self, latency: float):
+        with self._lock:
+            spike = self.latency is not None and self.latency_factor and latency > self.latency * self.latency_factor
+            self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+            if spike:
+                self._decrease()
+            elif self.limit < self.maximum and self.in_flight >= int(self.limit) - 1:
+                # about +1 per round of successful requests, only while the limit is what holds them back
+                self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+                self._wake()
+
+    def on_throttle(self):
+        with self._lock:
+            self._decrease()
+
+    def _decrease(self):
+        # the requests already in flight answer 429 too, count one signal per round trip
+        now = time.monotonic()
+        if now - self.last_decrease < (self.latency or 1.0):
+            return
+        self.last_decrease = now
+        self.limit = max(1.0, self.limit / 2)
+
+
+def _resolve(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+def estimate_tokens(request: httpx.Request) -> int:
+    """Prompt (~4 bytes per token of the JSON body) plus the completion budget the request asks for."""
+    body = request.content
+    try:
+        payload = json.loads(body) if body else {}
+    except ValueError:
+        payload = {}
+    completion = 0
+    if isinstance(payload, dict):
+        completion = payload.get("max_tokens") or payload.get("max_completion_tokens") or payload.get("max_output_tokens") or 0
+    return len(body) // 4 + completion
+
+
+def retry_after(response: httpx.Response):
+    """Seconds the API asks us to wait, from retry-after-ms or retry-after, else None."""
+    for header, scale in (("retry-after-ms", 1000.0), ("retry-after", 1.0)):
+        value = response.headers.get(header)
+        if value:
+            try:
+                return float(value) / scale
+            except ValueError:
+                pass
+    return None
+
+
+def error_code(response: httpx.Response, body: bytes):
+    """The "code" of an OpenAI error body (raw bytes as sent), None if there is none."""
+    try:
+        return httpx.Response(response.status_code, headers=response.headers, content=body).json()["error"]["code"]
+    except Exception:
+        return None
+
+
+class RequestScheduler:
+    """Rate limits, adaptive concurrency and the retry policy shared by all OpenAI calls of a process."""
+
+    def __init__(self, rpm=None, tpm=None, initial_concurrency=None, max_concurrency=None,
+                 max_retries=None, max_backoff=None, latency_factor=None):
+        rpm = settings.OPENAI_RPM_LIMIT if rpm is None else rpm
+        tpm = settings.OPENAI_TPM_LIMIT if tpm is None else tpm
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.concurrency = AdaptiveConcurrency(
+            initial_concurrency or settings.OPENAI_INITIAL_CONCURRENCY,
+            max_concurrency or settings.OPENAI_MAX_CONCURRENCY,
+            settings.OPENAI_LATENCY_FACTOR if latency_factor is None else latency_factor,
+        )
+        self.max_retries = settings.OPENAI_MAX_RETRIES if max_retries is None else max_retries
+        self.max_backoff = max_backoff or settings.OPENAI_RETRY_MAX_BACKOFF_SECONDS
+        self.max_throttle_wait = settings.OPENAI_THROTTLE_MAX_WAIT_SECONDS
+        self.paused_until = 0.0
+        self.retries = 0
+        self.throttled = 0
+
+    def admission_delay(self, request: httpx.Request) -> float:
+        """Seconds to wait before sending: a pause after a 429, then the bucket shares."""
+        delay = max(0.0, self.paused_until - time.monotonic())
+        if self.requests:
+            delay = max(delay, self.requests.take(1))
+        if self.tokens:
+            delay = max(delay, self.tokens.take(estimate_tokens(request)))
+        return delay
+
+    def backoff(self, attempt: int, response: httpx.Response = None) -> float:
+        """What Retry-After asks for plus some jitter, else full-jitter exponential backoff."""
+        requested = retry_after(response) if response is not None else None
+        if requested is None:
+            return random.uniform(0, min(self.max_backoff, 0.5 * 2 ** attempt))
+        if response.status_code == 429:
+            # hold back every request of the process, not just this one
+            self.paused_until = max(self.paused_until, time.monotonic() + requested)
+        # the jitter spreads out the requests that were throttled together
+        return min(self.max_backoff, requested * random.uniform(1.0, 1.5))
+
+    def should_retry(self, attempt: int, started: float, response: httpx.Response = None, body: bytes = b"",
+                     max_throttle_wait: float = None) -> bool:
+        """
+        Record a failed attempt and decide whether to send it again: throttled
+        requests are retried for up to max_throttle_wait seconds (the client's
+        own budget, else the scheduler's), so ingestion doesn't drop chunks under
+        heavy throttling, other errors max_retries times. Only a 429 lowers the
+        concurrency limit, a timeout or a 5xx says nothing about our request rate.
+        """
+        if response is not None and response.status_code == 429:
+            self.concurrency.on_throttle()
+            self.throttled += 1
+            max_throttle_wait = self.max_throttle_wait if max_throttle_wait is None else max_throttle_wait
+            # a Retry-After past the budget is given up on now rather than after the wait
+            waited = time.monotonic() - started + (retry_after(response) or 0.0)
+            # an exhausted quota answers 429 as well, waiting won't help
+            retry = error_code(response, body) != "insufficient_quota" and waited < max_throttle_wait
+        else:
+            retry = attempt < self.max_retries and (response is None or response.status_code in RETRY_STATUSES)
+        if retry:
+            self.retries += 1
+        return retry
+
+
+class _ReleasingStream(httpx.SyncByteStream):
+    """Response body that gives the concurrency slot back once it is closed."""
+
+    def __init__(self, stream, release):
+        self.stream = stream
+        self.release = release
+
+    def __iter__(self):
+        yield from self.stream
+
+    def close(self):
+        try:
+            self.stream.close()
+        finally:
+            self.release()
+
+
+class _AsyncReleasingStream(httpx.AsyncByteStream):
+
+    def __init__(self, stream, release):
+        self.stream = stream
+        self.release = release
+
+    async def __aiter__(self):
+        async for chunk in self.stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self.stream.aclose()
+        finally:
+            self.release()
+
+
+def _once(function):
+    called = []
+
+    def wrapper():
+        if not called:
+            called.append(True)
+            function()
+    return wrapper
+
+
+class RateLimitedTransport(httpx.BaseTransport):
+    """
+    httpx transport sending requests through a RequestScheduler.
+    max_throttle_wait overrides the scheduler's throttle budget for this client.
+    """
+
+    def __init__(self, transport: httpx.BaseTransport, scheduler: RequestScheduler, max_throttle_wait: float = None):
+        self.transport = transport
+        self.scheduler = scheduler
+        self.max_throttle_wait = max_throttle_wait
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        request.read()
+        attempt, started = 0, time.monotonic()
+        while True:
+            time.sleep(self.scheduler.admission_delay(request))
+            self.scheduler.concurrency.acquire()
+            release = _once(self.scheduler.concurrency.release)
+            start = time.monotonic()
+            try:
+                response = self.transport.handle_request(request)
+            except (httpx.TimeoutException, httpx.NetworkError):
+                release()
+                if not self.scheduler.should_retry(attempt, started):
+                    raise
+                time.sleep(self.scheduler.backoff(attempt))
+                attempt += 1
+                continue
+            except BaseException:
+                release()
+                raise
+
+            if response.status_code in RETRY_STATUSES or response.status_code >= 500:
+                # error bodies are small, read them to tell throttling from an exhausted quota
+                body = b"".join(response.iter_raw())
+                response.close()
+                release()
+                if self.scheduler.should_retry(attempt, started, response, body, self.max_throttle_wait):
+                    time.sleep(self.scheduler.backoff(attempt, response))
+                    attempt += 1
+                    continue
+                return httpx.Response(response.status_code, headers=response.headers,
+                                      stream=httpx.ByteStream(body), extensions=response.extensions)
+            self.scheduler.concurrency.on_success(time.monotonic() - start)
+            # the slot is held until the body (possibly a stream) is consumed and closed
+            return httpx.Response(response.status_code, headers=response.headers,
+                                  stream=_ReleasingStream(response.stream, release), extensions=response.extensions)
+
+    def close(self):
+        self.transport.close()
+
+
+class AsyncRateLimitedTransport(httpx.AsyncBaseTransport):
+    """RateLimitedTransport for httpx.AsyncClient, sharing the same scheduler."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, scheduler: RequestScheduler, max_throttle_wait: float = None):
+        self.transport = transport
+        self.scheduler = scheduler
+        self.max_throttle_wait = max_throttle_wait
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        attempt, started = 0, time.monotonic()
+        while True:
+            await asyncio.sleep(self.scheduler.admission_delay(request))
+            await self.scheduler.concurrency.aacquire()
+            release = _once(self.scheduler.concurrency.release)
+            start = time.monotonic()
+            try:
+                response = await self.transport.handle_async_request(request)
+            except (httpx.TimeoutException, httpx.NetworkError):
+                release()
+                if not self.scheduler.should_retry(attempt, started):
+                    raise
+                await asyncio.sleep(self.scheduler.backoff(attempt))
+                attempt += 1
+                continue
+            except BaseException:
+                release()
+                raise
+
+            if response.status_code in RETRY_STATUSES or response.status_code >= 500:
+                body = b"".join([chunk async for chunk in response.aiter_raw()])
+                await response.aclose()
+                release()
+                if self.scheduler.should_retry(attempt, started, response, body, self.max_throttle_wait):
+                    await asyncio.sleep(self.scheduler.backoff(attempt, response))
+                    attempt += 1
+                    continue
+                return httpx.Response(response.status_code, headers=response.headers,
+                                      stream=httpx.ByteStream(body), extensions=response.extensions)
+            self.scheduler.concurrency.on_success(time.monotonic() - start)
+            return httpx.Response(response.status_code, headers=response.headers,
+                                  stream=_AsyncReleasingStream(response.stream, release), extensions=response.extensions)
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_request_scheduler() -> RequestScheduler:
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler()
+    return _scheduler
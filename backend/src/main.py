@@ -8,6 +8,9 @@ from fastapi.responses import JSONResponse
 from .app import api_router
 from .core.loggers import LoggerSingleton
 from .core.utils import get_taken_time_in_milliseconds, error_object
+from .services.jobs import shutdown_job_executor
+from .agents.chat import build_chat_agent
+from .core.http_clients import close_http_clients
 
 # instantiating the logger
 logger = LoggerSingleton.get_instance()
@@ -15,8 +18,11 @@ logger = LoggerSingleton.get_instance()
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # task run at appication startup
+    build_chat_agent()
     yield
     # release the resources
+    shutdown_job_executor()
+    await close_http_clients()
     
 
 # Create the FastAPI app
@@ -24,8 +30,10 @@ app = FastAPI(lifespan=lifespan, docs_url="/docs", redoc_url="/redoc")
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
-    err_obj = error_object(message=f"Invalid input: {exc.errors()}",
-                            code=status.HTTP_400_BAD_REQUEST)
+    # e.g. a /search mode other than fast, agent or auto
+    err_obj = error_object(request_id=getattr(request.state, "request_id", None),
+                            message=f"Invalid input: {exc.errors()}",
+                            code=status.HTTP_422_UNPROCESSABLE_ENTITY)
     return JSONResponse(content=err_obj, status_code=err_obj["error"]["code"])
 
 
@@ -66,6 +74,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "DELETE"], # "PUT", "DELETE"
     allow_headers=["*"],  # Allow all headers
+    expose_headers=["X-Correlation-ID", "X-Cache", "X-Session-ID", "X-Search-Path"],
 )
 
 
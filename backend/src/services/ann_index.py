@@ -0,0 +1,86 @@
+"""
+FAISS index backends: exact flat search plus IVF-Flat, IVF-PQ and HNSW
+approximate search, with an "auto" mode that picks flat or IVF-Flat from the
+corpus size. IVF-PQ loses too much recall to be picked automatically, it has to
+be asked for.
+"""
+import math
+import faiss
+import numpy as np
+
+from ..core.config import settings
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+# below this IVF can't train a meaningful coarse quantizer (nor PQ its 256-entry codebooks)
+_MIN_IVF_VECTORS = 1_000
+
+
+def choose_index_type(n_vectors: int) -> str:
+    """Resolve ANN_INDEX_TYPE, picking a backend from the vector count in auto mode."""
+    index_type = settings.ANN_INDEX_TYPE
+    if index_type == "auto":
+        index_type = "flat" if n_vectors < settings.ANN_AUTO_IVF_MIN_VECTORS else "ivf_flat"
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown ANN_INDEX_TYPE {index_type!r}, expected 'auto' or one of {INDEX_TYPES}")
+    if index_type.startswith("ivf") and n_vectors < _MIN_IVF_VECTORS:
+        return "flat"
+    return index_type
+
+
+def supports_remove(index_type: str) -> bool:
+    """HNSW graphs can't drop vectors, so those indexes are rebuilt instead of updated in place."""
+    return index_type != "hnsw"
+
+
+def _nlist(n_vectors: int) -> int:
+    if settings.ANN_NLIST:
+        return settings.ANN_NLIST
+    # ~4*sqrt(n) lists, keeping at least 39 training points per list (faiss warns below that)
+    training_points = min(n_vectors, settings.ANN_TRAIN_SAMPLE)
+    return max(1, min(int(4 * math.sqrt(n_vectors)), training_points // 39))
+
+
+def _pq_m(dim: int) -> int:
+    # sub-quantizer count must divide the dimension; dim/16 keeps ~16 dims per 8-bit code
+    m = settings.ANN_PQ_M or max(1, dim // 16)
+    while dim % m:
+        m -= 1
+    return m
+
+
+def create_index(index_type: str, dim: int, n_vectors: int):
+    """Create an empty index of the given type that accepts add_with_ids."""
+    if index_type == "flat":
+        return faiss.IndexIDMap2(faiss.IndexFlatL2(dim))
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, settings.ANN_HNSW_M)
+        index.hnsw.efConstruction = settings.ANN_EF_CONSTRUCTION
+        return faiss.IndexIDMap2(index)
+
+    quantizer = faiss.IndexFlatL2(dim)
+    if index_type == "ivf_flat":
+        return faiss.IndexIVFFlat(quantizer, dim, _nlist(n_vectors))
+    if index_type == "ivf_pq":
+        return faiss.IndexIVFPQ(quantizer, dim, _nlist(n_vectors), _pq_m(dim), 8)
+    raise ValueError(f"Unknown ANN index type {index_type!r}, expected one of {INDEX_TYPES}")
+
+
+def train_index(index, vectors: np.ndarray):
+    """Train IVF indexes on a random sample of at most ANN_TRAIN_SAMPLE vectors."""
+    if index.is_trained:
+        return
+    sample = vectors
+    if len(vectors) > settings.ANN_TRAIN_SAMPLE:
+        rng = np.random.default_rng(0)
+        sample = vectors[rng.choice(len(vectors), settings.ANN_TRAIN_SAMPLE, replace=False)]
+    index.train(sample)
+
+
+def configure_search(index, index_type: str):
+    """Apply the query-time knobs (nprobe / efSearch) to a loaded index."""
+    if index_type.startswith("ivf"):
+        faiss.extract_index_ivf(index).nprobe = settings.ANN_NPROBE
+    elif index_type == "hnsw":
+        faiss.ParameterSpace().set_index_parameter(index, "efSearch", settings.ANN_EF_SEARCH)
+    return index
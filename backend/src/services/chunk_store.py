@@ -0,0 +1,125 @@
+"""
+Memory-mapped store for chunk metadata, keyed by FAISS vector id.
+
+chunks.bin holds the chunks as back-to-back UTF-8 JSON records and chunks.idx.npy
+an (n, 3) int64 table of [vector id, offset, length] sorted by id. Lookups by
+file and by symbol go through chunks.by_file.npy / chunks.by_name.npy, (n, 2)
+tables of [64-bit key hash, vector id] sorted by hash.
+
+Every file is opened read-only with mmap, so every worker serving the same
+index version shares one copy of the pages through the OS page cache, and
+opening a store or reading k records costs the same whatever the repo size.
+"""
+import os
+import json
+import mmap
+import hashlib
+import numpy as np
+
+DATA_FILE = "chunks.bin"
+OFFSETS_FILE = "chunks.idx.npy"
+BY_FILE_FILE = "chunks.by_file.npy"
+BY_NAME_FILE = "chunks.by_name.npy"
+
+
+def _key_hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little", signed=True)
+
+
+def _file_keys(chunk):
+    return {chunk.get("relpath"), chunk.get("filename")} - {None}
+
+
+def _name_keys(chunk):
+    # packed chunks of several small definitions list them all in "names"
+    return {chunk.get("name"), *chunk.get("names", ())} - {None}
+
+
+def _write_key_table(path, chunks, keys_of):
+    rows = [(_key_hash(key), vector_id) for vector_id, chunk in chunks.items() for key in keys_of(chunk)]
+    table = np.array(sorted(rows), dtype="int64").reshape(-1, 2)
+    np.save(path, table)
+
+
+def write_chunk_store(store_dir: str, chunks: dict):
+    """Write {vector id: chunk} into store_dir."""
+    table = np.zeros((len(chunks), 3), dtype="int64")
+    offset = 0
+    with open(os.path.join(store_dir, DATA_FILE), "wb") as f:
+        for row, vector_id in enumerate(sorted(chunks)):
+            record = json.dumps(chunks[vector_id], ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            f.write(record)
+            table[row] = (vector_id, offset, len(record))
+            offset += len(record)
+    np.save(os.path.join(store_dir, OFFSETS_FILE), table)
+    _write_key_table(os.path.join(store_dir, BY_FILE_FILE), chunks, _file_keys)
+    _write_key_table(os.path.join(store_dir, BY_NAME_FILE), chunks, _name_keys)
+
+
+class ChunkStore:
+    """Read-only, dict-like view over a chunk store directory."""
+
+    def __init__(self, store_dir: str):
+        self.store_dir = store_dir
+        self._table = np.load(os.path.join(store_dir, OFFSETS_FILE), mmap_mode="r")
+        self._by_file = np.load(os.path.join(store_dir, BY_FILE_FILE), mmap_mode="r")
+        self._by_name = np.load(os.path.join(store_dir, BY_NAME_FILE), mmap_mode="r")
+        with open(os.path.join(store_dir, DATA_FILE), "rb") as f:
+            # mmap refuses empty files
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+
+    def _row(self, vector_id):
+        ids = self._table[:, 0]
+        row = int(np.searchsorted(ids, vector_id))
+        if row < len(ids) and ids[row] == vector_id:
+            return row
+        return None
+
+    def _read(self, row):
+        _, offset, length = self._table[row]
+        return json.loads(self._data[offset:offset + length])
+
+    def __len__(self):
+        return len(self._table)
+
+    def __contains__(self, vector_id):
+        return self._row(int(vector_id)) is not None
+
+    def __getitem__(self, vector_id):
+        row = self._row(int(vector_id))
+        if row is None:
+            raise KeyError(vector_id)
+        return self._read(row)
+
+    def get(self, vector_id, default=None):
+        row = self._row(int(vector_id))
+        return default if row is None else self._read(row)
+
+    def get_many(self, vector_ids):
+        """Fetch only the given records, skipping ids that aren't in the store."""
+        results = {}
+        for vector_id in vector_ids:
+            row = self._row(int(vector_id))
+            if row is not None:
+                results[int(vector_id)] = self._read(row)
+        return results
+
+    def _lookup(self, key_table, key, keys_of):
+        hashes = key_table[:, 0]
+        key_hash = _key_hash(key)
+        start, end = np.searchsorted(hashes, key_hash, "left"), np.searchsorted(hashes, key_hash, "right")
+        # re-check the key on the record itself to rule out hash collisions
+        chunks = self.get_many(key_table[start:end, 1])
+        return {vector_id: chunk for vector_id, chunk in chunks.items() if key in keys_of(chunk)}
+
+    def by_file(self, path: str) -> dict:
+        """All chunks of a file, by repo-relative path or full filename."""
+        return self._lookup(self._by_file, path, _file_keys)
+
+    def by_name(self, name: str) -> dict:
+        """All chunks defining a symbol (function, class, method) with this name."""
+        return self._lookup(self._by_name, name, _name_keys)
+
+    def items(self):
+        for row in range(len(self._table)):
+            yield int(self._table[row, 0]), self._read(row)
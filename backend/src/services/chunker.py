@@ -0,0 +1,349 @@
+"""
+AST chunking of Python sources, serially or across a process pool.
+
+A spawned worker re-imports the parent's __main__ module (the app, a job or a
+benchmark, with faiss and the OpenAI SDK behind it), so starting one costs
+seconds. The pool is started once per process and kept, and small inputs or
+single-core machines are chunked serially.
+"""
+import os
+import ast
+import uuid
+import threading
+import multiprocessing
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from ..core.config import settings
+
+
+# ========== Token counting ==========
+@lru_cache(maxsize=1)
+def _get_encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+def count_tokens(text):
+    """Count tokens with tiktoken when available, else fall back to ~4 chars per token."""
+    encoding = _get_encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+def truncate_tokens(text, max_tokens):
+    """text cut down to its first max_tokens tokens."""
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[:max_tokens * 4]
+    tokens = encoding.encode(text, disallowed_special=())
+    return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+
+# ========== AST Chunker ==========
+DEFINITIONS = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+
+def extract_code_chunks(code: str, filename: str):
+    """
+    Split a Python source into chunks in a single pass, so every line of code
+    lands in exactly one chunk:
+      - each top-level function, and each method, is a chunk of its own;
+      - a class chunk holds the class header, docstring, class-level statements
+        and only the signatures of its methods, and lists their chunk ids in
+        "children" (each method points back through "parent_id");
+      - runs of module-level statements between definitions become "Module" chunks.
+    Functions nested inside functions stay part of the enclosing chunk.
+
+    Chunks are then sized against CHUNK_TARGET_TOKENS: bigger ones are split at
+    statement boundaries into "part"s with a CHUNK_OVERLAP_TOKENS overlap, and
+    adjacent siblings under CHUNK_MIN_TOKENS are packed into one chunk. Every
+    chunk records its token count in "tokens".
+    """
+    try:
+        tree = ast.parse(code)
+    except Exception as e:
+        print(f"Failed to parse {filename}: {e}")
+        return []
+    lines = code.splitlines()
+    chunks = []
+    _visit_body(tree.body, lines, filename, None, chunks)
+    chunks = _merge_small_chunks(chunks, lines)
+    for chunk in chunks:
+        chunk["tokens"] = count_tokens(chunk["code"])
+    return chunks
+
+def _start_line(node):
+    """First line of a statement, decorators included."""
+    return min([node.lineno] + [decorator.lineno for decorator in getattr(node, "decorator_list", [])])
+
+def _new_chunk(filename, node_type, name, docstring, code, start, end, parent_id):
+    return {
+        "id": str(uuid.uuid4()),
+        "filename": filename,
+        "name": name,
+        "type": node_type,
+        "docstring": docstring,
+        "code": code,
+        "start_line": start,
+        "end_line": end,
+        "parent_id": parent_id,
+    }
+
+def _visit_body(body, lines, filename, parent_id, chunks):
+    """Emit chunks for a module body: definitions on their own, other statements grouped in runs."""
+    run = []
+    for node in body + [None]:
+        if node is not None and not isinstance(node, DEFINITIONS):
+            run.append(node)
+            continue
+        if run:
+            start, end = _start_line(run[0]), run[-1].end_lineno
+            if "\n".join(lines[start - 1:end]).strip():
+                name = os.path.splitext(os.path.basename(filename))[0]
+                chunk = _new_chunk(filename, "Module", name, None, None, start, end, parent_id)
+                chunks.extend(_split_contiguous(chunk, run, lines))
+            run = []
+        if node is not None:
+            _visit_definition(node, lines, filename, parent_id, chunks)
+
+def _visit_definition(node, lines, filename, parent_id, chunks):
+    start, end = _start_line(node), node.end_lineno
+    if not isinstance(node, ast.ClassDef):
+        chunk = _new_chunk(filename, type(node).__name__, node.name, ast.get_docstring(node), None, start, end, parent_id)
+        chunks.extend(_split_contiguous(chunk, [node], lines))
+        return
+
+    chunk = _new_chunk(filename, "ClassDef", node.name, ast.get_docstring(node), None, start, end, parent_id)
+    chunk["children"] = []
+    chunks.append(chunk)
+
+    # class header up to the first body statement, then the body with methods
+    # and nested classes reduced to their signatures, as (start, end, text lines) segments
+    segments = [(start, _start_line(node.body[0]) - 1, lines[start - 1:_start_line(node.body[0]) - 1])]
+    for child in node.body:
+        child_start = _start_line(child)
+        if isinstance(child, DEFINITIONS):
+            signature_end = _start_line(child.body[0]) - 1
+            body_line = lines[child.body[0].lineno - 1]
+            # col_offset counts UTF-8 bytes
+            head = body_line.encode("utf-8")[:child.body[0].col_offset].decode("utf-8", errors="ignore")
+            if head.strip():
+                # body on the signature's last line, like `def f(self): return 1`: the body is in the child chunk
+                signature = lines[child_start - 1:child.body[0].lineno - 1] + [head.rstrip() + " ..."]
+                segments.append((child_start, child.body[0].lineno, signature))
+            else:
+                indent = lines[child.body[0].lineno - 1]
+                indent = indent[:len(indent) - len(indent.lstrip())]
+                segments.append((child_start, signature_end, lines[child_start - 1:signature_end] + [indent + "..."]))
+            child_chunks = []
+            _visit_definition(child, lines, filename, chunk["id"], child_chunks)
+            chunk["children"].extend(c["id"] for c in child_chunks if c["parent_id"] == chunk["id"])
+            chunks.extend(child_chunks)
+        else:
+            segments.extend(_split_span(child_start, child.end_lineno, [child], lines,
+                                        settings.CHUNK_TARGET_TOKENS - settings.CHUNK_OVERLAP_TOKENS))
+
+    pieces = _pack_segments(segments, settings.CHUNK_TARGET_TOKENS)
+    if len(pieces) > 1:
+        # leave room for the overlap each part after the first repeats
+        pieces = _pack_segments(segments, settings.CHUNK_TARGET_TOKENS - settings.CHUNK_OVERLAP_TOKENS)
+    texts = [[line for segment in piece for line in segment[2]] for piece in pieces]
+    chunk["code"] = "\n".join(texts[0])
+    if len(pieces) > 1:
+        # a class too big for one chunk, methods stay children of the first part
+        index = chunks.index(chunk)
+        for number, piece in enumerate(pieces[1:], start=2):
+            code = "\n".join(_overlap_tail(texts[number - 2]) + texts[number - 1])
+            part = _new_chunk(filename, "ClassDef", node.name, None, code, piece[0][0], piece[-1][1], parent_id)
+            part.update(part=number, parts=len(pieces))
+            chunks.insert(index + number - 1, part)
+        chunk.update(part=1, parts=len(pieces), end_line=pieces[0][-1][1])
+
+# ========== Chunk sizing ==========
+def _child_statements(node):
+    """Statements directly nested in a compound statement, in source order."""
+    children = []
+    for field in ("body", "orelse", "finalbody", "handlers", "cases"):
+        for child in getattr(node, field, None) or []:
+            if isinstance(child, ast.match_case):
+                children.extend(child.body)
+            elif isinstance(child, (ast.stmt, ast.excepthandler)):
+                children.append(child)
+    return sorted(children, key=_start_line)
+
+def _split_lines(start, end, lines, budget):
+    """Last resort for a single statement over budget: cut between lines."""
+    segments, segment_start, tokens = [], start, 0
+    for number in range(start, end + 1):
+        line_tokens = count_tokens(lines[number - 1]) + 1
+        if number > segment_start and tokens + line_tokens > budget:
+            segments.append((segment_start, number - 1, lines[segment_start - 1:number - 1]))
+            segment_start, tokens = number, 0
+        tokens += line_tokens
+    segments.append((segment_start, end, lines[segment_start - 1:end]))
+    return segments
+
+def _split_span(start, end, statements, lines, budget):
+    """
+    Partition lines start..end into (start, end, text lines) segments of at most
+    budget tokens, cutting at the boundaries of the given statements and, for a
+    statement still over budget, of the statements nested in it.
+    """
+    text = lines[start - 1:end]
+    if count_tokens("\n".join(text)) <= budget:
+        return [(start, end, text)]
+    cuts = sorted({start} | {_start_line(statement) for statement in statements if start < _start_line(statement) <= end})
+    if len(cuts) == 1:
+        nested = [child for statement in statements for child in _child_statements(statement)]
+        if nested:
+            return _split_span(start, end, nested, lines, budget)
+        return _split_lines(start, end, lines, budget)
+    segments = []
+    for segment_start, next_start in zip(cuts, cuts[1:] + [end + 1]):
+        inside = [statement for statement in statements if segment_start <= _start_line(statement) < next_start]
+        segments.extend(_split_span(segment_start, next_start - 1, inside, lines, budget))
+    return segments
+
+def _pack_segments(segments, budget):
+    """Greedily group consecutive segments into pieces of at most budget tokens."""
+    pieces, piece, piece_tokens = [], [], 0
+    for segment in segments:
+        tokens = count_tokens("\n".join(segment[2])) + 1
+        if piece and piece_tokens + tokens > budget:
+            pieces.append(piece)
+            piece, piece_tokens = [], 0
+        piece.append(segment)
+        piece_tokens += tokens
+    if piece:
+        pieces.append(piece)
+    return pieces
+
+def _overlap_tail(text_lines):
+    """The last lines of text_lines that fit in CHUNK_OVERLAP_TOKENS, repeated at the start of the next part."""
+    count = 0
+    while count < len(text_lines) and \
+            count_tokens("\n".join(text_lines[-count - 1:])) <= settings.CHUNK_OVERLAP_TOKENS:
+        count += 1
+    return text_lines[len(text_lines) - count:]
+
+def _split_contiguous(chunk, statements, lines):
+    """
+    Fill in the code of a chunk covering lines start_line..end_line, splitting
+    it into parts at statement boundaries if it's over CHUNK_TARGET_TOKENS. Each
+    part after the first repeats up to CHUNK_OVERLAP_TOKENS of the preceding lines.
+    """
+    start, end = chunk["start_line"], chunk["end_line"]
+    chunk["code"] = "\n".join(lines[start - 1:end])
+    budget = settings.CHUNK_TARGET_TOKENS
+    if count_tokens(chunk["code"]) <= budget:
+        return [chunk]
+
+    # leave room for the overlap each part after the first repeats
+    budget -= settings.CHUNK_OVERLAP_TOKENS
+    pieces = _pack_segments(_split_span(start, end, statements, lines, budget), budget)
+    parts = []
+    for number, piece in enumerate(pieces, start=1):
+        piece_start, piece_end = piece[0][0], piece[-1][1]
+        overlap = len(_overlap_tail(lines[start - 1:piece_start - 1])) if number > 1 else 0
+        part = dict(chunk) if number == 1 else dict(chunk, id=str(uuid.uuid4()), docstring=None)
+        part.update(code="\n".join(lines[piece_start - overlap - 1:piece_end]),
+                    start_line=piece_start - overlap, end_line=piece_end, part=number, parts=len(pieces))
+        parts.append(part)
+    return parts
+
+def _mergeable(chunk):
+    return "children" not in chunk and "parts" not in chunk and count_tokens(chunk["code"]) < settings.CHUNK_MIN_TOKENS
+
+def _only_blank_or_comments(lines):
+    return all(not line.strip() or line.lstrip().startswith("#") for line in lines)
+
+def _merge_small_chunks(chunks, lines):
+    """
+    Pack runs of adjacent tiny siblings (same parent, nothing but blank lines or
+    comments between them) into one chunk of up to CHUNK_TARGET_TOKENS, so a
+    file full of three-line helpers doesn't cost an embedding per helper.
+    """
+    merged, removed = [], set()
+    for chunk in chunks:
+        previous = merged[-1] if merged else None
+        if previous is not None and _mergeable(chunk) and ("names" in previous or _mergeable(previous)) \
+                and previous["parent_id"] == chunk["parent_id"] and previous["end_line"] < chunk["start_line"] \
+                and _only_blank_or_comments(lines[previous["end_line"]:chunk["start_line"] - 1]):
+            code = "\n".join(lines[previous["start_line"] - 1:chunk["end_line"]])
+            if count_tokens(code) <= settings.CHUNK_TARGET_TOKENS:
+                previous.setdefault("names", [previous["name"]]).append(chunk["name"])
+                docstrings = [d for d in (previous["docstring"], chunk["docstring"]) if d]
+                previous.update(code=code, end_line=chunk["end_line"], docstring="\n\n".join(docstrings) or None)
+                if previous["type"] != chunk["type"]:
+                    previous["type"] = "Group"
+                removed.add(chunk["id"])
+                continue
+        merged.append(chunk)
+
+    if removed:
+        for chunk in merged:
+            if "children" in chunk:
+                chunk["children"] = [child for child in chunk["children"] if child not in removed]
+    return merged
+
+# ========== Parallel chunking ==========
+def _chunk_batch(batch):
+    """Worker entry point: chunk a batch of (relpath, path, code) files."""
+    return [extract_code_chunks(code, path) for _, path, code in batch]
+
+_pools = {}  # {workers: ProcessPoolExecutor}, kept for the life of the process
+_pools_lock = threading.Lock()
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    with _pools_lock:
+        if workers not in _pools:
+            # spawn, not fork: we may be running next to other threads
+            _pools[workers] = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _pools[workers]
+
+def chunk_files(files, workers=None, batch_size=None, progress=None):
+    """
+    Chunk a list of (relpath, path, code) files. With more than one worker (at
+    most one per core) and at least CHUNK_PARALLEL_MIN_FILES files, the files
+    are sent to the process's chunking pool in batches of batch_size to keep
+    IPC overhead low. Chunks come back in input order whatever the worker
+    count, each tagged with its file's relpath.
+
+    progress, if given, is called with the number of files chunked so far.
+    """
+    workers = min(workers or settings.CHUNK_WORKERS or os.cpu_count() or 1, os.cpu_count() or 1)
+    batch_size = batch_size or settings.CHUNK_BATCH_FILES
+    batches = [files[start:start + batch_size] for start in range(0, len(files), batch_size)]
+
+    parallel = workers > 1 and len(batches) > 1 and len(files) >= settings.CHUNK_PARALLEL_MIN_FILES
+    futures = []
+    chunks = []
+    files_chunked = 0
+    try:
+        if parallel:
+            pool = _get_pool(workers)
+            futures = [pool.submit(_chunk_batch, batch) for batch in batches]
+            results = (future.result() for future in futures)
+        else:
+            results = map(_chunk_batch, batches)
+        # results come in submission order, which keeps the output deterministic
+        for batch, file_chunks in zip(batches, results):
+            for (relpath, _, _), chunks_of_file in zip(batch, file_chunks):
+                for chunk in chunks_of_file:
+                    chunk["relpath"] = relpath
+                    chunks.append(chunk)
+            files_chunked += len(batch)
+            if progress:
+                progress(files_chunked)
+    except BrokenProcessPool:
+        # a worker died (e.g. OOM-killed), the next call starts a fresh pool
+        with _pools_lock:
+            _pools.pop(workers, None)
+        raise
+    finally:
+        # the pool is shared, only this call's batches are dropped
+        for future in futures:
+            future.cancel()
+    return chunks
@@ -1,29 +1,32 @@
-# Walks a directory and summarizes all Python files
+# Summarizes all Python files of a directory
 import os
 from .llm_summary import summarize_code
-def summarize_codebase(base_dir: str):
+from .summary_cache import SummaryStats
+from .repo_scanner import scan_repo, RepoManifest
+def summarize_codebase(base_dir: str, stats: SummaryStats = None, manifest: RepoManifest = None):
+    """Summaries of every Python file, unchanged files are served from the summary cache."""
+    own_stats = stats is None
+    stats = stats or SummaryStats()
+    if manifest is None:
+        manifest = scan_repo(base_dir)
     summaries = []
-    for root, _, files in os.walk(base_dir):
-        for f in files:
-            if f.endswith(".py"):
-                full_path = os.path.join(root, f)
-
-                # Read file content
-                with open(full_path, 'r', encoding='utf-8', errors='ignore') as file:
-                    content = file.read()
-
-                try:
-                    # Generate summary using LLM
-                    summary = summarize_code(content, os.path.relpath(full_path, base_dir))
-                except Exception as e:
-                    summary = f"Error summarizing file: {e}"
-
-                # Store file info and summary
-                summaries.append({
-                    "file_path": os.path.relpath(full_path, base_dir),
-                    "content": content,
-                    "summary": summary
-                })
+    for file in manifest.select(language="python"):
+        content = file.content
+        try:
+            # Generate summary using LLM
+            summary = summarize_code(content, file.relpath, stats)
+        except Exception as e:
+            summary = f"Error summarizing file: {e}"
+
+        # Store file info and summary
+        summaries.append({
+            "file_path": file.relpath,
+            "content": content,
+            "summary": summary
+        })
+    if own_stats:
+        report = stats.report()
+        print(f"♻️ Summary cache hit ratio {report['hit_ratio']}: {report['llm_calls_saved']} LLM calls saved")
     return summaries
 
 def detect_project_metadata(base_dir: str):
@@ -0,0 +1,203 @@
+"""
+Finds the files with database code (ORM models, drivers, raw SQL) for the PRD
+database overview.
+
+Each file is scanned once by a single compiled pattern per language: the DB
+keywords of the language decide on their own, while for Python a few weaker
+hints (a bare connect( call, a Base or Model base class, a django.db import)
+only make the file a candidate for the AST check, parsed in a process pool.
+"""
+import os
+import re
+import ast
+import multiprocessing
+from functools import lru_cache
+from typing import List
+from concurrent.futures import ProcessPoolExecutor
+
+from ..core.config import settings
+from .repo_scanner import scan_repo, RepoManifest, RepoFile, read_text
+
+# --- Keyword-based matching (case-insensitive) ---
+DB_KEYWORDS = [
+    "sqlalchemy", "create_engine", "declarative_base", "Column(", "ForeignKey(", "relationship(",
+    "Base.metadata", "session.query", "session.add", "session.commit",
+    "models.Model",  # Django
+    "cursor.execute", "cursor.fetchone", "cursor.fetchall",
+    "sqlite3.connect", "psycopg2.connect", "MySQLdb.connect",
+    "create table", "insert into", "select * from"
+]
+
+SQL_KEYWORDS = ["create table", "insert into", "select * from", "alter table"]
+
+_JS_KEYWORDS = ["sequelize", "mongoose", "typeorm", "@prisma/client", "drizzle-orm", "knex(", "mongodb://",
+                "mongodb+srv://", "require('mongodb')", "require(\"mongodb\")", "from 'mongodb'", "from \"mongodb\"",
+                "@entity(", "datatypes.", "new schema("]
+_JVM_KEYWORDS = ["@entity", "@table(", "javax.persistence", "jakarta.persistence", "org.hibernate",
+                 "jparepository", "jdbctemplate", "drivermanager.getconnection"]
+
+# ORM models, drivers and query builders of the other languages the scan reads
+ORM_KEYWORDS = {
+    "javascript": _JS_KEYWORDS,
+    "typescript": _JS_KEYWORDS,
+    "java": _JVM_KEYWORDS,
+    "kotlin": _JVM_KEYWORDS,
+    "go": ["gorm.io", "gorm.model", "\"database/sql\"", "jmoiron/sqlx", "go.mongodb.org"],
+    "ruby": ["activerecord", "< applicationrecord", "create_table", "has_many", "belongs_to", "sequel.connect"],
+    "csharp": ["dbcontext", "dbset<", "entityframeworkcore", "sqlconnection"],
+    "php": ["illuminate\\database", "doctrine\\orm", "new pdo(", "schema::create", "extends model"],
+    "prisma": ["datasource"],
+    "sql": ["create index"],
+}
+
+# keywords that read like prose on their own, as (pattern over the lowercased
+# text, characters a match can start with)
+DB_PATTERNS = {
+    "prisma": [(r"(?m:^)[ \t]*model[ \t]+\w+\s*\{", "m \t")],
+    # a select list of comma-separated expressions, not a sentence with "select" and "from" in it
+    "sql": [(r"\bselect\s+(?:distinct\s+)?[^\s,;]+(?:\s+as\s+\w+)?(?:\s*,\s*[^\s,;]+(?:\s+as\s+\w+)?)*\s+from\b", "s")],
+}
+
+# What uses_database_tree looks for, as text (lowercased like the buffer). A
+# match only makes a Python file a candidate, the AST decides.
+_AST_HINTS = r"django\.db|[(,]\s*(?:base|model)\s*[,)]|(?<![\w.])(?:connect|execute|column|create_engine)\s*\("
+_AST_HINT_STARTS = "d(,ce"
+
+
+def db_keywords(language: str) -> List[str]:
+    if language == "python":
+        return DB_KEYWORDS
+    return SQL_KEYWORDS + ORM_KEYWORDS.get(language, [])
+
+
+def _trie_pattern(words) -> str:
+    """The alternation of words factored by common prefixes, so each prefix is tested once per position."""
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def pattern(node):
+        branches = [re.escape(char) + pattern(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        if len(branches) == 1 and "" not in node:
+            return branches[0]
+        return "(?:" + "|".join(branches) + ")" + ("?" if "" in node else "")
+    return pattern(trie)
+
+
+@lru_cache(maxsize=None)
+def db_matcher(language: str):
+    """
+    One pattern over the lowercased text: group "db" for a keyword, "hint"
+    for an AST hint (Python only). It starts with a lookahead on the first
+    characters of the alternatives, which lets re skip to the positions where
+    one can match instead of trying each of them at every character.
+    """
+    keywords = {keyword.lower() for keyword in db_keywords(language)}
+    patterns = DB_PATTERNS.get(language, [])
+    starts = {keyword[0] for keyword in keywords}.union(*(chars for _, chars in patterns))
+    pattern = "(?P<db>" + "|".join([_trie_pattern(keywords)] + [regex for regex, _ in patterns]) + ")"
+    if language == "python":
+        starts |= set(_AST_HINT_STARTS)
+        pattern += "|(?P<hint>" + _AST_HINTS + ")"
+    return re.compile("(?=[" + re.escape("".join(sorted(starts))) + "])(?:" + pattern + ")")
+
+
+def match_db_patterns(content: str, language: str):
+    """True if the text has DB keywords, None if it only has AST hints, False otherwise."""
+    hint = False
+    for match in db_matcher(language).finditer(content.lower()):
+        if match.lastgroup == "db":
+            return True
+        hint = True
+    return None if hint else False
+
+
+def is_db_file(file: RepoFile) -> bool:
+    return match_db_patterns(file.content, file.language) is True
+
+
+# --- AST-based structure check (Python files only) ---
+def uses_database_tree(tree) -> bool:
+    for node in ast.walk(tree):
+        # Check for relevant imports
+        if isinstance(node, ast.ImportFrom):
+            if node.module and ("sqlalchemy" in node.module or "django.db" in node.module):
+                return True
+
+        # Check class inheritance
+        if isinstance(node, ast.ClassDef):
+            for base in node.bases:
+                if isinstance(base, ast.Name) and base.id in {"Base", "Model"}:
+                    return True
+
+        # Check function calls
+        if isinstance(node, ast.Call):
+            if isinstance(node.func, ast.Name):
+                if node.func.id in {"create_engine", "connect", "Column", "execute"}:
+                    return True
+    return False
+
+
+def uses_database_ast(file: RepoFile) -> bool:
+    tree = file.tree
+    return tree is not None and uses_database_tree(tree)
+
+
+def _confirm_batch(paths: List[str]) -> List[bool]:
+    """Process pool entry point: the AST check of a batch of Python files, read here."""
+    results = []
+    for path in paths:
+        try:
+            results.append(uses_database_tree(ast.parse(read_text(path))))
+        except (OSError, SyntaxError, ValueError):
+            results.append(False)
+    return results
+
+
+def confirm_candidates(candidates: List[RepoFile], workers: int = None, batch_size: int = None) -> List[bool]:
+    """The AST check of each candidate, in order, parsed across cores."""
+    workers = workers or settings.DB_DETECT_WORKERS or os.cpu_count() or 1
+    batch_size = batch_size or settings.DB_DETECT_BATCH_FILES
+    batches = [[file.path for file in candidates[start:start + batch_size]]
+               for start in range(0, len(candidates), batch_size)]
+
+    if workers > 1 and len(batches) > 1:
+        # spawn, not fork: we may be running next to other threads
+        with ProcessPoolExecutor(max_workers=min(workers, len(batches)),
+                                 mp_context=multiprocessing.get_context("spawn")) as executor:
+            return [result for results in executor.map(_confirm_batch, batches) for result in results]
+    return [uses_database_ast(file) for file in candidates]
+
+
+# --- Combined DB module detector ---
+def find_db_modules(
+    folder_path: str,
+    file_extensions: List[str] = None,
+    manifest: RepoManifest = None,
+    workers: int = None
+) -> List[RepoFile]:
+    """
+    Scans a folder for files containing database-related logic.
+
+    Args:
+        folder_path (str): The root directory to scan.
+        file_extensions (List[str], optional): File types to consider (default: DB_DETECT_EXTENSIONS).
+        manifest (RepoManifest, optional): The repo scan to pick from, scanned here if not given.
+        workers (int, optional): Processes for the AST checks (default: DB_DETECT_WORKERS).
+
+    Returns:
+        List[RepoFile]: The files that likely contain DB-related code, in path order.
+    """
+    if manifest is None:
+        manifest = scan_repo(folder_path)
+    files = manifest.select(extensions=file_extensions or settings.DB_DETECT_EXTENSIONS)
+    verdicts = [match_db_patterns(file.content, file.language) for file in files]
+    candidates = [file for file, verdict in zip(files, verdicts) if verdict is None]
+    confirmed = iter(confirm_candidates(candidates, workers))
+    # consumed in candidate order, once per file the patterns couldn't decide
+    return [file for file, verdict in zip(files, verdicts) if verdict or (verdict is None and next(confirmed))]
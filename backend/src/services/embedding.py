@@ -1,121 +1,334 @@
 import os
-import ast
 import uuid
-from openai import OpenAI
+import json
+import fcntl
+from contextlib import contextmanager
+from openai import OpenAI, AsyncOpenAI
 import faiss
-import pickle
 import numpy as np
 import shutil
+import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from openai import BadRequestError
 
 from ..core.config import settings
+from ..core.http_clients import get_http_client, get_async_http_client
+from .embedding_cache import embedding_cache
+from .chunk_store import ChunkStore, write_chunk_store
+from .lexical_index import write_lexical_index
+from .ann_index import choose_index_type, create_index, train_index, supports_remove
+from .chunker import chunk_files, count_tokens
+from .repo_scanner import scan_repo, RepoManifest
 os.environ["OPENAI_API_KEY"] = settings.OPENAI_API_KEY
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
-
-# ========== AST Chunker ==========
-def extract_code_chunks(code: str, filename: str):
-    chunks = []
-    try:
-        tree = ast.parse(code)
-        lines = code.splitlines()
-        for node in ast.walk(tree):
-            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
-                start = node.lineno - 1
-                end = _get_end_line(node) - 1
-                chunk = "\n".join(lines[start:end + 1])
-                if chunk.strip():
-                    chunks.append({
-                        "id": str(uuid.uuid4()),
-                        "filename": filename,
-                        "name": getattr(node, 'name', None),
-                        "type": type(node).__name__,
-                        "docstring": ast.get_docstring(node),
-                        "code": chunk
-                    })
-    except Exception as e:
-        print(f"Failed to parse {filename}: {e}")
-    return chunks
-
-def _get_end_line(node):
-    max_lineno = getattr(node, 'lineno', -1)
-    for child in ast.iter_child_nodes(node):
-        child_end = _get_end_line(child)
-        if child_end > max_lineno:
-            max_lineno = child_end
-    return max_lineno
+client = OpenAI(api_key=settings.OPENAI_API_KEY, http_client=get_http_client(), max_retries=0)
+# question embeddings of a search, with the short throttle budget of interactive requests
+question_client = OpenAI(api_key=settings.OPENAI_API_KEY, http_client=get_http_client(interactive=True), max_retries=0)
+async_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, http_client=get_async_http_client(interactive=True),
+                           max_retries=0)
 
 # ========== Repo Walker ==========
-def chunk_repo(path):
-    all_chunks = []
-    for root, _, files in os.walk(path):
-        for file in files:
-            if file.endswith(".py"):
-                full_path = os.path.join(root, file)
-                try:
-                    with open(full_path, 'r', encoding='utf-8') as f:
-                        code = f.read()
-                        chunks = extract_code_chunks(code, full_path)
-                        all_chunks.extend(chunks)
-                except Exception as e:
-                    print(f"Failed to read {full_path}: {e}")
-    return all_chunks
+def read_repo_files(path, manifest: RepoManifest = None):
+    """Python files of the repo scan (one is made if not given). Returns {relative path: {"path", "code", "hash"}}."""
+    if manifest is None:
+        manifest = scan_repo(path)
+    return {file.relpath: {"path": file.path, "code": file.content, "hash": file.hash}
+            for file in manifest.select(language="python")}
+
+def chunk_repo(path, workers=None, manifest: RepoManifest = None):
+    files = read_repo_files(path, manifest)
+    return chunk_files([(relpath, files[relpath]["path"], files[relpath]["code"]) for relpath in sorted(files)],
+                       workers=workers)
 
 # ========== Embedding ==========
-def get_embedding(text, model="text-embedding-3-small"):
-    response = client.embeddings.create(input=[text], model=model)
+# models default to OPENAI_EMBEDDINGS_MODEL, which also keys the embedding cache
+
+def get_embedding(text, model=None, interactive=False):
+    response = (question_client if interactive else client).embeddings.create(
+        input=[text], model=model or settings.OPENAI_EMBEDDINGS_MODEL)
     return response.data[0].embedding  # ✅ CORRECT way
 
-def embed_chunk(chunk):
+async def aget_embedding(text, model=None):
+    response = await async_client.embeddings.create(input=[text], model=model or settings.OPENAI_EMBEDDINGS_MODEL)
+    return response.data[0].embedding
+
+def get_embeddings(texts, model=None):
+    """Embed many texts in a single request, returned in input order."""
+    response = client.embeddings.create(input=texts, model=model or settings.OPENAI_EMBEDDINGS_MODEL)
+    return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+def batch_chunks(chunks, max_items=None, max_tokens=None):
+    """
+    Pack chunks into request-sized batches of (position, chunk) pairs, closing a
+    batch when it reaches either the item-count or the token limit.
+    """
+    max_items = max_items or settings.EMBEDDING_BATCH_SIZE
+    max_tokens = max_tokens or settings.EMBEDDING_BATCH_MAX_TOKENS
+    batch, batch_tokens = [], 0
+    for position, chunk in enumerate(chunks):
+        tokens = chunk.get("tokens") or count_tokens(chunk["code"])
+        if batch and (len(batch) >= max_items or batch_tokens + tokens > max_tokens):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append((position, chunk))
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+def embed_batch(batch):
+    """
+    Embed a batch of (position, chunk) pairs in one request. Throttling and
+    transient errors are retried by the request scheduler; if the API rejects
+    the payload the batch is bisected so only the halves holding failing items
+    are re-sent. Returns a list of (position, embedding, error) tuples.
+    """
     try:
-        embedding = get_embedding(chunk["code"])
-        return {
-            "embedding": embedding,
-            "metadata": chunk,
-            "success": True
-        }
+        embeddings = get_embeddings([chunk["code"] for _, chunk in batch])
+        return [(position, embedding, None) for (position, _), embedding in zip(batch, embeddings)]
+    except BadRequestError as e:
+        if len(batch) == 1:
+            return [(batch[0][0], None, str(e))]
+        mid = len(batch) // 2
+        return embed_batch(batch[:mid]) + embed_batch(batch[mid:])
     except Exception as e:
-        return {
-            "error": str(e),
-            "metadata": chunk,
-            "success": False
-        }
+        # retries are exhausted, bisecting would only send more requests to a struggling API
+        return [(position, None, str(e)) for position, _ in batch]
 
-# ========== Main Logic ==========
-def build_faiss_index(chunks, save_path):
-    embeddings = []
-    metadata = []
+def embed_chunks(chunks, progress=None):
+    """
+    Embed all chunks, serving what we can from the embedding cache and sending
+    only the misses to the API in batches. Returns embeddings in input order,
+    None for failures.
+    """
+    if not chunks:
+        return []
+    texts = [chunk["code"] for chunk in chunks]
+    embeddings = embedding_cache.get_many(settings.OPENAI_EMBEDDINGS_MODEL, texts)
+    missing = [position for position, embedding in enumerate(embeddings) if embedding is None]
+    done = len(chunks) - len(missing)
+    print(f"♻️ {done} of {len(chunks)} chunks served from the embedding cache")
+    if progress:
+        progress("embedding", chunks_total=len(chunks), chunks_embedded=done)
 
-    with ThreadPoolExecutor(max_workers=5) as executor:  # Tune worker count as needed
-        futures = [executor.submit(embed_chunk, chunk) for chunk in chunks]
+    missing_chunks = [chunks[position] for position in missing]
+    executor = ThreadPoolExecutor(max_workers=settings.EMBEDDING_MAX_WORKERS)
+    try:
+        futures = [executor.submit(embed_batch, batch) for batch in batch_chunks(missing_chunks)]
 
         for future in as_completed(futures):
-            result = future.result()
-            if result["success"]:
-                embeddings.append(result["embedding"])
-                metadata.append(result["metadata"])
-                print(f"✅ Embedded: {result['metadata']['filename']} > {result['metadata']['name']}")
-            else:
-                print(f"❌ Failed to embed {result['metadata']['filename']} - {result['error']}")
+            embedded_texts, embedded = [], []
+            results = future.result()
+            for position, embedding, error in results:
+                chunk = missing_chunks[position]
+                if error is None:
+                    embeddings[missing[position]] = embedding
+                    embedded_texts.append(chunk["code"])
+                    embedded.append(embedding)
+                else:
+                    print(f"❌ Failed to embed {chunk['filename']} > {chunk['name']} - {error}")
+            embedding_cache.put_many(settings.OPENAI_EMBEDDINGS_MODEL, embedded_texts, embedded)
+            print(f"✅ Embedded batch of {len(embedded)} chunks")
+            done += len(results)
+            if progress:
+                progress(chunks_embedded=done)
+    finally:
+        # on cancellation don't keep sending the batches still queued
+        executor.shutdown(wait=True, cancel_futures=True)
+    return embeddings
+
+# ========== Index Versions ==========
+# save_path holds one sub-directory per index version plus a CURRENT file naming
+# the live one. A new version is fully written before CURRENT is atomically
+# swapped, so readers never see a half-written index even if an update dies midway.
+CURRENT_FILE = "CURRENT"
+
+def resolve_index_dir(save_path):
+    """Return the directory of the live index version."""
+    with open(os.path.join(save_path, CURRENT_FILE)) as f:
+        return os.path.join(save_path, f.read().strip())
+
+def get_index_version(save_path="faiss_index"):
+    """Name of the live index version, None when nothing has been indexed yet."""
+    try:
+        return os.path.basename(resolve_index_dir(save_path))
+    except FileNotFoundError:
+        return None
+
+def new_index_state():
+    return {"index": None, "metadata": {}, "manifest": {"files": {}, "next_id": 0}}
 
+def load_index_state(save_path):
+    """Load the live index, its metadata ({vector id: chunk}) and file manifest."""
+    try:
+        index_dir = resolve_index_dir(save_path)
+    except FileNotFoundError:
+        return new_index_state()
+    index = faiss.read_index(os.path.join(index_dir, "index.faiss"))
+    metadata = dict(ChunkStore(index_dir).items())
+    with open(os.path.join(index_dir, "manifest.json")) as f:
+        manifest = json.load(f)
+    return {"index": index, "metadata": metadata, "manifest": manifest}
+
+def save_index_state(state, save_path):
+    """Write state as a new index version and make it the live one."""
+    os.makedirs(save_path, exist_ok=True)
+    version = f"v{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}"
+    tmp_dir = os.path.join(save_path, f".tmp-{version}")
+    os.makedirs(tmp_dir)
+
+    faiss.write_index(state["index"], os.path.join(tmp_dir, "index.faiss"))
+    write_chunk_store(tmp_dir, state["metadata"])
+    write_lexical_index(tmp_dir, state["metadata"])
+    with open(os.path.join(tmp_dir, "manifest.json"), "w") as f:
+        json.dump(state["manifest"], f)
+    # small summary so readers don't have to parse the (repo-sized) manifest
+    with open(os.path.join(tmp_dir, "index.json"), "w") as f:
+        json.dump({"index_type": state["manifest"].get("index_type", "flat"), "ntotal": state["index"].ntotal}, f)
+
+    os.replace(tmp_dir, os.path.join(save_path, version))
+    current_tmp = os.path.join(save_path, f".{CURRENT_FILE}.tmp")
+    with open(current_tmp, "w") as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    previous = None
+    if os.path.exists(os.path.join(save_path, CURRENT_FILE)):
+        with open(os.path.join(save_path, CURRENT_FILE)) as f:
+            previous = f.read().strip()
+    os.replace(current_tmp, os.path.join(save_path, CURRENT_FILE))
 
-    dim = len(embeddings[0])
-    index = faiss.IndexFlatL2(dim)
-    index.add(np.array(embeddings).astype('float32'))
+    # keep the previous version around for readers that resolved it just before the swap
+    for name in os.listdir(save_path):
+        if name in (version, previous, CURRENT_FILE, ".lock"):
+            continue
+        stale = os.path.join(save_path, name)
+        if os.path.isdir(stale):
+            shutil.rmtree(stale, ignore_errors=True)
+        else:
+            os.remove(stale)
+    return version
 
+@contextmanager
+def index_lock(save_path):
+    """Serialise index updates across uvicorn workers."""
     os.makedirs(save_path, exist_ok=True)
+    with open(os.path.join(save_path, ".lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
 
-    # Save FAISS index
-    faiss.write_index(index, os.path.join(save_path, "index.faiss"))
+def remove_files_from_index(state, relpaths):
+    """Drop the vectors and metadata of the given files from the index state."""
+    files = state["manifest"]["files"]
+    ids = [vector_id for relpath in relpaths for vector_id in files.pop(relpath, {}).get("ids", [])]
+    if ids and state["index"] is not None:
+        if supports_remove(state["manifest"].get("index_type", "flat")):
+            state["index"].remove_ids(np.array(ids, dtype="int64"))
+        else:
+            # rebuilt by build_faiss_index, mostly from the embedding cache
+            state["index"] = None
+    for vector_id in ids:
+        state["metadata"].pop(vector_id, None)
+    return len(ids)
+
+# ========== Main Logic ==========
+def build_faiss_index(chunks, save_path, state=None, progress=None):
+    """
+    Embed chunks and add them to the index in state (a fresh index when None),
+    then save the result as a new index version. The index is (re)built when
+    there is none yet or when the corpus size calls for a different backend.
+    """
+    state = state or new_index_state()
+    manifest = state["manifest"]
+
+    ids = []
+    embeddings = []
+    for chunk, embedding in zip(chunks, embed_chunks(chunks, progress)):
+        file_entry = manifest["files"].setdefault(chunk["relpath"], {"hash": None, "ids": []})
+        if embedding is None:
+            # forget the file hash so the next upload retries this file
+            file_entry["hash"] = None
+            continue
+        vector_id = manifest["next_id"]
+        manifest["next_id"] += 1
+        file_entry["ids"].append(vector_id)
+        state["metadata"][vector_id] = chunk
+        ids.append(vector_id)
+        embeddings.append(embedding)
 
-    # Save metadata
-    with open(os.path.join(save_path, "index.pkl"), "wb") as f:
-        pickle.dump(metadata, f)
+    index_type = choose_index_type(len(state["metadata"]))
+    if state["index"] is None or manifest.get("index_type") != index_type:
+        # kept chunks come back from the embedding cache, so a rebuild rarely hits the API
+        new_ids = set(ids)
+        kept_ids = [vector_id for vector_id in state["metadata"] if vector_id not in new_ids]
+        kept_chunks = [state["metadata"][vector_id] for vector_id in kept_ids]
+        for vector_id, chunk, embedding in zip(kept_ids, kept_chunks, embed_chunks(kept_chunks, progress)):
+            if embedding is None:
+                state["metadata"].pop(vector_id)
+                file_entry = manifest["files"][chunk["relpath"]]
+                file_entry["ids"].remove(vector_id)
+                file_entry["hash"] = None
+                continue
+            ids.append(vector_id)
+            embeddings.append(embedding)
+        if not embeddings:
+            raise ValueError("No code chunks could be embedded.")
 
-    print(f"🎉 FAISS index built with {len(embeddings)} chunks.")
+        vectors = np.array(embeddings).astype('float32')
+        state["index"] = create_index(index_type, vectors.shape[1], len(vectors))
+        train_index(state["index"], vectors)
+        manifest["index_type"] = index_type
+        print(f"🧭 Building {index_type} index over {len(vectors)} chunks")
+    elif embeddings:
+        vectors = np.array(embeddings).astype('float32')
+
+    if embeddings:
+        state["index"].add_with_ids(vectors, np.array(ids, dtype="int64"))
+
+    if progress:
+        progress("saving")
+    version = save_index_state(state, save_path)
+    print(f"🎉 FAISS index {version} built with {state['index'].ntotal} chunks ({len(chunks)} chunks from changed files).")
 
 # main function
-def embed_documents(repo_path, save_path="faiss_index"):
-    if os.path.exists(save_path):
-        shutil.rmtree(save_path)
-    chunks = chunk_repo(repo_path)
-    build_faiss_index(chunks, save_path)
\ No newline at end of file
+def embed_documents(repo_path, save_path="faiss_index", incremental=None, progress=None, manifest: RepoManifest = None):
+    """
+    Index the Python code under repo_path. In incremental mode only files whose
+    content hash changed since the live index version are re-chunked and re-embedded;
+    vectors of changed and deleted files are removed in place.
+
+    progress, if given, is called as progress(stage=None, **counters) as the
+    pipeline advances (files_total, files_chunked, chunks_total, chunks_embedded)
+    and may raise to abort before the new version is published. manifest is
+    the repo scan shared with the other ingestion stages, made here if not given.
+    """
+    if incremental is None:
+        incremental = settings.INCREMENTAL_INDEXING
+
+    with index_lock(save_path):
+        state = load_index_state(save_path) if incremental else new_index_state()
+        known_files = state["manifest"]["files"]
+        if progress:
+            progress("scanning")
+        files = read_repo_files(repo_path, manifest)
+
+        changed = sorted(relpath for relpath, file in files.items()
+                         if known_files.get(relpath, {}).get("hash") != file["hash"])
+        deleted = sorted(relpath for relpath in known_files if relpath not in files)
+        removed = remove_files_from_index(state, changed + deleted)
+        print(f"🔁 {len(changed)} changed, {len(deleted)} deleted, "
+              f"{len(files) - len(changed)} unchanged files ({removed} stale vectors removed)")
+
+        # uploads land in a fresh temp dir each time, point kept chunks at the new copy
+        for chunk in state["metadata"].values():
+            chunk["filename"] = os.path.join(repo_path, chunk["relpath"])
+
+        if progress:
+            progress("chunking", files_total=len(changed), files_unchanged=len(files) - len(changed), files_chunked=0)
+        for relpath in changed:
+            known_files[relpath] = {"hash": files[relpath]["hash"], "ids": []}
+        chunks = chunk_files([(relpath, files[relpath]["path"], files[relpath]["code"]) for relpath in changed],
+                             progress=(lambda files_chunked: progress(files_chunked=files_chunked)) if progress else None)
+
+        build_faiss_index(chunks, save_path, state, progress)
@@ -0,0 +1,83 @@
+"""Persistent, content-addressed cache of chunk embeddings stored in SQLite."""
+import time
+import hashlib
+import numpy as np
+
+from ..core.config import settings
+from ..core.cache import SQLiteLRUCache
+
+# keep well under SQLite's bound-parameter limit
+_QUERY_BATCH = 500
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache(SQLiteLRUCache):
+    """
+    Maps (embedding model, sha256 of chunk text) -> float32 vector.
+
+    Rows carry their byte size and last-used time; once the cache grows past
+    max_bytes the least recently used rows are evicted.
+    """
+
+    table = "embeddings"
+    key_columns = ("model", "text_hash")
+
+    def _create_table(self):
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            )
+        """)
+
+    def get_many(self, model: str, texts: list) -> list:
+        """Return cached vectors in input order, None where the text isn't cached."""
+        hashes = [text_hash(text) for text in texts]
+        found = {}
+        with self._lock:
+            for i in range(0, len(hashes), _QUERY_BATCH):
+                batch = hashes[i:i + _QUERY_BATCH]
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({','.join('?' * len(batch))})",
+                    [model, *batch],
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, h) for h in found],
+                )
+                self._conn.commit()
+            hits = sum(1 for h in hashes if h in found)
+            self.hits += hits
+            self.misses += len(hashes) - hits
+        return [np.frombuffer(found[h], dtype="float32") if h in found else None for h in hashes]
+
+    def put_many(self, model: str, texts: list, embeddings: list):
+        rows = []
+        now = time.time()
+        for text, embedding in zip(texts, embeddings):
+            if embedding is None:
+                continue
+            blob = np.asarray(embedding, dtype="float32").tobytes()
+            rows.append((model, text_hash(text), blob, len(blob), now))
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, size, last_used) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+            self._evict()
+
+
+embedding_cache = EmbeddingCache(settings.EMBEDDING_CACHE_PATH, settings.EMBEDDING_CACHE_MAX_BYTES)
@@ -0,0 +1,258 @@
+"""
+Background ingestion jobs for /upload_codebase.
+
+Jobs run in a process pool, so zip extraction, AST chunking and index building
+never hold the GIL of the uvicorn worker serving /search. Job state lives in
+JOBS_DIR as one JSON file per job, which lets any uvicorn worker answer status
+polls and cancel requests for a job started by another one.
+"""
+import os
+import json
+import time
+import uuid
+import shutil
+import threading
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from ..core.config import settings
+from ..core.loggers import LoggerSingleton
+
+logger = LoggerSingleton.get_instance()
+
+# how often a running job persists its progress
+PROGRESS_INTERVAL_SECONDS = 0.5
+
+TERMINAL_STATUSES = {"completed", "failed", "cancelled"}
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobStore:
+    """One JSON file per job plus a <job id>.cancel flag file, all written atomically."""
+
+    def __init__(self, jobs_dir: str):
+        self.jobs_dir = jobs_dir
+        os.makedirs(jobs_dir, exist_ok=True)
+
+    def _path(self, job_id, suffix=".json"):
+        # job ids come from URLs, never let them escape the jobs folder
+        return os.path.join(self.jobs_dir, os.path.basename(job_id) + suffix)
+
+    def _write(self, job):
+        tmp_path = self._path(job["id"], f".{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(job, f)
+        os.replace(tmp_path, self._path(job["id"]))
+
+    def create(self, **fields) -> dict:
+        now = time.time()
+        job = {
+            "id": str(uuid.uuid4()),
+            "status": "queued",
+            "stage": None,
+            "created_at": now,
+            "updated_at": now,
+            "progress": {"files_total": 0, "files_chunked": 0, "chunks_total": 0, "chunks_embedded": 0},
+            "eta_seconds": None,
+            "error": None,
+            "result": None,
+            **fields,
+        }
+        self._write(job)
+        return job
+
+    def get(self, job_id):
+        try:
+            with open(self._path(job_id)) as f:
+                job = json.load(f)
+        except FileNotFoundError:
+            return None
+        job["cancel_requested"] = self.cancel_requested(job_id)
+        return job
+
+    def update(self, job_id, **fields) -> dict:
+        job = self.get(job_id)
+        job.pop("cancel_requested", None)
+        job.update(fields, updated_at=time.time())
+        self._write(job)
+        return job
+
+    def prd_path(self, job_id):
+        return self._path(job_id, ".prd.md")
+
+    def request_cancel(self, job_id):
+        open(self._path(job_id, ".cancel"), "w").close()
+
+    def cancel_requested(self, job_id) -> bool:
+        return os.path.exists(self._path(job_id, ".cancel"))
+
+
+job_store = JobStore(settings.JOBS_DIR)
+
+
+class JobProgress:
+    """
+    Progress callback handed to the ingestion pipeline. Persists progress at
+    most every PROGRESS_INTERVAL_SECONDS (and on every stage change), estimates
+    the remaining embedding time, and raises JobCancelled once a cancel was requested.
+    """
+
+    def __init__(self, store: JobStore, job_id: str):
+        self.store = store
+        self.job_id = job_id
+        self.stage = None
+        self.progress = {}
+        self.embedding_started = None
+        self.last_saved = 0.0
+
+    def check_cancelled(self):
+        if self.store.cancel_requested(self.job_id):
+            raise JobCancelled()
+
+    def __call__(self, stage=None, **counters):
+        self.check_cancelled()
+        self.progress.update(counters)
+        stage_changed = stage is not None and stage != self.stage
+        if stage_changed:
+            self.stage = stage
+        if self.embedding_started is None and counters.get("chunks_total"):
+            self.embedding_started = time.time()
+        if not stage_changed and time.time() - self.last_saved < PROGRESS_INTERVAL_SECONDS:
+            return
+        self.last_saved = time.time()
+        self.store.update(self.job_id, stage=self.stage, progress=dict(self.progress), eta_seconds=self._eta())
+
+    def _eta(self):
+        done, total = self.progress.get("chunks_embedded", 0), self.progress.get("chunks_total", 0)
+        if not self.embedding_started or not done or not total:
+            return None
+        elapsed = time.time() - self.embedding_started
+        return round(elapsed / done * (total - done), 1)
+
+
+def _generate_prd(job_id: str, code_dir: str, manifest, checkpoint):
+    """Summary cache report of the PRD run, None if it failed or was stopped."""
+    from .prd import prd_main
+    from .summary_cache import SummaryStats
+
+    stats = SummaryStats()
+    try:
+        prd_main(code_dir, job_store.prd_path(job_id), stats, manifest, checkpoint)
+        return stats.report()
+    except JobCancelled:
+        return None
+    except Exception as e:
+        # the index is still usable without a PRD, don't fail the job over it
+        logger.exception(f"PRD generation failed: {e}", extra={"correlation_id": job_id, "taken_time_ms": None})
+        return None
+
+
+def run_ingestion_job(job_id: str, zip_path: str):
+    """Entry point executed in the job process pool."""
+    # imported here so the API process doesn't pay for them at startup
+    from .zip_extractor import extract_zip
+    from .embedding import embed_documents
+    from .repo_scanner import scan_repo
+
+    progress = JobProgress(job_store, job_id)
+    prd_executor = ThreadPoolExecutor(max_workers=1)
+    prd = None
+    # set when the job ends, so a PRD still running stops at its next LLM call
+    stopped = threading.Event()
+
+    def prd_checkpoint():
+        if stopped.is_set():
+            raise JobCancelled()
+        progress.check_cancelled()
+
+    try:
+        progress("starting")
+        job_store.update(job_id, status="running", started_at=time.time())
+        progress("extracting")
+        code_dir = extract_zip(zip_path)
+        progress("scanning")
+        # walked once, the PRD and the index share the file list and hashes
+        manifest = scan_repo(code_dir)
+
+        # both wait on the API, the PRD is generated while the chunks are embedded
+        if settings.PRD_ON_UPLOAD:
+            prd = prd_executor.submit(_generate_prd, job_id, code_dir, manifest, prd_checkpoint)
+        embed_documents(code_dir, progress=progress, manifest=manifest)
+        if prd is not None:
+            progress("prd")
+        prd_cache = prd.result() if prd is not None else None
+        job_store.update(job_id, status="completed", stage="done", progress=progress.progress,
+                         eta_seconds=0, result={"prdDoc": None, "prd": prd_cache is not None, "prd_cache": prd_cache})
+    except JobCancelled:
+        job_store.update(job_id, status="cancelled", progress=progress.progress, eta_seconds=None)
+    except Exception as e:
+        logger.exception(f"Ingestion job failed: {e}", extra={"correlation_id": job_id, "taken_time_ms": None})
+        job_store.update(job_id, status="failed", error=str(e), eta_seconds=None)
+    finally:
+        stopped.set()
+        if prd is not None:
+            prd.cancel()
+        # the job process is only free once the PRD thread has made its last call
+        prd_executor.shutdown(wait=True, cancel_futures=True)
+        # the upload and its extracted files, the index and the PRD are stored elsewhere
+        shutil.rmtree(os.path.dirname(zip_path), ignore_errors=True)
+
+
+_executor = None
+
+def get_job_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn, not fork: the uvicorn worker has running threads
+        _executor = ProcessPoolExecutor(max_workers=settings.INGESTION_WORKERS,
+                                        mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+def _on_job_done(job_id: str, zip_path: str, future):
+    """
+    Runs in the API process. run_ingestion_job records its own outcome, an
+    exception here means its process died (OOM, a crash in faiss) or the job
+    never ran, so the job would otherwise stay queued or running forever.
+    """
+    if future.cancelled():
+        error = "The job was dropped before it started"
+    else:
+        exception = future.exception()
+        if exception is None:
+            return
+        error = "The job process died" if isinstance(exception, BrokenProcessPool) else str(exception)
+    job = job_store.get(job_id)
+    if job is not None and job["status"] not in TERMINAL_STATUSES:
+        logger.error(f"Ingestion job failed: {error}", extra={"correlation_id": job_id, "taken_time_ms": None})
+        job_store.update(job_id, status="failed", error=error, eta_seconds=None)
+    shutil.rmtree(os.path.dirname(zip_path), ignore_errors=True)
+
+def submit_ingestion_job(zip_path: str, request_id=None) -> dict:
+    global _executor
+    job = job_store.create(request_id=request_id)
+    try:
+        future = get_job_executor().submit(run_ingestion_job, job["id"], zip_path)
+    except BrokenProcessPool:
+        # a job process died (e.g. OOM-killed), start a fresh pool
+        _executor = None
+        future = get_job_executor().submit(run_ingestion_job, job["id"], zip_path)
+    future.add_done_callback(functools.partial(_on_job_done, job["id"], zip_path))
+    return job
+
+def cancel_job(job_id: str):
+    job = job_store.get(job_id)
+    if job is None or job["status"] in TERMINAL_STATUSES:
+        return job
+    job_store.request_cancel(job_id)
+    return job_store.get(job_id)
+
+def shutdown_job_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
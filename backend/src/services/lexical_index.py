@@ -0,0 +1,108 @@
+"""
+BM25 inverted index over chunk names, paths and code (docstrings included).
+
+Stored next to the chunk store as memory-mapped numpy tables:
+  lexical.terms.npy    (t, 3) int64 [term hash, postings offset, document frequency] sorted by hash
+  lexical.postings.npy (p, 2) int64 [vector id, term frequency]
+  lexical.doclen.npy   (n, 2) int64 [vector id, document length] sorted by id
+"""
+import os
+import re
+import json
+import hashlib
+import numpy as np
+from collections import Counter
+
+TERMS_FILE = "lexical.terms.npy"
+POSTINGS_FILE = "lexical.postings.npy"
+DOCLEN_FILE = "lexical.doclen.npy"
+META_FILE = "lexical.json"
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_WORD = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|\d+")
+_CAMEL = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+
+def tokenize(text: str) -> list:
+    """
+    Split text into lowercase terms. Identifiers are kept whole and also broken
+    into their snake_case / camelCase parts, so `getUserById` matches both the
+    exact identifier and a query like "get user by id".
+    """
+    terms = []
+    for word in _WORD.findall(text):
+        terms.append(word.lower())
+        parts = [part.lower() for piece in word.split("_") for part in _CAMEL.findall(piece)]
+        if len(parts) > 1:
+            terms.extend(parts)
+    return terms
+
+
+def chunk_text(chunk: dict) -> str:
+    names = " ".join(chunk.get("names") or [chunk.get("name") or ""])
+    return " ".join(filter(None, (names, chunk.get("relpath"), chunk.get("code"))))
+
+
+def _term_hash(term: str) -> int:
+    return int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little", signed=True)
+
+
+def write_lexical_index(store_dir: str, chunks: dict):
+    """Build the BM25 tables for {vector id: chunk} into store_dir."""
+    postings = {}
+    doclen = np.zeros((len(chunks), 2), dtype="int64")
+    for row, vector_id in enumerate(sorted(chunks)):
+        terms = tokenize(chunk_text(chunks[vector_id]))
+        doclen[row] = (vector_id, len(terms))
+        for term, tf in Counter(terms).items():
+            postings.setdefault(_term_hash(term), []).append((vector_id, tf))
+
+    term_table = np.zeros((len(postings), 3), dtype="int64")
+    posting_table = np.zeros((sum(len(p) for p in postings.values()), 2), dtype="int64")
+    offset = 0
+    for row, term_hash in enumerate(sorted(postings)):
+        entries = postings[term_hash]
+        term_table[row] = (term_hash, offset, len(entries))
+        posting_table[offset:offset + len(entries)] = entries
+        offset += len(entries)
+
+    np.save(os.path.join(store_dir, TERMS_FILE), term_table)
+    np.save(os.path.join(store_dir, POSTINGS_FILE), posting_table)
+    np.save(os.path.join(store_dir, DOCLEN_FILE), doclen)
+    with open(os.path.join(store_dir, META_FILE), "w") as f:
+        json.dump({"documents": len(chunks), "avg_doclen": float(doclen[:, 1].mean()) if len(chunks) else 0.0}, f)
+
+
+class LexicalIndex:
+    """Read-only BM25 search over the tables written by write_lexical_index."""
+
+    def __init__(self, store_dir: str):
+        self._terms = np.load(os.path.join(store_dir, TERMS_FILE), mmap_mode="r")
+        self._postings = np.load(os.path.join(store_dir, POSTINGS_FILE), mmap_mode="r")
+        self._doclen = np.load(os.path.join(store_dir, DOCLEN_FILE), mmap_mode="r")
+        with open(os.path.join(store_dir, META_FILE)) as f:
+            meta = json.load(f)
+        self.documents = meta["documents"]
+        self.avg_doclen = meta["avg_doclen"] or 1.0
+
+    def search(self, query: str, top_k: int) -> list:
+        """Return up to top_k (vector id, score) pairs, best first."""
+        scores = {}
+        hashes = self._terms[:, 0]
+        for term in set(tokenize(query)):
+            term_hash = _term_hash(term)
+            row = int(np.searchsorted(hashes, term_hash))
+            if row >= len(hashes) or hashes[row] != term_hash:
+                continue
+            _, offset, df = self._terms[row]
+            entries = np.asarray(self._postings[offset:offset + df])
+            ids, tf = entries[:, 0], entries[:, 1].astype("float64")
+            rows = np.searchsorted(self._doclen[:, 0], ids)
+            lengths = np.asarray(self._doclen[rows, 1], dtype="float64")
+            idf = np.log(1 + (self.documents - df + 0.5) / (df + 0.5))
+            term_scores = idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * lengths / self.avg_doclen))
+            for vector_id, score in zip(ids.tolist(), term_scores.tolist()):
+                scores[vector_id] = scores.get(vector_id, 0.0) + score
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
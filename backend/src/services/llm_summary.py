@@ -3,10 +3,14 @@
 from openai import OpenAI
 
 from ..core.config import settings
+from ..core.http_clients import get_http_client
+from .summary_cache import cached_summary
 
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
+client = OpenAI(api_key=settings.OPENAI_API_KEY, http_client=get_http_client(), max_retries=0)
 
-def summarize_code(file_content: str, file_path: str):
+SUMMARY_MODEL = "gpt-4"
+
+def summarize_code(file_content: str, file_path: str, stats=None):
     # Construct a smart prompt to summarize the file for documentation and diagram purposes
     prompt = f"""
 You are an expert software engineer. Summarize the purpose of the following Python file and provide a one-liner for inclusion in a Mermaid.js tree diagram.
@@ -19,12 +23,15 @@ Return:
 1. Summary of the file's purpose.
 2. A one-liner node label for the file, e.g., 'models/user.py: defines User ORM'.
 """
-    response = client.chat.completions.create(
-        model="gpt-4",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.3
-    )
-    return response.choices[0].message.content
+    def generate():
+        response = client.chat.completions.create(
+            model=SUMMARY_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.3
+        )
+        return response.choices[0].message.content
+    # keyed by the prompt, which holds the file path and content
+    return cached_summary("file", SUMMARY_MODEL, prompt, generate, stats)
 
 def summarize_project(project_metadata: dict, file_summaries: list):
     """
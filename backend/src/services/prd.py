@@ -1,73 +1,59 @@
+"""
+PRD generation as a map-reduce over the codebase: files are summarized
+concurrently (PRD_MAX_WORKERS at a time, paced by the shared request
+scheduler), then the summaries are folded per directory, per service (top-level
+directory) and finally into the PRD, each prompt kept under PRD_REDUCE_MAX_TOKENS.
+The database overview is generated alongside the file summaries. Every
+summary is cached by prompt, so regenerating after a change only calls the
+LLM for the changed files and the rollups above them. All steps read the
+files from one shared repo scan.
+"""
+import os
 from pathlib import Path
+from typing import List, Callable
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from openai import OpenAI 
 from dotenv import load_dotenv 
 from tqdm import tqdm
 
 from ..core.config import settings
+from ..core.http_clients import get_http_client
+from .chunker import count_tokens, truncate_tokens
+from .summary_cache import cached_summary, SummaryStats
+from .repo_scanner import scan_repo, RepoManifest, RepoFile
+from .db_detector import find_db_modules
 load_dotenv() 
 
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
+client = OpenAI(api_key=settings.OPENAI_API_KEY, http_client=get_http_client(), max_retries=0)
 # allowed_folders = "/home/pushapanjalik/hackathon/ecommerce-microservices-dockerized_setup" #put your main folder path here
 
-from pathlib import Path
-from typing import List
-from tqdm import tqdm
-
 def get_developer_files(
     folder_path: str,
-    allowed_extensions: List[str] = [".py", ".ipynb", ".txt" , ".md" , ".html" , ".js"]
-) -> List[Path]:
+    allowed_extensions: List[str] = [".py", ".ipynb", ".txt" , ".md" , ".html" , ".js"],
+    manifest: RepoManifest = None
+) -> List[RepoFile]:
     """
-    Returns a list of developer-authored files in the given folder.
+    Returns the developer-authored files of the given folder.
 
     Args:
         folder_path (str): The root directory to search.
-        allowed_extensions (List[str], optional): File extensions to include. Defaults to [".py", ".ipynb", ".txt"].
+        allowed_extensions (List[str], optional): File extensions to include.
+        manifest (RepoManifest, optional): The repo scan to pick from, scanned here if not given.
 
     Returns:
-        List[Path]: List of valid developer file paths.
+        List[RepoFile]: The valid developer files, already read.
     """
-    folder = Path(folder_path).resolve()
-    valid_files = []
-
-    for path in tqdm(folder.rglob("*"), desc="Scanning developer files"):
-        if not path.is_file():
-            continue
-
-        # Skip hidden files or folders (e.g., .git, .venv)
-        if any(part.startswith(".") for part in path.parts):
-            continue
-
-        # Skip non-allowed extensions
-        if path.suffix.lower() not in allowed_extensions:
-            continue
-
-        # Skip auto-generated or unnecessary files
-        if "__pycache__" in path.parts or path.name == "__init__.py":
-            continue
-
-        valid_files.append(path)
-
-    return valid_files
+    if manifest is None:
+        manifest = scan_repo(folder_path)
+    # hidden, ignored and __pycache__ directories are never scanned
+    return [file for file in manifest.select(extensions=allowed_extensions) if file.name != "__init__.py"]
 def save_to_markdown(content: str, filename: str = "output.md"):
         with open(filename, "w", encoding="utf-8") as f:
             f.write(content)
         print(f"✅ Saved to {filename}")
 
 
-def generate_prd(folder_path) :
-    # import pdb; pdb.set_trace()
-    files = get_developer_files(folder_path)
-    print(files)
-    summaries = []
-    for one_file in tqdm(files) : 
-        try:
-                # import pdb; pdb.set_trace()
-            with open(one_file, "r", encoding="utf-8") as f:
-                content = f.read()
-                response = client.responses.create(
-                    model="gpt-4.1",
-                    input=f"""You are a technical summarizer helping build documentation for a software project.
+file_summary_prompt = """You are a technical summarizer helping build documentation for a software project.
                         Below is the content of a file from the project (which may be code, documentation, or text notes).
                         Your task is to write a concise summary that explains the purpose and role of this file in the overall project.
 
@@ -81,19 +67,19 @@ def generate_prd(folder_path) :
 
                         If it’s documentation (e.g. README), explain what it covers in detail.
 
-                        If unsure, say what kind of content it appears to contain. Here is file content - {content} , file name - {one_file}
+                        If unsure, say what kind of content it appears to contain. Here is file content - {content} , file name - {file_name}
 
                         """
-                                            )
-
-                summaries.append(f"{one_file} : {response.output_text}")
-        except Exception as e :
-            print(e)
-            continue
-    # import pdb; pdb.set_trace()
-    final_response = client.responses.create(
-        model = "gpt-4.1",
-        input = f"""You are a product manager analyzing a software codebase. Below is a list of 1–2 line summaries describing what each file in the repository does.
+
+reduce_prompt = """You are a technical writer documenting a software project. Below are summaries of the parts
+            (files or sub-directories) of {scope}. Combine them into one concise summary of what {scope} does,
+            its main components and how they fit together. Keep the concrete names of modules, classes, endpoints
+            and technologies, they are needed to write the product documentation later.
+
+            Here are the summaries:
+            {summaries}"""
+
+prd_prompt = """You are a product manager analyzing a software codebase. Below is a list of summaries describing what each part (service or directory) of the repository does.
             Based on these summaries, write a detailed Product Requirements Document (PRD) that describes the software as if you were introducing it to a product and engineering team.
 
             Your PRD should include the following sections:
@@ -112,100 +98,160 @@ def generate_prd(folder_path) :
 
             Use professional, clear language, and ensure the document is easy to read for both technical and non-technical stakeholders.
 
-            Here are the file summaries: {summaries}"""
-        )
-    
-    print(final_response.output_text)
-    save_to_markdown(final_response.output_text , 'output.md')
-    return final_response
+            Here are the summaries: {summaries}"""
 
+ROOT_SCOPE = "(root)"
 
-from pathlib import Path
-from typing import List
-import ast
-
-# --- Keyword-based matching ---
-DB_KEYWORDS = [
-    "sqlalchemy", "create_engine", "declarative_base", "Column(", "ForeignKey(", "relationship(",
-    "Base.metadata", "session.query", "session.add", "session.commit",
-    "models.Model",  # Django
-    "cursor.execute", "cursor.fetchone", "cursor.fetchall",
-    "sqlite3.connect", "psycopg2.connect", "MySQLdb.connect",
-    "create table", "insert into", "select * from"
-]
-
-def is_db_file(file_path: Path) -> bool:
-    try:
-        content = file_path.read_text(encoding="utf-8", errors="ignore").lower()
-        return any(keyword in content for keyword in DB_KEYWORDS)
-    except Exception:
-        return False
+def _complete(prompt: str, kind: str, stats: SummaryStats = None) -> str:
+    def generate():
+        response = client.responses.create(model=settings.PRD_MODEL, input=prompt)
+        return response.output_text
+    return cached_summary(kind, settings.PRD_MODEL, prompt, generate, stats)
 
+def summarize_file(file: RepoFile, stats: SummaryStats = None) -> str:
+    # a few very large files (lock files, bundles) would overflow the prompt
+    content = truncate_tokens(file.content, settings.PRD_FILE_MAX_TOKENS)
+    # the relative path keeps the prompt, and so the cache key, stable across uploads
+    return _complete(file_summary_prompt.format(content=content, file_name=file.relpath), "file", stats)
 
-# --- AST-based structure check (Python files only) ---
-def uses_database_ast(file_path: Path) -> bool:
+def summarize_files(files: List[RepoFile], executor, stats: SummaryStats = None, checkpoint: Callable = None) -> dict:
+    """
+    {relative path: summary}, summarized concurrently. Files that fail are left
+    out. checkpoint is called between files; when it raises, the files not
+    started yet are dropped and the exception propagates.
+    """
+    futures = {executor.submit(summarize_file, file, stats): file for file in files}
+    summaries = {}
     try:
-        tree = ast.parse(file_path.read_text(encoding="utf-8", errors="ignore"))
-        for node in ast.walk(tree):
-            # Check for relevant imports
-            if isinstance(node, ast.ImportFrom):
-                if node.module and ("sqlalchemy" in node.module or "django.db" in node.module):
-                    return True
-
-            # Check class inheritance
-            if isinstance(node, ast.ClassDef):
-                for base in node.bases:
-                    if isinstance(base, ast.Name) and base.id in {"Base", "Model"}:
-                        return True
-
-            # Check function calls
-            if isinstance(node, ast.Call):
-                if isinstance(node.func, ast.Name):
-                    if node.func.id in {"create_engine", "connect", "Column", "execute"}:
-                        return True
-        return False
-    except Exception:
-        return False
-
-
-# --- Combined DB module detector ---
-def find_db_modules(
-    folder_path: str,
-    file_extensions: List[str] = [".py"]
-) -> List[Path]:
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Summarizing files"):
+            if checkpoint:
+                checkpoint()
+            file = futures[future]
+            try:
+                summaries[file.relpath] = future.result()
+            except Exception as e:
+                print(f"❌ Failed to summarize {file.path} - {e}")
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        raise
+    return summaries
+
+def _pack(items: List[str]) -> List[List[str]]:
+    """Group items into prompts of at most PRD_REDUCE_MAX_TOKENS, at least two items per group."""
+    budget = settings.PRD_REDUCE_MAX_TOKENS
+    groups, group, used = [], [], 0
+    for item in items:
+        item = truncate_tokens(item, budget // 2)
+        tokens = count_tokens(item)
+        if group and used + tokens > budget:
+            groups.append(group)
+            group, used = [], 0
+        group.append(item)
+        used += tokens
+    if group:
+        groups.append(group)
+    return groups
+
+def _summarize_group(job, stats: SummaryStats = None) -> str:
+    scope, items = job
+    return _complete(reduce_prompt.format(scope=scope, summaries="\n\n".join(items)), "rollup", stats)
+
+def fold_summaries(scopes: dict, executor, stats: SummaryStats = None) -> dict:
     """
-    Scans a folder for files containing database-related logic.
-
-    Args:
-        folder_path (str): The root directory to scan.
-        file_extensions (List[str]): File types to consider (default: Python files only).
-
-    Returns:
-        List[Path]: List of file paths that likely contain DB-related code.
+    Combine each scope's summaries in rounds, all scopes of a round in parallel,
+    until they fit in one prompt. Returns {scope: summaries fitting one prompt}.
     """
-    root = Path(folder_path).resolve()
-    db_files = []
-
-    for path in root.rglob("*"):
-        if not path.is_file() or path.suffix not in file_extensions:
-            continue
-        if any(part.startswith(".") for part in path.parts):  # Skip hidden files/folders
-            continue
-        if is_db_file(path) or uses_database_ast(path):
-            db_files.append(path)
-
-    return db_files
-
-def prepare_db_code_for_prompt(file_paths: list[Path]) -> str:
+    fitted, pending = {}, dict(scopes)
+    while pending:
+        jobs = []
+        for scope, items in pending.items():
+            groups = _pack(items)
+            if len(groups) == 1:
+                fitted[scope] = groups[0]
+            else:
+                jobs.extend((scope, group) for group in groups)
+        pending = {}
+        for (scope, _), summary in zip(jobs, executor.map(lambda job: _summarize_group(job, stats), jobs)):
+            pending.setdefault(scope, []).append(summary)
+    return fitted
+
+def reduce_summaries(scopes: dict, executor, stats: SummaryStats = None) -> dict:
+    """One summary per scope. A scope with a single summary keeps it, no LLM call needed."""
+    fitted = fold_summaries(scopes, executor, stats)
+    reduced = {scope: items[0] for scope, items in fitted.items() if len(items) == 1}
+    jobs = [(scope, items) for scope, items in fitted.items() if len(items) > 1]
+    reduced.update(zip([scope for scope, _ in jobs], executor.map(lambda job: _summarize_group(job, stats), jobs)))
+    return reduced
+
+def _group_by(summaries: dict, key) -> dict:
+    scopes = {}
+    for name in sorted(summaries):
+        scopes.setdefault(key(name), []).append(f"{name}: {summaries[name]}")
+    return scopes
+
+def _directory(relpath: str) -> str:
+    return os.path.dirname(relpath) or ROOT_SCOPE
+
+def _service(directory: str) -> str:
+    return ROOT_SCOPE if directory == ROOT_SCOPE else directory.split("/")[0]
+
+def report_cache_stats(stats: SummaryStats):
+    report = stats.report()
+    print(f"♻️ Summary cache hit ratio {report['hit_ratio']}: {report['llm_calls_saved']} LLM calls saved, "
+          f"{report['llm_calls']} made {report['by_kind']}")
+    return report
+
+def generate_prd(folder_path, executor=None, stats: SummaryStats = None, manifest: RepoManifest = None,
+                 checkpoint: Callable = None) -> str:
+    """
+    Summarize every developer file, fold the summaries per directory and per
+    service, then write the PRD from the service summaries. Returns the PRD markdown.
+    checkpoint, if given, is called between files and between the reduce steps
+    and stops the run by raising.
+    """
+    own_executor, own_stats = executor is None, stats is None
+    executor = executor or ThreadPoolExecutor(max_workers=settings.PRD_MAX_WORKERS)
+    stats = stats or SummaryStats()
+    checkpoint = checkpoint or (lambda: None)
+    try:
+        file_summaries = summarize_files(get_developer_files(folder_path, manifest=manifest), executor, stats,
+                                         checkpoint)
+        if not file_summaries:
+            raise ValueError("No files could be summarized.")
+        checkpoint()
+        directories = reduce_summaries(_group_by(file_summaries, _directory), executor, stats)
+        checkpoint()
+        services = reduce_summaries(_group_by(directories, _service), executor, stats)
+        print(f"🧾 Summarized {len(file_summaries)} files, {len(directories)} directories, {len(services)} services")
+        checkpoint()
+        summaries = fold_summaries({"the repository": [f"{name}: {summary}" for name, summary in sorted(services.items())]},
+                                   executor, stats)["the repository"]
+        checkpoint()
+        return _complete(prd_prompt.format(summaries="\n\n".join(summaries)), "prd", stats)
+    finally:
+        if own_executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+        if own_stats:
+            report_cache_stats(stats)
+
+
+def prepare_db_code_for_prompt(files: list[RepoFile], max_tokens: int = None) -> str:
+    """The files as markdown code blocks, stopping at max_tokens (PRD_DB_MAX_TOKENS)."""
+    max_tokens = max_tokens or settings.PRD_DB_MAX_TOKENS
     prompt_input = ""
-
-    for path in file_paths:
-        try:
-            content = path.read_text(encoding="utf-8", errors="ignore")
-        except Exception as e:
-            content = f"<Error reading file: {e}>"
-        
-        prompt_input += f"**{path.name}**\n```\n{content.strip()}\n```\n\n---\n\n"
+    used = 0
+
+    for file in files:
+        block = f"**{file.name}**\n```\n{file.content.strip()}\n```\n\n---\n\n"
+        tokens = count_tokens(block)
+        if used + tokens > max_tokens:
+            block = truncate_tokens(block, max_tokens - used)
+            tokens = max_tokens - used
+        prompt_input += block
+        used += tokens
+        if used >= max_tokens:
+            break
     
     return prompt_input
 
@@ -328,21 +374,34 @@ erDiagram
 
 
 
-def prd_main(path: Path):
-    generate_prd(path)
-    db_files = find_db_modules(path)
+def generate_db_overview(path, stats: SummaryStats = None, manifest: RepoManifest = None,
+                         checkpoint: Callable = None) -> str:
+    db_files = find_db_modules(path, manifest=manifest)
+    if not db_files:
+        return ""
+    if checkpoint:
+        checkpoint()
     code_lines = prepare_db_code_for_prompt(db_files)
-
     final_prompt = db_prompt + f"Below is a collection of code files that contain database-related logic...\n{code_lines}"
+    return _complete(final_prompt, "db", stats)
 
-    resp = client.responses.create(
-        model="gpt-4.1",
-        input=final_prompt
-    )
-
-    with open("output.md", "a", encoding="utf-8") as f:
-        f.write(resp.output_text)
-
-
-
-
+def prd_main(path: Path, output_path: str = "output.md", stats: SummaryStats = None,
+             manifest: RepoManifest = None, checkpoint: Callable = None) -> str:
+    """
+    PRD plus database overview of the codebase at path, saved to output_path.
+    Returns the markdown; pass stats to get the summary cache hits of the run,
+    manifest to reuse a scan of the repo and checkpoint (raising to stop) to
+    make the run cancellable between LLM calls.
+    """
+    stats = stats or SummaryStats()
+    if manifest is None:
+        manifest = scan_repo(path)
+    with ThreadPoolExecutor(max_workers=settings.PRD_MAX_WORKERS) as executor:
+        # submitted first, so the schema step runs while the files are summarized
+        db_overview = executor.submit(generate_db_overview, path, stats, manifest, checkpoint)
+        content = generate_prd(path, executor, stats, manifest, checkpoint)
+        if db_overview.result():
+            content += "\n\n" + db_overview.result()
+    report_cache_stats(stats)
+    save_to_markdown(content, output_path)
+    return content
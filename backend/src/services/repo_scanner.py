@@ -0,0 +1,228 @@
+"""
+Single pass over an uploaded repo, shared by every ingestion stage (chunking,
+PRD generation, DB detection, code summaries).
+
+The walk prunes ignored directories (SCAN_IGNORED_DIRS, hidden directories and
+whatever the .gitignore files exclude) before descending into them, so
+node_modules, .git or a virtualenv cost one directory entry each. Every kept
+file is read once for its hash; the manifest keeps only paths, sizes and
+hashes, and a stage reads the content (or parses the AST) when it needs it,
+so no file's text stays in memory for the whole job.
+"""
+import os
+import re
+import ast
+import hashlib
+
+from ..core.config import settings
+
+LANGUAGES = {
+    ".py": "python",
+    ".ipynb": "notebook",
+    ".js": "javascript",
+    ".json": "json",
+    ".md": "markdown",
+    ".txt": "text",
+    ".html": "html",
+    ".ts": "typescript",
+    ".java": "java",
+    ".kt": "kotlin",
+    ".go": "go",
+    ".rb": "ruby",
+    ".cs": "csharp",
+    ".php": "php",
+    ".sql": "sql",
+    ".prisma": "prisma",
+}
+
+class RepoFile:
+    """One file of the repo: its path and hash, the content read from disk on use."""
+
+    __slots__ = ("relpath", "path", "size", "hash", "language", "_stats")
+
+    def __init__(self, relpath: str, path: str, size: int, content: str, stats: dict = None):
+        self.relpath = relpath
+        self.path = path
+        self.size = size
+        # of the decoded text, as the index manifests have always stored it
+        self.hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        self.language = LANGUAGES.get(self.suffix, self.suffix.lstrip("."))
+        self._stats = stats
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.relpath)
+
+    @property
+    def suffix(self) -> str:
+        return os.path.splitext(self.relpath)[1].lower()
+
+    @property
+    def content(self) -> str:
+        """The text of the file, read again on every access. Keep it only as long as it's needed."""
+        if self._stats is not None:
+            self._stats["files_read"] += 1
+            self._stats["bytes_read"] += self.size
+        return read_text(self.path)
+
+    @property
+    def tree(self):
+        """The module AST of a Python file, parsed on every access. None if it doesn't parse."""
+        if self.language != "python":
+            return None
+        try:
+            return ast.parse(self.content)
+        except (SyntaxError, ValueError):
+            return None
+
+
+class RepoManifest:
+    """The files of a scan, {relative posix path: RepoFile} in path order, plus the walk counters."""
+
+    def __init__(self, root: str, files: dict, stats: dict):
+        self.root = root
+        self.files = files
+        self.stats = stats
+
+    def __len__(self):
+        return len(self.files)
+
+    def __iter__(self):
+        return iter(self.files.values())
+
+    def select(self, extensions=None, language: str = None) -> list:
+        return [file for file in self.files.values()
+                if (extensions is None or file.suffix in extensions)
+                and (language is None or file.language == language)]
+
+
+def _gitignore_regex(pattern: str):
+    """(regex, negate, dir_only) of one .gitignore line, None for blanks and comments."""
+    pattern = pattern.rstrip("\n").rstrip()
+    if not pattern or pattern.startswith("#"):
+        return None
+    negate = pattern.startswith("!")
+    pattern = pattern[1:] if negate else pattern
+    dir_only = pattern.endswith("/")
+    pattern = pattern.rstrip("/")
+    # a slash at the start or in the middle anchors the pattern to the .gitignore's directory
+    anchored = "/" in pattern
+    pattern = pattern.lstrip("/")
+    if not pattern:
+        return None
+
+    regex, i = "", 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            regex, i = regex + "(?:.*/)?", i + 3
+        elif pattern.startswith("**", i):
+            regex, i = regex + ".*", i + 2
+        elif pattern[i] == "*":
+            regex, i = regex + "[^/]*", i + 1
+        elif pattern[i] == "?":
+            regex, i = regex + "[^/]", i + 1
+        elif pattern[i] == "[" and "]" in pattern[i + 2:]:
+            end = pattern.index("]", i + 2)
+            regex, i = regex + "[" + pattern[i + 1:end].replace("!", "^", 1) + "]", end + 1
+        else:
+            regex, i = regex + re.escape(pattern[i]), i + 1
+    if not anchored:
+        regex = "(?:.*/)?" + regex
+    return re.compile(regex + r"\Z"), negate, dir_only
+
+
+class GitIgnore:
+    """The rules of the .gitignore files met so far. The last matching rule wins, like git."""
+
+    def __init__(self):
+        self.rules = []  # (directory relpath, regex, negate, dir_only)
+
+    def add(self, directory: str, text: str):
+        for line in text.splitlines():
+            rule = _gitignore_regex(line)
+            if rule:
+                self.rules.append((directory,) + rule)
+
+    def ignored(self, relpath: str, is_dir: bool) -> bool:
+        ignored = False
+        for directory, regex, negate, dir_only in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if directory:
+                if not relpath.startswith(directory + "/"):
+                    continue
+                path = relpath[len(directory) + 1:]
+            else:
+                path = relpath
+            if regex.match(path):
+                ignored = not negate
+        return ignored
+
+
+def read_text(path: str) -> str:
+    with open(path, "rb") as f:
+        data = f.read()
+    text = data.decode("utf-8", errors="ignore")
+    # the same text open() in text mode gives, which the stages used to read
+    return text.replace("\r\n", "\n").replace("\r", "\n") if "\r" in text else text
+
+
+def scan_repo(root, extensions=None, max_file_bytes: int = None, ignored_dirs=None) -> RepoManifest:
+    """
+    Walk root once and read every file with one of the extensions
+    (EXTRACT_EXTENSIONS), skipping hidden files, files above max_file_bytes
+    (ZIP_MAX_FILE_BYTES) and everything under ignored directories.
+    """
+    root = os.path.abspath(root)
+    extensions = {extension.lower() for extension in (extensions or settings.EXTRACT_EXTENSIONS)}
+    max_file_bytes = max_file_bytes or settings.ZIP_MAX_FILE_BYTES
+    ignored_dirs = set(settings.SCAN_IGNORED_DIRS if ignored_dirs is None else ignored_dirs)
+    gitignore = GitIgnore()
+    stats = {"dirs_visited": 0, "dirs_pruned": 0, "files_seen": 0, "files_read": 0, "files_skipped": 0, "bytes_read": 0}
+    files = {}
+
+    for directory, dirnames, filenames in os.walk(root):
+        stats["dirs_visited"] += 1
+        reldir = os.path.relpath(directory, root).replace(os.sep, "/")
+        reldir = "" if reldir == "." else reldir
+        if ".gitignore" in filenames:
+            try:
+                gitignore_text = read_text(os.path.join(directory, ".gitignore"))
+                stats["bytes_read"] += len(gitignore_text)
+                gitignore.add(reldir, gitignore_text)
+            except OSError:
+                pass
+
+        # pruned in place, os.walk doesn't descend into what's removed
+        kept = []
+        for name in dirnames:
+            relpath = f"{reldir}/{name}" if reldir else name
+            if name.startswith(".") or name in ignored_dirs or gitignore.ignored(relpath, True):
+                stats["dirs_pruned"] += 1
+            else:
+                kept.append(name)
+        dirnames[:] = sorted(kept)
+
+        for name in filenames:
+            stats["files_seen"] += 1
+            relpath = f"{reldir}/{name}" if reldir else name
+            if name.startswith(".") or os.path.splitext(name)[1].lower() not in extensions \
+                    or gitignore.ignored(relpath, False):
+                stats["files_skipped"] += 1
+                continue
+            path = os.path.join(directory, name)
+            try:
+                size = os.path.getsize(path)
+                if size > max_file_bytes:
+                    stats["files_skipped"] += 1
+                    continue
+                content = read_text(path)
+            except OSError as e:
+                print(f"Failed to read {path}: {e}")
+                stats["files_skipped"] += 1
+                continue
+            stats["files_read"] += 1
+            stats["bytes_read"] += size
+            files[relpath] = RepoFile(relpath, path, size, content, stats)
+
+    return RepoManifest(root, dict(sorted(files.items())), stats)
@@ -0,0 +1,140 @@
+"""
+Conversation state per chat session: the agent's message history and the
+chunks its retrieval tool returned, so follow-up questions build on earlier
+turns instead of starting from zero.
+
+SESSION_BACKEND picks where sessions live: "memory" keeps an LRU of them in
+each worker, "redis" shares them between workers through REDIS_URL (any
+redis-py compatible client works, e.g. a fake in tests).
+"""
+import json
+import threading
+import contextvars
+from langchain_core.chat_history import BaseChatMessageHistory, InMemoryChatMessageHistory
+from langchain_core.messages import messages_from_dict, message_to_dict
+from langchain.memory import ConversationBufferWindowMemory
+
+from ..core.config import settings
+from ..core.cache import TTLCache
+
+KEY_PREFIX = "codecoach:session"
+
+# session of the agent call in progress, read by the retrieval tool
+current_session = contextvars.ContextVar("current_session", default=None)
+
+
+class RedisMessageHistory(BaseChatMessageHistory):
+    """Chat history kept in a Redis list, expiring ttl_seconds after the last message."""
+
+    def __init__(self, client, session_id, ttl_seconds):
+        self.client = client
+        self.key = f"{KEY_PREFIX}:messages:{session_id}"
+        self.ttl_seconds = ttl_seconds
+
+    @property
+    def messages(self):
+        return messages_from_dict([json.loads(item) for item in self.client.lrange(self.key, 0, -1)])
+
+    def add_message(self, message):
+        self.client.rpush(self.key, json.dumps(message_to_dict(message)))
+        # the agent only ever reads a short window
+        self.client.ltrim(self.key, -settings.SESSION_MAX_MESSAGES, -1)
+        self.client.expire(self.key, self.ttl_seconds)
+
+    def clear(self):
+        self.client.delete(self.key)
+
+
+class WindowedChatMessageHistory(InMemoryChatMessageHistory):
+    """InMemoryChatMessageHistory keeping the last SESSION_MAX_MESSAGES messages, like RedisMessageHistory."""
+
+    def add_message(self, message):
+        super().add_message(message)
+        del self.messages[:-settings.SESSION_MAX_MESSAGES]
+
+
+class InMemorySessionStore:
+    """Sessions of this worker, least recently used evicted, expiring ttl_seconds after last use."""
+
+    def __init__(self, max_sessions, ttl_seconds):
+        self._histories = TTLCache(max_sessions, ttl_seconds)
+        self._retrievals = TTLCache(max_sessions, ttl_seconds)
+        self._lock = threading.Lock()
+
+    def history(self, session_id) -> BaseChatMessageHistory:
+        with self._lock:
+            history = self._histories.get(session_id)
+            if history is None:
+                history = WindowedChatMessageHistory()
+            # set again on every use, so the TTL counts from the last use
+            self._histories.set(session_id, history)
+            return history
+
+    def has_history(self, session_id) -> bool:
+        history = self._histories.get(session_id)
+        return history is not None and bool(history.messages)
+
+    def get_retrieval(self, session_id, key):
+        return (self._retrievals.get(session_id) or {}).get(key)
+
+    def put_retrieval(self, session_id, key, chunks):
+        with self._lock:
+            retrievals = self._retrievals.get(session_id) or {}
+            retrievals[key] = chunks
+            while len(retrievals) > settings.SESSION_MAX_RETRIEVALS:
+                retrievals.pop(next(iter(retrievals)))
+            self._retrievals.set(session_id, retrievals)
+
+
+class RedisSessionStore:
+    """Sessions shared by every worker through Redis."""
+
+    def __init__(self, client, ttl_seconds):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+
+    def history(self, session_id) -> BaseChatMessageHistory:
+        return RedisMessageHistory(self.client, session_id, self.ttl_seconds)
+
+    def has_history(self, session_id) -> bool:
+        return bool(self.client.exists(f"{KEY_PREFIX}:messages:{session_id}"))
+
+    def get_retrieval(self, session_id, key):
+        chunks = self.client.hget(f"{KEY_PREFIX}:retrievals:{session_id}", key)
+        return json.loads(chunks) if chunks is not None else None
+
+    def put_retrieval(self, session_id, key, chunks):
+        redis_key = f"{KEY_PREFIX}:retrievals:{session_id}"
+        # hash fields have no order, the list keeps insertion order to evict the oldest first
+        order_key = f"{KEY_PREFIX}:retrieval_keys:{session_id}"
+        if self.client.hset(redis_key, key, json.dumps(chunks)):
+            self.client.rpush(order_key, key)
+            while self.client.llen(order_key) > settings.SESSION_MAX_RETRIEVALS:
+                self.client.hdel(redis_key, self.client.lpop(order_key))
+        self.client.expire(redis_key, self.ttl_seconds)
+        self.client.expire(order_key, self.ttl_seconds)
+
+
+_session_store = None
+
+def get_session_store():
+    global _session_store
+    if _session_store is None:
+        if settings.SESSION_BACKEND == "redis":
+            import redis
+            _session_store = RedisSessionStore(redis.Redis.from_url(settings.REDIS_URL), settings.SESSION_TTL_SECONDS)
+        elif settings.SESSION_BACKEND == "memory":
+            _session_store = InMemorySessionStore(settings.SESSION_MAX, settings.SESSION_TTL_SECONDS)
+        else:
+            raise ValueError(f"Unknown SESSION_BACKEND {settings.SESSION_BACKEND!r}, expected memory or redis")
+    return _session_store
+
+def set_session_store(store):
+    """Swap the backend, e.g. for a RedisSessionStore over a fake client."""
+    global _session_store
+    _session_store = store
+
+def session_memory(session_id=None):
+    """Window memory over the session's history, or a throwaway one without a session."""
+    kwargs = {"chat_memory": get_session_store().history(session_id)} if session_id else {}
+    return ConversationBufferWindowMemory(k=settings.DOC_RETRIEVAL_TOP_K, return_messages=True, memory_key='memory', **kwargs)
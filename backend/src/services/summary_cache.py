@@ -0,0 +1,99 @@
+"""
+Persistent cache of LLM summaries (file summaries, directory / service
+rollups, the PRD itself) stored in SQLite.
+
+Entries are keyed by the model and the sha256 of the full prompt, which holds
+the prompt template (its version), the file path and content, or for a rollup
+the summaries it is built from. Unchanged files hit the cache, and since their
+cached summaries are fed to the rollups verbatim, only the rollups along the
+paths of changed files miss it.
+"""
+import time
+import hashlib
+import threading
+from collections import Counter
+
+from ..core.config import settings
+from ..core.cache import SQLiteLRUCache
+
+
+def summary_key(model: str, prompt: str) -> str:
+    return hashlib.sha256(f"{model}\0{prompt}".encode("utf-8")).hexdigest()
+
+
+class SummaryCache(SQLiteLRUCache):
+    """Maps (model, prompt hash) -> summary text, least recently used evicted past max_bytes."""
+
+    table = "summaries"
+    key_columns = ("key",)
+
+    def _create_table(self):
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS summaries (
+                key TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                summary TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+
+    def get(self, key: str):
+        with self._lock:
+            row = self._conn.execute("SELECT summary FROM summaries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE summaries SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, kind: str, summary: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO summaries (key, kind, summary, size, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, kind, summary, len(summary.encode("utf-8")), time.time()),
+            )
+            self._conn.commit()
+            self._evict()
+
+
+class SummaryStats:
+    """Cache hits and misses of one generation run, per kind of summary."""
+
+    def __init__(self):
+        self.hits = Counter()
+        self.misses = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, kind: str, hit: bool):
+        with self._lock:
+            (self.hits if hit else self.misses)[kind] += 1
+
+    def report(self) -> dict:
+        with self._lock:
+            hits, misses = sum(self.hits.values()), sum(self.misses.values())
+            return {
+                "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else None,
+                "llm_calls": misses,
+                "llm_calls_saved": hits,
+                "by_kind": {kind: {"hits": self.hits[kind], "misses": self.misses[kind]}
+                            for kind in sorted(set(self.hits) | set(self.misses))},
+            }
+
+
+def cached_summary(kind: str, model: str, prompt: str, generate, stats: SummaryStats = None) -> str:
+    """generate() for the prompt, or its cached result from an earlier run."""
+    key = summary_key(model, prompt)
+    summary = summary_cache.get(key)
+    hit = summary is not None
+    if not hit:
+        summary = generate()
+        summary_cache.put(key, kind, summary)
+    if stats is not None:
+        stats.record(kind, hit)
+    return summary
+
+
+summary_cache = SummaryCache(settings.SUMMARY_CACHE_PATH, settings.SUMMARY_CACHE_MAX_BYTES)
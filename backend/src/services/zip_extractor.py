@@ -1,15 +1,23 @@
 # File: backend/services/zip_extractor.py
 
-import os, zipfile, uuid, shutil
+import os, zipfile, uuid, shutil, stat
 from fastapi import UploadFile
 
+from ..core.config import settings
+
 TEMP_DIR = "temp_uploads"
 os.makedirs(TEMP_DIR, exist_ok=True)
 
-def save_and_extract_zip(file: UploadFile) -> str:
+
+class ZipLimitError(ValueError):
+    """The archive exceeds the configured extraction limits."""
+
+
+def save_upload(file: UploadFile) -> str:
     """
-    Saves the uploaded file to disk and extracts it to a unique temp directory.
-    Returns the extracted directory path.
+    Streams the uploaded file to disk in UPLOAD_CHUNK_SIZE pieces under a unique
+    temp directory, so memory use doesn't depend on the archive size.
+    Returns the saved zip path.
     """
     # Generate a unique ID for the session
     temp_id = str(uuid.uuid4())
@@ -20,14 +28,88 @@ def save_and_extract_zip(file: UploadFile) -> str:
 
     # Save file to disk
     zip_path = os.path.join(upload_path, "project.zip")
-    with open(zip_path, "wb") as f:
-        f.write(file.file.read())
+    try:
+        with open(zip_path, "wb") as f:
+            shutil.copyfileobj(file.file, f, settings.UPLOAD_CHUNK_SIZE)
+    except BaseException:
+        # the caller never gets the path to clean up
+        shutil.rmtree(upload_path, ignore_errors=True)
+        raise
+    return zip_path
+
+
+def _wanted(info: zipfile.ZipInfo) -> bool:
+    """Only regular files of the types the ingestion stages read are extracted."""
+    if info.is_dir() or stat.S_ISLNK(info.external_attr >> 16):
+        return False
+    if info.file_size > settings.ZIP_MAX_FILE_BYTES:
+        return False
+    return os.path.splitext(info.filename)[1].lower() in settings.EXTRACT_EXTENSIONS
+
+
+def check_zip(zip_path: str):
+    """
+    Cheap pre-flight check on the central directory, run before a job is queued.
+    The declared sizes can lie, extract_zip enforces the limits on the real bytes.
+    """
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        wanted = [info for info in zip_ref.infolist() if _wanted(info)]
+    if len(wanted) > settings.ZIP_MAX_FILES:
+        raise ZipLimitError(f"Archive has {len(wanted)} source files, the limit is {settings.ZIP_MAX_FILES}")
+    declared = sum(info.file_size for info in wanted)
+    if declared > settings.ZIP_MAX_UNCOMPRESSED_BYTES:
+        raise ZipLimitError(f"Archive expands to {declared} bytes, the limit is {settings.ZIP_MAX_UNCOMPRESSED_BYTES}")
 
-    # Extract zip content
-    extract_path = os.path.join(upload_path, "extracted")
+
+def extract_zip(zip_path: str) -> str:
+    """
+    Extracts a saved upload next to it, streaming member by member. Only the
+    file types in EXTRACT_EXTENSIONS are written, and the total uncompressed
+    size and file count are capped to guard against zip bombs.
+    Returns the extracted directory path.
+    """
+    extract_path = os.path.join(os.path.dirname(zip_path), "extracted")
     os.makedirs(extract_path, exist_ok=True)
+    root = os.path.realpath(extract_path)
 
+    files = 0
+    total = 0
     with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-        zip_ref.extractall(extract_path)
+        for info in zip_ref.infolist():
+            if not _wanted(info):
+                continue
+            target = os.path.realpath(os.path.join(root, info.filename))
+            if not target.startswith(root + os.sep):
+                # absolute paths or ../ components (zip slip)
+                continue
+
+            files += 1
+            if files > settings.ZIP_MAX_FILES:
+                raise ZipLimitError(f"Archive has more than {settings.ZIP_MAX_FILES} source files")
+
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            written = 0
+            with zip_ref.open(info) as src, open(target, "wb") as dst:
+                while True:
+                    block = src.read(settings.UPLOAD_CHUNK_SIZE)
+                    if not block:
+                        break
+                    written += len(block)
+                    total += len(block)
+                    # count real bytes, the sizes in the zip headers are attacker controlled
+                    if written > settings.ZIP_MAX_FILE_BYTES or total > settings.ZIP_MAX_UNCOMPRESSED_BYTES:
+                        raise ZipLimitError(
+                            f"Archive expands past the {settings.ZIP_MAX_UNCOMPRESSED_BYTES} byte limit "
+                            f"(or {info.filename} past {settings.ZIP_MAX_FILE_BYTES} bytes)"
+                        )
+                    dst.write(block)
 
     return extract_path
+
+
+def save_and_extract_zip(file: UploadFile) -> str:
+    """
+    Saves the uploaded file to disk and extracts it to a unique temp directory.
+    Returns the extracted directory path.
+    """
+    return extract_zip(save_upload(file))
@@ -1,39 +1,322 @@
 """Module providing a langchain tool for code retriever."""
 import os
-from langchain_core.tools import tool
-import faiss, json
+import re
+import json
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from langchain_core.tools import StructuredTool
+import faiss
 import numpy as np
 
 from ..core.config import settings
-from ..services.embedding import get_embedding
+from ..core.cache import TTLCache
+from ..core.loggers import LoggerSingleton
+from ..services.embedding import get_embedding, aget_embedding, resolve_index_dir, get_index_version, count_tokens
+from ..services.chunk_store import ChunkStore
+from ..services.ann_index import configure_search
+from ..services.lexical_index import LexicalIndex
+from ..services.sessions import get_session_store, current_session
+
+logger = LoggerSingleton.get_instance()
+
+def read_index_mmap(path, index_type="flat"):
+    """
+    Open a FAISS index read-only and memory-mapped, so the uvicorn workers share
+    its pages through the OS page cache instead of each holding a private copy.
+    """
+    # IVF maps its inverted lists, flat-code indexes (flat, HNSW storage) their code arrays
+    flags = faiss.IO_FLAG_MMAP if index_type.startswith("ivf") else faiss.IO_FLAG_MMAP_IFC
+    try:
+        return faiss.read_index(path, flags | faiss.IO_FLAG_READ_ONLY)
+    except RuntimeError:
+        # index type without mmap support, fall back to a private in-memory copy
+        return faiss.read_index(path)
+
+def load_index_version(version_dir):
+    """Open a FAISS index version, its {vector id: chunk} metadata store and its BM25 index."""
+    with open(os.path.join(version_dir, "index.json")) as f:
+        index_type = json.load(f)["index_type"]
+    index = configure_search(read_index_mmap(os.path.join(version_dir, "index.faiss"), index_type), index_type)
+    docs = ChunkStore(version_dir)
+    lexical = LexicalIndex(version_dir)
+    return index, docs, lexical
 
 def load_faiss_index(index_dir_path):
-    """Load FAISS index and docs.pkl correctly."""
-    import pickle
-    index = faiss.read_index(os.path.join(index_dir_path, "index.faiss"))
-    with open(os.path.join(index_dir_path, "index.pkl"), "rb") as f:
-        docs = pickle.load(f)  # use pickle.load, NOT readlines
-    return index, docs
-
-
-@tool
-def get_code_context(concised_question: str, top_k=settings.DOC_RETRIEVAL_TOP_K):
-    """ This tool provides relevant code information for the given question"""
-    index_dir_path = os.path.join(os.getcwd(), "faiss_index")
-    index, docs = load_faiss_index(index_dir_path)
-    question_embedding = get_embedding(concised_question)
-
-    # Search top_k similar docs
-    D, I = index.search(np.array([question_embedding]).astype('float32'), top_k)
-
-    results = []
-    for i in I[0]:
-        if i < len(docs):
-            results.append(json.dumps(docs[i]).strip())
-
-    if not results:
-        return "No relevant documents found."
-
-    coding_files_info = "Following are the relevant coding files I found:\n\n"
-    coding_files_info += "\n\n---\n\n".join(results)
-    return coding_files_info
\ No newline at end of file
+    """Load the live FAISS index version, its {vector id: chunk} metadata and BM25 index."""
+    return load_index_version(resolve_index_dir(index_dir_path))
+
+
+class IndexRegistry:
+    """
+    Per-process cache of loaded indexes so searches don't re-read them from disk.
+    An entry is reloaded when the live version (the CURRENT pointer written by
+    embed_documents) changes, and the least recently used index is evicted once
+    more than max_indexes codebases are loaded.
+    """
+
+    def __init__(self, max_indexes):
+        self.max_indexes = max_indexes
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, index_dir_path):
+        version_dir = resolve_index_dir(index_dir_path)
+        with self._lock:
+            cached = self._indexes.get(index_dir_path)
+            if cached is not None and cached[0] == version_dir:
+                self._indexes.move_to_end(index_dir_path)
+                return cached[1]
+
+        loaded = load_index_version(version_dir)
+        with self._lock:
+            self._indexes[index_dir_path] = (version_dir, loaded)
+            self._indexes.move_to_end(index_dir_path)
+            while len(self._indexes) > self.max_indexes:
+                self._indexes.popitem(last=False)
+        return loaded
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+
+
+index_registry = IndexRegistry(settings.INDEX_CACHE_SIZE)
+
+# keyed by index version, so a rebuild invalidates it in every worker
+question_embeddings = TTLCache(settings.QUESTION_EMBEDDING_CACHE_SIZE, settings.QUESTION_EMBEDDING_CACHE_TTL_SECONDS)
+
+def get_question_embedding(question, version_dir):
+    key = (version_dir, " ".join(question.split()))
+    embedding = question_embeddings.get(key)
+    if embedding is None:
+        embedding = get_embedding(question, interactive=True)
+        question_embeddings.set(key, embedding)
+    return embedding
+
+async def aget_question_embedding(question, version_dir):
+    key = (version_dir, " ".join(question.split()))
+    embedding = question_embeddings.get(key)
+    if embedding is None:
+        embedding = await aget_embedding(question)
+        question_embeddings.set(key, embedding)
+    return embedding
+
+
+# ========== Hybrid Search ==========
+_QUOTED_QUERY = re.compile(r"""^\s*(["'`])(.+)\1\s*$""", re.DOTALL)
+_IDENTIFIER_QUERY = re.compile(r"^\s*([A-Za-z_][\w.]*)(\(\))?\s*$")
+
+def lexical_query_term(question):
+    """
+    Return the literal to look up when the question is an exact identifier
+    (snake_case, camelCase, dotted path) or a quoted string such as an error
+    message or config key, else None. Those are served by lexical search
+    alone, without an embedding call.
+    """
+    quoted = _QUOTED_QUERY.match(question)
+    if quoted:
+        return quoted.group(2)
+    identifier = _IDENTIFIER_QUERY.match(question)
+    if identifier:
+        name = identifier.group(1)
+        if "_" in name or "." in name or any(c.isupper() for c in name[1:]):
+            return name
+    return None
+
+def reciprocal_rank_fusion(rankings, weights, k=None):
+    """Fuse ranked lists of vector ids: score = sum(weight / (k + rank))."""
+    k = k or settings.HYBRID_RRF_K
+    scores = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, vector_id in enumerate(ranking, start=1):
+            scores[vector_id] = scores.get(vector_id, 0.0) + weight / (k + rank)
+    return [vector_id for vector_id, _ in sorted(scores.items(), key=lambda item: item[1], reverse=True)]
+
+def _search_plan(question, top_k, index_dir_path):
+    """
+    The part of a search before the embedding call: open the index and rank
+    with BM25. Returns (index, docs, lexical_ranking, ranking), where ranking
+    is already final (no embedding needed) for exact identifier or quoted queries
+    and when the search is lexical only.
+    """
+    index_dir_path = index_dir_path or os.path.join(os.getcwd(), "faiss_index")
+    index, docs, lexical = index_registry.get(index_dir_path)
+    weight = settings.HYBRID_LEXICAL_WEIGHT
+    candidates = top_k * settings.HYBRID_CANDIDATES
+
+    lexical_ranking = [vector_id for vector_id, _ in lexical.search(question, candidates)] if weight > 0 else []
+
+    literal = lexical_query_term(question) if weight > 0 else None
+    if literal and lexical_ranking:
+        # exact symbol definitions first, then BM25
+        symbol_ids = sorted(docs.by_name(literal.split(".")[-1]))
+        return index, docs, lexical_ranking, list(dict.fromkeys(symbol_ids + lexical_ranking))
+    if weight >= 1:
+        # the vector ranking would get no weight in the fusion
+        return index, docs, lexical_ranking, lexical_ranking
+    return index, docs, lexical_ranking, None
+
+def _finish_search(index, docs, lexical_ranking, ranking, question_embedding, top_k):
+    """The part after it: vector search and fusion if needed, then read the top_k chunks."""
+    if ranking is None:
+        weight = settings.HYBRID_LEXICAL_WEIGHT
+        candidates = top_k * settings.HYBRID_CANDIDATES
+        D, I = index.search(np.array([question_embedding]).astype('float32'), candidates if weight > 0 else top_k)
+        vector_ranking = [int(i) for i in I[0] if i != -1]
+        ranking = reciprocal_rank_fusion([vector_ranking, lexical_ranking], [1 - weight, weight])
+
+    # only the top_k records are read from the chunk store
+    top_ids = ranking[:top_k]
+    found = docs.get_many(top_ids)
+    return [found[vector_id] for vector_id in top_ids if vector_id in found]
+
+def search_code(question, top_k, index_dir_path=None):
+    """Rank chunks for the question by fusing BM25 and vector search, returns chunk dicts best first."""
+    index, docs, lexical_ranking, ranking = _search_plan(question, top_k, index_dir_path)
+    question_embedding = get_question_embedding(question, docs.store_dir) if ranking is None else None
+    return _finish_search(index, docs, lexical_ranking, ranking, question_embedding, top_k)
+
+async def asearch_code(question, top_k, index_dir_path=None):
+    """
+    search_code without blocking the event loop: index loading, BM25 and the
+    FAISS search run in the default thread pool (FAISS releases the GIL while
+    searching) and the question is embedded with the async OpenAI client.
+    """
+    loop = asyncio.get_running_loop()
+    index, docs, lexical_ranking, ranking = await loop.run_in_executor(None, _search_plan, question, top_k, index_dir_path)
+    question_embedding = await aget_question_embedding(question, docs.store_dir) if ranking is None else None
+    return await loop.run_in_executor(None, _finish_search, index, docs, lexical_ranking, ranking, question_embedding, top_k)
+
+
+def _chunk_lines(chunk):
+    """(start, end) source lines of a chunk whose code is a contiguous span of its file, else None."""
+    start, end = chunk.get("start_line"), chunk.get("end_line")
+    if start is None or end is None or chunk.get("type") == "ClassDef":
+        # class chunks hold signatures only, their code isn't the span start..end
+        return None
+    return start, end
+
+def _context_block(path, chunk, code, lines):
+    header = f"### {path}:{lines[0]}-{lines[1]}" if lines else f"### {path}"
+    if chunk.get("name"):
+        # a packed chunk of small definitions names them all
+        names = ", ".join(chunk.get("names") or [chunk["name"]])
+        header += f" — {chunk.get('type', '')} {names}".rstrip()
+    return f"{header}\n{code}"
+
+def pack_code_context(chunks, max_tokens=None):
+    """
+    Format ranked chunks for the prompt: one compact block per chunk under a
+    file:line header, without ids, paths or docstrings repeated outside the
+    code. Spans already covered by a better-ranked chunk are dropped (or
+    trimmed, for partial overlaps), and blocks are added in rank order while
+    they fit in max_tokens. Returns (context, path of each packed block).
+    """
+    max_tokens = max_tokens or settings.CONTEXT_MAX_TOKENS
+    blocks, paths, used, packed_lines, packed_code = [], [], 0, {}, {}
+    for chunk in chunks:
+        path = chunk.get("relpath") or chunk.get("filename") or "unknown"
+        code = chunk.get("code", "")
+        lines = _chunk_lines(chunk)
+        if any(code in other for other in packed_code.get(path, ())):
+            continue
+        if lines:
+            covered = set()
+            for start, end in packed_lines.get(path, ()):
+                covered.update(range(max(start, lines[0]), min(end, lines[1]) + 1))
+            code_lines = code.split("\n")
+            if covered and len(code_lines) == lines[1] - lines[0] + 1:
+                keep = [n for n in range(lines[0], lines[1] + 1) if n not in covered]
+                if not keep:
+                    continue
+                # only trim overlaps at the edges, a gap in the middle keeps the whole chunk readable
+                if keep == list(range(keep[0], keep[-1] + 1)):
+                    code = "\n".join(code_lines[keep[0] - lines[0]:keep[-1] - lines[0] + 1])
+                    lines = (keep[0], keep[-1])
+
+        block = _context_block(path, chunk, code, lines)
+        tokens = count_tokens(block)
+        if used + tokens > max_tokens:
+            if blocks:
+                continue
+            # the best match alone is over budget, send as much of it as fits
+            block = block[:max_tokens * 3]
+            tokens = count_tokens(block)
+        blocks.append(block)
+        paths.append(path)
+        used += tokens
+        packed_code.setdefault(path, []).append(code)
+        if lines:
+            packed_lines.setdefault(path, []).append(lines)
+    return "\n\n".join(blocks), paths
+
+class CodeContext(str):
+    """get_code_context output: the prompt text, with the files packed into it as .files, in rank order."""
+    files = ()
+
+def format_code_context(chunks):
+    if not chunks:
+        return CodeContext("No relevant documents found.")
+
+    context, paths = pack_code_context(chunks)
+    coding_files_info = CodeContext("Following are the relevant coding files I found:\n\n" + context)
+    coding_files_info.files = list(dict.fromkeys(paths))
+
+    logger.info(f"get_code_context packed {len(paths)} of {len(chunks)} chunks",
+                extra={"correlation_id": current_session.get(), "taken_time_ms": None})
+    if logger.isEnabledFor(logging.DEBUG):
+        # what the tool used to send: every chunk dict as JSON, too costly to count on every call
+        raw_tokens = count_tokens("\n\n---\n\n".join(json.dumps(chunk) for chunk in chunks))
+        logger.debug(f"get_code_context saved {raw_tokens - count_tokens(coding_files_info)} prompt tokens "
+                     f"({raw_tokens} as raw chunks)",
+                     extra={"correlation_id": current_session.get(), "taken_time_ms": None})
+    return coding_files_info
+
+def _session_retrieval_key(question, top_k):
+    return f"{get_index_version()}:{top_k}:{' '.join(question.lower().split())}"
+
+def retrieve_chunks(question, top_k=settings.DOC_RETRIEVAL_TOP_K):
+    """search_code, reusing earlier retrievals of the current session."""
+    session_id = current_session.get()
+    if session_id is None:
+        return search_code(question, top_k)
+
+    # follow-ups in a session reuse earlier retrievals, skipping the embedding call and FAISS search
+    store, key = get_session_store(), _session_retrieval_key(question, top_k)
+    chunks = store.get_retrieval(session_id, key)
+    if chunks is None:
+        chunks = search_code(question, top_k)
+        store.put_retrieval(session_id, key, chunks)
+    return chunks
+
+async def aretrieve_chunks(question, top_k=settings.DOC_RETRIEVAL_TOP_K):
+    session_id = current_session.get()
+    if session_id is None:
+        return await asearch_code(question, top_k)
+
+    loop = asyncio.get_running_loop()
+    # the key reads the live index version from disk
+    store, key = get_session_store(), await loop.run_in_executor(None, _session_retrieval_key, question, top_k)
+    chunks = await loop.run_in_executor(None, store.get_retrieval, session_id, key)
+    if chunks is None:
+        chunks = await asearch_code(question, top_k)
+        await loop.run_in_executor(None, store.put_retrieval, session_id, key, chunks)
+    return chunks
+
+def _get_code_context(concised_question: str, top_k=settings.DOC_RETRIEVAL_TOP_K):
+    return format_code_context(retrieve_chunks(concised_question, top_k))
+
+async def _aget_code_context(concised_question: str, top_k=settings.DOC_RETRIEVAL_TOP_K):
+    return format_code_context(await aretrieve_chunks(concised_question, top_k))
+
+# sync for agent.invoke, async (non-blocking) for agent.ainvoke / astream_events
+get_code_context = StructuredTool.from_function(
+    func=_get_code_context,
+    coroutine=_aget_code_context,
+    name="get_code_context",
+    description="This tool provides relevant code information for the given question",
+)
+
+
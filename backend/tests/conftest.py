@@ -0,0 +1,9 @@
+import os
+
+# the settings object is created at import time, give it dummy values so the
+# tests can run without a real .env
+os.environ.setdefault("OPENAI_EMBEDDINGS_MODEL", "text-embedding-3-small")
+os.environ.setdefault("OPENAI_MODEL_NAME", "gpt-4.1")
+os.environ.setdefault("OPENAI_MODEL_TEMPERATURE", "0")
+os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+os.environ.setdefault("DOC_RETRIEVAL_TOP_K", "5")
@@ -0,0 +1,80 @@
+import hashlib
+
+import numpy as np
+import pytest
+
+from src.services import embedding
+from src.services.ann_index import create_index
+from src.services.embedding import remove_files_from_index, embed_documents, load_index_state, new_index_state
+
+
+def state_with(files, index_type="flat"):
+    """An index state holding one 4-d vector per id of {relpath: [ids]}."""
+    state = new_index_state()
+    ids = [vector_id for vector_ids in files.values() for vector_id in vector_ids]
+    state["index"] = create_index("flat", 4, len(ids))
+    state["index"].add_with_ids(np.ones((len(ids), 4), dtype="float32"), np.array(ids, dtype="int64"))
+    state["manifest"].update(index_type=index_type, next_id=len(ids))
+    for relpath, vector_ids in files.items():
+        state["manifest"]["files"][relpath] = {"hash": relpath, "ids": list(vector_ids)}
+        for vector_id in vector_ids:
+            state["metadata"][vector_id] = {"relpath": relpath}
+    return state
+
+
+def test_remove_files_from_index():
+    state = state_with({"a.py": [0, 1], "b.py": [2, 3]})
+    assert remove_files_from_index(state, ["a.py", "gone.py"]) == 2
+    assert state["index"].ntotal == 2
+    assert sorted(state["metadata"]) == [2, 3]
+    assert list(state["manifest"]["files"]) == ["b.py"]
+
+
+def test_remove_from_an_index_without_remove_support_drops_it():
+    state = state_with({"a.py": [0], "b.py": [1]}, index_type="hnsw")
+    assert remove_files_from_index(state, ["a.py"]) == 1
+    assert state["index"] is None
+    assert list(state["metadata"]) == [1]
+
+
+@pytest.fixture
+def embedded(monkeypatch):
+    """Replace the API embeddings with vectors derived from the code, recording what was embedded."""
+    calls = []
+
+    def fake_embed_chunks(chunks, progress=None):
+        calls.append([chunk["relpath"] for chunk in chunks])
+        return [list(hashlib.sha256(chunk["code"].encode()).digest()[:8]) for chunk in chunks]
+    monkeypatch.setattr(embedding, "embed_chunks", fake_embed_chunks)
+    return calls
+
+
+def write(repo, relpath, text):
+    path = repo / relpath
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+def test_incremental_reindex_only_touches_changed_files(tmp_path, embedded):
+    repo, save_path = tmp_path / "repo", str(tmp_path / "index")
+    write(repo, "keep.py", "def keep():\n    return 1\n")
+    write(repo, "change.py", "def change():\n    return 1\n")
+    write(repo, "delete.py", "def delete():\n    return 1\n")
+    embed_documents(str(repo), save_path, incremental=True)
+    before = load_index_state(save_path)
+
+    write(repo, "change.py", "def change():\n    return 2\n")
+    (repo / "delete.py").unlink()
+    write(repo, "new.py", "def new():\n    return 1\n")
+    embedded.clear()
+    embed_documents(str(repo), save_path, incremental=True)
+    after = load_index_state(save_path)
+
+    assert sorted(relpath for call in embedded for relpath in call) == ["change.py", "new.py"]
+    files = after["manifest"]["files"]
+    assert sorted(files) == ["change.py", "keep.py", "new.py"]
+    assert files["keep.py"] == before["manifest"]["files"]["keep.py"]
+    assert not set(files["change.py"]["ids"]) & set(before["manifest"]["files"]["change.py"]["ids"])
+    assert sorted(after["metadata"]) == sorted(vector_id for entry in files.values() for vector_id in entry["ids"])
+    assert after["index"].ntotal == len(after["metadata"])
+    assert {chunk["relpath"] for chunk in after["metadata"].values()} == {"change.py", "keep.py", "new.py"}
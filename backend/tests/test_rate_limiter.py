@@ -0,0 +1,68 @@
+import json
+import time
+
+import httpx
+
+from src.core.rate_limiter import RequestScheduler
+
+
+def scheduler(**kwargs):
+    options = dict(rpm=0, tpm=0, initial_concurrency=8, max_concurrency=16, max_retries=2, latency_factor=0)
+    options.update(kwargs)
+    return RequestScheduler(**options)
+
+
+def response(status, code=None, headers=None):
+    body = json.dumps({"error": {"code": code}}).encode() if code else b""
+    return httpx.Response(status, headers=headers, content=body), body
+
+
+def test_throttled_requests_are_retried_within_the_wait_budget():
+    requests = scheduler()
+    throttled, body = response(429)
+    assert requests.should_retry(5, time.monotonic(), throttled, body, max_throttle_wait=60)
+    assert not requests.should_retry(5, time.monotonic() - 61, throttled, body, max_throttle_wait=60)
+    assert requests.throttled == 2
+    assert requests.retries == 1
+
+
+def test_retry_after_past_the_budget_is_not_waited_for():
+    requests = scheduler()
+    throttled, body = response(429, headers={"retry-after": "120"})
+    assert not requests.should_retry(0, time.monotonic(), throttled, body, max_throttle_wait=60)
+
+
+def test_exhausted_quota_is_not_retried():
+    requests = scheduler()
+    throttled, body = response(429, code="insufficient_quota")
+    assert not requests.should_retry(0, time.monotonic(), throttled, body, max_throttle_wait=60)
+
+
+def test_only_a_429_lowers_the_concurrency_limit():
+    requests = scheduler()
+    for status in (500, 503):
+        failed, body = response(status)
+        requests.should_retry(0, time.monotonic(), failed, body)
+    requests.should_retry(0, time.monotonic())
+    assert requests.concurrency.limit == 8
+
+    throttled, body = response(429)
+    requests.should_retry(0, time.monotonic(), throttled, body, max_throttle_wait=60)
+    assert requests.concurrency.limit == 4
+
+
+def test_errors_are_retried_max_retries_times():
+    requests = scheduler()
+    failed, body = response(502)
+    assert [requests.should_retry(attempt, time.monotonic(), failed, body) for attempt in range(3)] == [True, True, False]
+    # a timeout or connection error has no response
+    assert requests.should_retry(0, time.monotonic())
+    assert not requests.should_retry(2, time.monotonic())
+
+
+def test_client_errors_are_not_retried():
+    requests = scheduler()
+    for status in (400, 401, 404):
+        failed, body = response(status)
+        assert not requests.should_retry(0, time.monotonic(), failed, body)
+    assert requests.retries == 0
@@ -0,0 +1,46 @@
+from src.services.embedding import count_tokens
+from src.tools.retriever import pack_code_context
+
+
+def function_chunk(relpath, start, code, name="f"):
+    return {"relpath": relpath, "code": code, "start_line": start, "end_line": start + code.count("\n"),
+            "type": "FunctionDef", "name": name}
+
+
+def test_drops_chunks_already_in_the_context():
+    first = function_chunk("a.py", 1, "def f():\n    return 1\n\ndef g():\n    return 2")
+    inside = function_chunk("a.py", 4, "def g():\n    return 2", name="g")
+    context, paths = pack_code_context([first, inside])
+    assert paths == ["a.py"]
+    assert context.count("def g()") == 1
+
+
+def test_trims_overlapping_spans():
+    first = function_chunk("a.py", 1, "l1\nl2\nl3\nl4")
+    overlapping = function_chunk("a.py", 3, "l3\nl4\nl5\nl6", name="g")
+    context, paths = pack_code_context([first, overlapping])
+    assert paths == ["a.py", "a.py"]
+    assert "### a.py:5-6 — FunctionDef g\nl5\nl6" in context
+    assert context.count("l3") == 1
+
+
+def test_same_code_in_another_file_is_kept():
+    code = "def f():\n    return 1"
+    _, paths = pack_code_context([function_chunk("a.py", 1, code), function_chunk("b.py", 1, code)])
+    assert paths == ["a.py", "b.py"]
+
+
+def test_stays_within_the_token_budget():
+    chunks = [function_chunk(f"m{i}.py", 1, "\n".join(f"value_{i}_{n} = {n}" for n in range(40))) for i in range(5)]
+    budget = count_tokens(pack_code_context(chunks[:2])[0]) + 10
+    context, paths = pack_code_context(chunks, max_tokens=budget)
+    assert paths == ["m0.py", "m1.py"]
+    assert count_tokens(context) <= budget
+
+
+def test_best_match_over_budget_is_truncated():
+    chunk = function_chunk("big.py", 1, "\n".join(f"value_{n} = {n}" for n in range(500)))
+    context, paths = pack_code_context([chunk], max_tokens=50)
+    assert paths == ["big.py"]
+    assert context.startswith("### big.py:1-500")
+    assert len(context) < len(chunk["code"])
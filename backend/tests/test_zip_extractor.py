@@ -0,0 +1,68 @@
+import os
+import stat
+import zipfile
+
+import pytest
+
+from src.core.config import settings
+from src.services.zip_extractor import extract_zip, check_zip, ZipLimitError
+
+
+def make_zip(tmp_path, members):
+    """members: {name: text}, or {name: (text, external_attr)}."""
+    zip_path = os.path.join(tmp_path, "project.zip")
+    with zipfile.ZipFile(zip_path, "w") as zip_ref:
+        for name, content in members.items():
+            info = zipfile.ZipInfo(name)
+            if isinstance(content, tuple):
+                content, info.external_attr = content
+            zip_ref.writestr(info, content)
+    return zip_path
+
+
+def extracted_files(path):
+    return sorted(os.path.relpath(os.path.join(directory, name), path).replace(os.sep, "/")
+                  for directory, _, names in os.walk(path) for name in names)
+
+
+def test_extracts_source_files_only(tmp_path):
+    path = extract_zip(make_zip(tmp_path, {"app/main.py": "print(1)", "logo.png": "x", "README.md": "# hi"}))
+    assert extracted_files(path) == ["README.md", "app/main.py"]
+
+
+def test_skips_paths_outside_the_target(tmp_path):
+    path = extract_zip(make_zip(tmp_path, {"../evil.py": "x", "a/../../evil2.py": "x", "/abs.py": "x", "ok.py": "x"}))
+    assert extracted_files(path) == ["ok.py"]
+    assert not os.path.exists(os.path.join(tmp_path, "evil.py"))
+    assert not os.path.exists(os.path.join(tmp_path, "evil2.py"))
+
+
+def test_skips_symlinks(tmp_path):
+    link = ("/etc/passwd", (stat.S_IFLNK | 0o777) << 16)
+    path = extract_zip(make_zip(tmp_path, {"link.py": link, "ok.py": "x"}))
+    assert extracted_files(path) == ["ok.py"]
+
+
+def test_file_count_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "ZIP_MAX_FILES", 2)
+    zip_path = make_zip(tmp_path, {f"f{i}.py": "x" for i in range(3)})
+    with pytest.raises(ZipLimitError):
+        check_zip(zip_path)
+    with pytest.raises(ZipLimitError):
+        extract_zip(zip_path)
+
+
+def test_total_size_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "ZIP_MAX_UNCOMPRESSED_BYTES", 1000)
+    monkeypatch.setattr(settings, "UPLOAD_CHUNK_SIZE", 100)
+    zip_path = make_zip(tmp_path, {"a.py": "x" * 600, "b.py": "x" * 600})
+    with pytest.raises(ZipLimitError):
+        check_zip(zip_path)
+    with pytest.raises(ZipLimitError):
+        extract_zip(zip_path)
+
+
+def test_oversized_files_are_skipped(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "ZIP_MAX_FILE_BYTES", 100)
+    path = extract_zip(make_zip(tmp_path, {"big.py": "x" * 200, "small.py": "x"}))
+    assert extracted_files(path) == ["small.py"]
@@ -1,6 +1,6 @@
 import React, { useEffect, useRef, useState } from 'react';
 import { Loader } from './Loader';
-import { SearchResultResponse, UploadResultResponse } from '../types/types';
+import { IngestionJob, SearchResultResponse, UploadResultResponse } from '../types/types';
 
 import { UploadResult } from './UploadResult';
 import { SearchBar } from './Searchbar';
@@ -17,6 +17,8 @@ export const UploadPanel: React.FC = () => {
    const [isSearching, setIsSearching] = useState(false);
    const searchResultRef = useRef<HTMLDivElement>(null);
    const isSearchingRef = useRef<HTMLDivElement>(null);
+   // follow-up questions share the conversation (and its retrieved code) through this id
+   const sessionId = useRef<string>(crypto.randomUUID());
    const [lastUploadedFilename, setLastUploadedFilename] = useState<string | null>(null);
    const [uploadErrorMessage, setUploadErrorMessage] = useState<string | null>(null);
    const [chatHistory, setChatHistory] = useState<
@@ -40,6 +42,21 @@ export const UploadPanel: React.FC = () => {
       }
    }, [isSearching]);
 
+   // ingestion runs as a background job on the server, poll it until it settles
+   const waitForJob = async (jobId: string): Promise<IngestionJob> => {
+      while (true) {
+         await new Promise((resolve) => setTimeout(resolve, 2000));
+         const response = await fetch(`http://13.203.228.186:8000/api/jobs/${jobId}`);
+         if (!response.ok) {
+            throw new Error('Upload status check failed with status ' + response.status);
+         }
+         const job: IngestionJob = await response.json();
+         if (job.status === 'completed' || job.status === 'failed' || job.status === 'cancelled') {
+            return job;
+         }
+      }
+   };
+
    const handleUpload = async () => {
       if (!selectedFile) {
          alert('No file selected');
@@ -68,8 +85,13 @@ export const UploadPanel: React.FC = () => {
             throw new Error('Upload failed with status ' + response.status);
          }
 
-         const data = await response.json();
-         setResult(data);
+         const { jobId } = await response.json();
+         const job = await waitForJob(jobId);
+         if (job.status !== 'completed') {
+            throw new Error(job.error || `Upload ${job.status}`);
+         }
+         setResult(job.result);
+         sessionId.current = crypto.randomUUID();
          setLastUploadedFilename(selectedFile.name);
          setSelectedFile(null);
       } catch (err: any) {
@@ -80,6 +102,57 @@ export const UploadPanel: React.FC = () => {
       }
    };
 
+   // the answer streams in as server-sent events, the last chat entry grows token by token
+   const streamSearch = async (query: string) => {
+      const response = await fetch('http://13.203.228.186:8000/api/search/stream', {
+         method: 'POST',
+         headers: {
+            'Content-Type': 'application/json',
+            'X-Session-ID': sessionId.current,
+         },
+         body: JSON.stringify({ question: query }),
+      });
+
+      if (!response.ok || !response.body) {
+         throw new Error(`Search failed with status ${response.status}`);
+      }
+
+      const updateAnswer = (result: SearchResultResponse) =>
+         setChatHistory((prev) => [...prev.slice(0, -1), { query, result }]);
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      let answer = '';
+      while (true) {
+         const { done, value } = await reader.read();
+         if (done) break;
+         buffer += decoder.decode(value, { stream: true });
+         const events = buffer.split('\n\n');
+         buffer = events.pop() ?? '';
+         for (const raw of events) {
+            const event = raw.match(/^event: (.*)$/m)?.[1];
+            const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] ?? 'null');
+            if (event === 'token') {
+               if (!answer) {
+                  setIsSearching(false);
+                  setChatHistory((prev) => [...prev, { query, result: { answer: '', related_files: [] } }]);
+               }
+               answer += data.text;
+               updateAnswer({ answer, related_files: [] });
+            } else if (event === 'final') {
+               if (!answer) {
+                  setChatHistory((prev) => [...prev, { query, result: data }]);
+               } else {
+                  updateAnswer(data);
+               }
+            } else if (event === 'error') {
+               throw new Error(data.message);
+            }
+         }
+      }
+   };
+
    const handleSearch = async (e: React.FormEvent, query: string) => {
       e.preventDefault();
       if (!query.trim()) return;
@@ -87,21 +160,7 @@ export const UploadPanel: React.FC = () => {
       setIsSearching(true);
 
       try {
-         const response = await fetch('http://13.203.228.186:8000/api/search', {
-            method: 'POST',
-            headers: {
-               'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({ question: query }),
-         });
-
-         if (!response.ok) {
-            throw new Error(`Search failed with status ${response.status}`);
-         }
-
-         const data: SearchResultResponse = await response.json();
-
-         setChatHistory((prev) => [...prev, { query, result: data }]);
+         await streamSearch(query);
 
          setRecentQueries((prev) => {
             const updated = [query, ...prev.filter((q) => q !== query)].slice(0, 5);
@@ -116,7 +175,6 @@ export const UploadPanel: React.FC = () => {
       }
    };
 
-
    return (
       <div className="relative w-full h-[calc(100vh-96px)] flex text-black">
          {/* Sidebar */}
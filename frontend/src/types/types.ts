@@ -29,3 +29,18 @@ export interface SearchResultResponse {
 export interface UploadResultResponse {
    prdDoc: string; // now a URL instead of nested structure
 }
+
+export interface IngestionJob {
+   id: string;
+   status: 'queued' | 'running' | 'completed' | 'failed' | 'cancelled';
+   stage: string | null;
+   progress: {
+      files_total: number;
+      files_chunked: number;
+      chunks_total: number;
+      chunks_embedded: number;
+   };
+   eta_seconds: number | null;
+   error: string | null;
+   result: UploadResultResponse | null;
+}